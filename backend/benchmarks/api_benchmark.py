@@ -0,0 +1,207 @@
+"""
+Offline API benchmark
+Runs the app in-process (lifespan included) against the local fixture server
+and a fake yt-dlp with a fixed latency, and reports throughput and
+p50/p95/p99 latency per scenario and per waterfall level as JSON that can be
+diffed between releases
+
+Usage (from the backend directory):
+    python -m benchmarks.api_benchmark --requests 50 --concurrency 8 --output api.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# A scenario builds (method, path, json body, query params) for request number i.
+# Unique query strings defeat the extraction cache where a cold path is measured.
+Scenario = Callable[[str, int], Tuple[str, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    'extract_direct': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/media/clip.mp4?n={i}", 'enrich': False}, None),
+    'extract_hls': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/media/master.m3u8?n={i}", 'enrich': False}, None),
+    'extract_ytdlp': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/watch/v{i}"}, None),
+    'extract_fast': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/watch/f{i}", 'fast': True}, None),
+    'extract_metadata': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/pages/og.html?n={i}", 'enrich': False}, None),
+    'extract_large_page': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/pages/large.html?n={i}", 'enrich': False}, None),
+    'extract_html_fallback': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/pages/plain.html?n={i}", 'enrich': False}, None),
+    'extract_cached': lambda base, i: ('POST', '/api/extract', {'url': f"{base}/watch/cached"}, None),
+    'download': lambda base, i: ('POST', '/api/download', {'url': f"{base}/watch/v{i}", 'format_id': 'c720'}, None),
+    'subtitles': lambda base, i: ('POST', '/api/subtitles', {'url': f"{base}/watch/v{i}"}, None),
+    'convert': lambda base, i: ('POST', '/api/convert', {'url': f"{base}/watch/cached", 'format': 'mp3'}, None),
+    'thumb': lambda base, i: ('GET', '/api/thumb', None, {'url': f"{base}/watch/cached", 'w': 160 + i % 4 * 80}),
+    'formats': lambda base, i: ('GET', '/api/formats', None, None),
+    'health': lambda base, i: ('GET', '/api/health', None, None),
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    values = [value * 1000 for value in seconds]
+    if not values:
+        return {}
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+        'mean': round(statistics.fmean(values), 2),
+        'max': round(max(values), 2),
+    }
+
+
+def configure_environment(thumb_dir: str) -> None:
+    """Isolate the app from MongoDB, disk caches, browsers and our own rate limits"""
+    os.environ.update({
+        'MONGO_URL': '',
+        'WARMUP_ON_STARTUP': 'false',
+        'WARMER_ENABLED': 'false',
+        'ADMISSION_ENABLED': 'false',
+        'UPSTREAM_LIMITER_ENABLED': 'false',
+        'TRACE_FILE': '',
+        'TRACE_OTLP_ENDPOINT': '',
+        'THUMB_CACHE_DIR': thumb_dir,
+    })
+    # Level 3 fails fast instead of launching Chromium, the HTML scraper takes over
+    sys.modules['playwright'] = None
+
+
+def install_level_recorder(server_module, samples: Dict[Tuple[str, str], List[float]]) -> None:
+    """Swap the app's level_timer for one that also keeps raw durations"""
+    from services.metrics_service import LevelTimer
+
+    class RecordingLevelTimer(LevelTimer):
+        __slots__ = ()
+
+        def __exit__(self, exc_type, exc, tb) -> bool:
+            elapsed = time.perf_counter() - self.started
+            result = super().__exit__(exc_type, exc, tb)
+            samples[(self.level, self.outcome)].append(elapsed)
+            return result
+
+    server_module.level_timer = RecordingLevelTimer
+
+
+async def run_scenario(client, base_url: str, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Fire requests from concurrency workers, collecting per-request latency and status"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = defaultdict(int)
+    counter = iter(range(requests))
+
+    async def worker():
+        for index in counter:
+            method, path, body, params = scenario(base_url, index)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body, params=params)
+            latencies.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2') and status != '304')
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': latency_summary(latencies),
+    }
+
+
+async def run_benchmark(names: List[str], requests: int, concurrency: int,
+                        ytdlp_latency_ms: float, fail_latency_ms: float) -> Dict[str, Any]:
+    from benchmarks.fixtures import FixtureServer
+    from benchmarks import fake_ytdlp
+
+    fixtures = FixtureServer().start()
+    extractor = fake_ytdlp.install(fixtures.base_url, ytdlp_latency_ms, fail_latency_ms)
+
+    import httpx
+    import server
+
+    level_samples: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+    install_level_recorder(server, level_samples)
+
+    endpoints = {}
+    try:
+        async with server.app.router.lifespan_context(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+                # Cached scenarios measure hits, so the entry is extracted once up front
+                await client.post('/api/extract', json={'url': f"{fixtures.base_url}/watch/cached"})
+                level_samples.clear()
+                for name in names:
+                    endpoints[name] = await run_scenario(client, fixtures.base_url, SCENARIOS[name], requests, concurrency)
+    finally:
+        fixtures.stop()
+
+    levels: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    for (level, outcome), seconds in sorted(level_samples.items()):
+        levels[level][outcome] = {'count': len(seconds), 'latency_ms': latency_summary(seconds)}
+
+    return {
+        'benchmark': 'api',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'requests': requests,
+            'concurrency': concurrency,
+            'ytdlp_latency_ms': ytdlp_latency_ms,
+            'ytdlp_fail_latency_ms': fail_latency_ms,
+        },
+        'endpoints': endpoints,
+        'levels': dict(levels),
+        'ytdlp_calls': extractor.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline API latency and throughput benchmark")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients per scenario")
+    parser.add_argument('--ytdlp-latency-ms', type=float, default=200, help="Fake yt-dlp extraction latency")
+    parser.add_argument('--ytdlp-fail-latency-ms', type=float, default=20, help="Fake yt-dlp latency for unsupported URLs")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    configure_environment(tempfile.mkdtemp(prefix='bench-thumbs-'))
+
+    report = asyncio.run(run_benchmark(
+        args.scenario or list(SCENARIOS),
+        args.requests,
+        args.concurrency,
+        args.ytdlp_latency_ms,
+        args.ytdlp_fail_latency_ms,
+    ))
+    text = json.dumps(report, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Stand-in for the yt_dlp package in the offline benchmarks
+Installed into sys.modules before the app imports yt-dlp; /watch/<id> URLs on
+the fixture server extract after a fixed latency with a YouTube-like set of
+formats and subtitles, everything else fails like an unsupported URL
+"""
+import sys
+import time
+import types
+import urllib.request
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+
+FAST_LATENCY_FACTOR = 0.25
+
+
+class DownloadError(Exception):
+    pass
+
+
+class FakeExtractor:
+    """Latency and response shape shared by every YoutubeDL instance"""
+
+    def __init__(self, base_url: str, latency_ms: float = 200, fail_latency_ms: float = 20):
+        self.base_url = base_url
+        self.latency = latency_ms / 1000
+        self.fail_latency = fail_latency_ms / 1000
+        self.calls = 0
+
+    def info(self, url: str, format_id: Optional[str] = None, fast: bool = False) -> Dict[str, Any]:
+        self.calls += 1
+        parsed = urlparse(url)
+        if not url.startswith(self.base_url) or not parsed.path.startswith('/watch/'):
+            time.sleep(self.fail_latency)
+            raise DownloadError(f"ERROR: Unsupported URL: {url}")
+        # Without manifest downloads and extra player clients yt-dlp answers in a fraction of the time
+        time.sleep(self.latency * (FAST_LATENCY_FACTOR if fast else 1))
+
+        video_id = parsed.path.rsplit('/', 1)[-1]
+        media = f"{self.base_url}/media/clip.mp4"
+        formats = []
+        # Combined, video-only and audio-only streams, about what a YouTube watch page offers
+        for height, fps in ((144, 30), (240, 30), (360, 30), (480, 30), (720, 30), (720, 60),
+                            (1080, 30), (1080, 60), (1440, 60), (2160, 60)):
+            formats.append({
+                'format_id': f"v{height}p{fps}", 'url': f"{media}?itag=v{height}{fps}", 'ext': 'mp4',
+                'height': height, 'width': height * 16 // 9, 'fps': fps,
+                'vcodec': 'avc1.64001f', 'acodec': 'none', 'filesize': height * 40000,
+            })
+        for height in (360, 720):
+            formats.append({
+                'format_id': f"c{height}", 'url': f"{media}?itag=c{height}", 'ext': 'mp4',
+                'height': height, 'width': height * 16 // 9, 'fps': 30,
+                'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'filesize': None,
+            })
+        for abr, ext, codec in ((48, 'webm', 'opus'), (128, 'm4a', 'mp4a.40.2'), (160, 'webm', 'opus')):
+            formats.append({
+                'format_id': f"a{abr}", 'url': f"{media}?itag=a{abr}", 'ext': ext,
+                'abr': abr, 'vcodec': 'none', 'acodec': codec, 'filesize_approx': abr * 7500,
+            })
+
+        if fast:
+            # Only the progressive streams are listed without the DASH/HLS manifests
+            formats = [fmt for fmt in formats if fmt['format_id'].startswith('c')]
+
+        subtitle = [{'ext': 'vtt', 'url': f"{self.base_url}/subs/en.vtt"}]
+        caption = [{'ext': ext, 'url': f"{self.base_url}/subs/en.{ext}"} for ext in ('json3', 'srv3', 'vtt')]
+        info = {
+            'id': video_id,
+            'title': f"Fixture video {video_id}",
+            'description': 'Offline benchmark fixture',
+            'duration': 60,
+            'thumbnail': f"{self.base_url}/images/thumb.jpg",
+            'uploader': 'Fixture Channel',
+            'view_count': 1000,
+            'like_count': 10,
+            'upload_date': '20240101',
+            'extractor_key': 'Youtube',
+            'webpage_url': url,
+            'formats': formats,
+            'subtitles': {'en': subtitle, 'de': subtitle},
+            'automatic_captions': {'es': caption, 'fr': caption},
+        }
+        # The selected format (best = 720p combined) is exposed at the top level like yt-dlp does
+        best = formats[-1] if fast else formats[-4]
+        chosen = next((fmt for fmt in formats if fmt['format_id'] == format_id), best)
+        info.update({'url': chosen['url'], 'ext': chosen['ext'], 'filesize': chosen.get('filesize')})
+        return info
+
+
+class YoutubeDL:
+    extractor: Optional[FakeExtractor] = None
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None):
+        self.params = params or {}
+
+    def __enter__(self) -> 'YoutubeDL':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def urlopen(self, request):
+        return urllib.request.urlopen(request, timeout=10)
+
+    def extract_info(self, url: str, download: bool = False) -> Dict[str, Any]:
+        format_id = self.params.get('format')
+        format_id = None if format_id in (None, 'best') else format_id
+        skip = self.params.get('extractor_args', {}).get('youtube', {}).get('skip', [])
+        if 'dash' in skip:
+            return self.extractor.info(url, format_id, fast=True)
+        return self.extractor.info(url, format_id)
+
+
+def install(base_url: str, latency_ms: float = 200, fail_latency_ms: float = 20) -> FakeExtractor:
+    """Register the fake as yt_dlp (must run before anything imports the real one)"""
+    return install_extractor(FakeExtractor(base_url, latency_ms, fail_latency_ms))
+
+
+def install_extractor(extractor):
+    """Register a yt_dlp stand-in backed by any object with info(url, format_id)"""
+    module = types.ModuleType('yt_dlp')
+    module.YoutubeDL = type('YoutubeDL', (YoutubeDL,), {'extractor': extractor})
+    module.DownloadError = DownloadError
+    module.utils = types.SimpleNamespace(DownloadError=DownloadError)
+    sys.modules['yt_dlp'] = module
+    return extractor
@@ -0,0 +1,210 @@
+"""
+Local upstream stand-ins for the offline benchmarks
+A threaded HTTP server serving recorded-style HTML pages, a small MP4 with
+Range support, HLS playlists, a thumbnail and subtitle files, so the
+extraction waterfall can be measured without touching the network
+"""
+import io
+import re
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+def build_mp4(duration_seconds: int = 60, payload_bytes: int = 256 * 1024) -> bytes:
+    """ftyp + moov/mvhd + mdat, enough for the direct media probe to read a duration"""
+    ftyp = b'isom' + struct.pack('>I', 512) + b'isomiso2avc1mp41'
+    ftyp = struct.pack('>I', 8 + len(ftyp)) + b'ftyp' + ftyp
+    # mvhd v0: version/flags, created, modified, timescale, duration, then rate/volume/matrix/ids
+    mvhd = struct.pack('>IIIII', 0, 0, 0, 1000, duration_seconds * 1000) + bytes(80)
+    mvhd = struct.pack('>I', 8 + len(mvhd)) + b'mvhd' + mvhd
+    moov = struct.pack('>I', 8 + len(mvhd)) + b'moov' + mvhd
+    mdat = struct.pack('>I', 8 + payload_bytes) + b'mdat' + bytes(payload_bytes)
+    return ftyp + moov + mdat
+
+
+def build_jpeg(width: int = 640, height: int = 360) -> bytes:
+    from PIL import Image
+
+    image = Image.new('RGB', (width, height))
+    pixels = image.load()
+    for x in range(width):
+        for y in range(0, height, 4):
+            pixels[x, y] = (x * 255 // width, y * 255 // height, 128)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+OG_PAGE = """<!DOCTYPE html>
+<html lang="en"><head>
+<meta charset="utf-8">
+<title>Product launch recap | Example Media</title>
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta property="og:site_name" content="Example Media">
+<meta property="og:title" content="Product launch recap">
+<meta property="og:type" content="video.other">
+<meta property="og:image" content="/images/thumb.jpg">
+<meta property="og:video:url" content="/media/clip.mp4">
+<meta property="og:video:secure_url" content="/media/clip.mp4">
+<meta property="og:video:type" content="video/mp4">
+<meta property="og:video:width" content="1280">
+<meta property="og:video:height" content="720">
+<link rel="alternate" type="application/json+oembed" href="/oembed.json">
+<script type="application/ld+json">{"@context": "https://schema.org", "@type": "VideoObject",
+ "name": "Product launch recap", "duration": "PT1M", "thumbnailUrl": "/images/thumb.jpg",
+ "contentUrl": "/media/clip.mp4", "author": {"@type": "Person", "name": "Example Media"}}</script>
+</head><body>
+<header><nav>{nav}</nav></header>
+<main><article><h1>Product launch recap</h1>{paragraphs}</article></main>
+</body></html>
+"""
+
+PLAIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Embedded clip</title></head><body>
+<div class="sidebar">{nav}</div>
+<div class="content">{paragraphs}
+<video controls poster="/images/thumb.jpg"><source src="/media/clip.mp4" type="video/mp4"></video>
+</div></body></html>
+"""
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-STREAM-INF:BANDWIDTH=2800000,RESOLUTION=1280x720,CODECS="avc1.64001f,mp4a.40.2"
+720p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+360p.m3u8
+"""
+
+MEDIA_PLAYLIST = "#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:6\n" + ''.join(
+    f"#EXTINF:6.0,\nseg{index}.ts\n" for index in range(10)
+) + "#EXT-X-ENDLIST\n"
+
+# Long VOD playlists: a ladder of renditions with thousands of segments each
+LARGE_MASTER_PLAYLIST = "#EXTM3U\n#EXT-X-VERSION:3\n" + ''.join(
+    f"#EXT-X-STREAM-INF:BANDWIDTH={height * 4000},RESOLUTION={height * 16 // 9}x{height}\nlong.m3u8?h={height}\n"
+    for height in (144, 240, 360, 480, 540, 720, 900, 1080, 1440, 2160)
+)
+
+LARGE_MEDIA_PLAYLIST = "#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:4\n" + ''.join(
+    f"#EXTINF:4.0,\nlong/seg{index}.ts\n" for index in range(5000)
+) + "#EXT-X-ENDLIST\n"
+
+SUBTITLES_VTT = "WEBVTT\n\n" + ''.join(
+    f"00:00:{index * 5:02d}.000 --> 00:00:{index * 5 + 4:02d}.000\nLine {index + 1}\n\n" for index in range(10)
+)
+
+# The same cues in YouTube's timedtext formats, as offered for automatic captions
+SUBTITLES_SRV3 = '<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>' + ''.join(
+    f'<p t="{index * 5000}" d="4000">Line {index + 1}</p>' for index in range(10)
+) + '</body></timedtext>'
+
+SUBTITLES_JSON3 = '{"wireMagic": "pb3", "pens": [{}], "events": [' + ', '.join(
+    f'{{"tStartMs": {index * 5000}, "dDurationMs": 4000, "segs": [{{"utf8": "Line {index + 1}"}}]}}'
+    for index in range(10)
+) + ']}'
+
+OEMBED = '{"type": "video", "version": "1.0", "title": "Product launch recap", "author_name": "Example Media", ' \
+         '"thumbnail_url": "/images/thumb.jpg", "width": 1280, "height": 720}'
+
+
+def build_page(template: str, paragraphs: int = 40) -> bytes:
+    """Pad the page with markup of a realistic size (menus and article text)"""
+    nav = ''.join(f'<a href="/section/{index}">Section {index}</a>' for index in range(30))
+    text = ''.join(
+        f"<p>Paragraph {index} of the article with <a href='/related/{index}'>a related link</a> "
+        f"and some filler text to reach a typical page size.</p>"
+        for index in range(paragraphs)
+    )
+    return template.replace('{nav}', nav).replace('{paragraphs}', text).encode()
+
+
+def build_routes() -> Dict[str, Tuple[str, bytes]]:
+    """Path -> (content type, body)"""
+    routes = {
+        '/pages/og.html': ('text/html; charset=utf-8', build_page(OG_PAGE)),
+        '/pages/plain.html': ('text/html; charset=utf-8', build_page(PLAIN_PAGE)),
+        '/pages/large.html': ('text/html; charset=utf-8', build_page(OG_PAGE, paragraphs=2000)),
+        '/oembed.json': ('application/json', OEMBED.encode()),
+        '/media/clip.mp4': ('video/mp4', build_mp4()),
+        '/media/master.m3u8': ('application/vnd.apple.mpegurl', MASTER_PLAYLIST.encode()),
+        '/media/720p.m3u8': ('application/vnd.apple.mpegurl', MEDIA_PLAYLIST.encode()),
+        '/media/360p.m3u8': ('application/vnd.apple.mpegurl', MEDIA_PLAYLIST.encode()),
+        '/media/large.m3u8': ('application/vnd.apple.mpegurl', LARGE_MASTER_PLAYLIST.encode()),
+        '/media/long.m3u8': ('application/vnd.apple.mpegurl', LARGE_MEDIA_PLAYLIST.encode()),
+        '/images/thumb.jpg': ('image/jpeg', build_jpeg()),
+        '/subs/en.vtt': ('text/vtt', SUBTITLES_VTT.encode()),
+        '/subs/en.srv3': ('text/xml', SUBTITLES_SRV3.encode()),
+        '/subs/en.json3': ('application/json', SUBTITLES_JSON3.encode()),
+    }
+    for index in range(10):
+        routes[f'/media/seg{index}.ts'] = ('video/mp2t', bytes(188 * 64))
+    return routes
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes: Dict[str, Tuple[str, bytes]] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, send_body: bool) -> None:
+        path = self.path.split('?', 1)[0]
+        route = self.routes.get(path)
+        if route is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        content_type, body = route
+        status, start, end = 200, 0, len(body) - 1
+        match = re.match(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+        if match and body:
+            start = int(match.group(1) or 0)
+            end = min(int(match.group(2)) if match.group(2) else len(body) - 1, len(body) - 1)
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(body)}")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body[start:end + 1])
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+
+class FixtureServer:
+    """Serves build_routes() on 127.0.0.1 from a background thread"""
+
+    def __init__(self, port: int = 0):
+        handler = type('BoundFixtureHandler', (FixtureHandler,), {'routes': build_routes()})
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fixture-server', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def start(self) -> 'FixtureServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,111 @@
+"""
+Single API worker for the load test
+Runs server:app under uvicorn with the fake yt-dlp installed and adds a side
+endpoint, /__loadtest/stats, reporting the process' RSS, CPU time and the
+event-loop lag measured since the previous call
+
+Started by benchmarks.load_test; to run it by hand (from the backend directory):
+    python -m benchmarks.load_server --port 8010 --fixtures-url http://127.0.0.1:8766
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+STATS_PATH = '/__loadtest/stats'
+
+
+def rss_kb() -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+class LoopLagMonitor:
+    """Sleeps a fixed interval on the event loop and records how late it wakes up"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self._samples: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def drain(self) -> List[float]:
+        samples, self._samples = self._samples, []
+        return samples
+
+
+class LoadTestApp:
+    """ASGI wrapper serving STATS_PATH and passing everything else to the app"""
+
+    def __init__(self, app):
+        self.app = app
+        self.monitor = LoopLagMonitor()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    async def _send_stats(self, send) -> None:
+        from benchmarks.api_benchmark import latency_summary
+
+        times = os.times()
+        body = json.dumps({
+            'monotonic': time.monotonic(),
+            'cpu_seconds': times.user + times.system,
+            'rss_kb': rss_kb(),
+            'threads': threading.active_count(),
+            'tasks': len(asyncio.all_tasks()),
+            'loop_lag_ms': latency_summary(self.monitor.drain()),
+        }).encode()
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def __call__(self, scope, receive, send):
+        if self._monitor_task is None and scope['type'] in ('http', 'lifespan'):
+            self._monitor_task = asyncio.create_task(self.monitor.run())
+        if scope['type'] == 'http' and scope['path'] == STATS_PATH:
+            await self._send_stats(send)
+            return
+        await self.app(scope, receive, send)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One API worker with fake upstreams and process stats")
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--fixtures-url', required=True, help="Base URL of the fixture server")
+    parser.add_argument('--ytdlp-latency-ms', type=float, default=200)
+    parser.add_argument('--ytdlp-fail-latency-ms', type=float, default=20)
+    parser.add_argument('--admission', action='store_true', help="Keep admission control on (default off)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from benchmarks.api_benchmark import configure_environment
+    from benchmarks import fake_ytdlp
+
+    configure_environment(tempfile.mkdtemp(prefix='load-thumbs-'))
+    if args.admission:
+        os.environ['ADMISSION_ENABLED'] = 'true'
+    fake_ytdlp.install(args.fixtures_url, args.ytdlp_latency_ms, args.ytdlp_fail_latency_ms)
+
+    import uvicorn
+    import server
+
+    uvicorn.run(LoadTestApp(server.app), host='127.0.0.1', port=args.port, log_level='warning', access_log=False)
+
+
+if __name__ == '__main__':
+    main()
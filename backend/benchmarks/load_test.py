@@ -0,0 +1,397 @@
+"""
+Load test for one API worker
+Starts the fixture server and a single worker (benchmarks.load_server), then
+drives a weighted mix of /api/extract, /api/download, /api/subtitles and
+/api/convert through a ramp of stages, closed-loop (concurrent users) or
+open-loop (Poisson arrivals at a fixed rate). Client latencies are reported
+per stage next to the worker's RSS, CPU and event-loop lag, and the first
+stage that misses the latency/error/throughput targets is reported as the
+saturation point
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --mode closed --stages 20s:4,20s:8,20s:16,20s:32 --output load.json
+    python -m benchmarks.load_test --mode open --stages 20s:5,20s:10,20s:20 --mix fallback
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from benchmarks.api_benchmark import latency_summary
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+STATS_PATH = '/__loadtest/stats'
+
+# Request kind -> weight; hot URLs repeat (cache hits), cold ones are always new
+MIXES = {
+    'default': {
+        'extract_hot': 45, 'extract_cold': 15, 'extract_fallback': 5, 'extract_metadata': 5,
+        'extract_playlist': 5, 'download': 10, 'subtitles': 5, 'convert': 10,
+    },
+    'cold': {
+        'extract_hot': 10, 'extract_cold': 60, 'extract_fallback': 5, 'extract_metadata': 5,
+        'extract_playlist': 5, 'download': 10, 'subtitles': 5, 'convert': 0,
+    },
+    'fallback': {
+        'extract_hot': 20, 'extract_cold': 10, 'extract_fallback': 40, 'extract_metadata': 20,
+        'extract_playlist': 0, 'download': 5, 'subtitles': 0, 'convert': 5,
+    },
+    'playlist': {
+        'extract_hot': 20, 'extract_cold': 10, 'extract_fallback': 0, 'extract_metadata': 0,
+        'extract_playlist': 60, 'download': 5, 'subtitles': 0, 'convert': 5,
+    },
+}
+
+
+class TrafficMix:
+    """Weighted, seeded choice of the next request"""
+
+    def __init__(self, base_url: str, weights: Dict[str, float], hot_urls: int, seed: int):
+        self.base_url = base_url
+        self.kinds = [kind for kind, weight in weights.items() if weight > 0]
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.hot_urls = hot_urls
+        self.random = random.Random(seed)
+        self._serial = itertools.count()
+
+    def _hot(self) -> str:
+        return f"{self.base_url}/watch/hot{self.random.randrange(self.hot_urls)}"
+
+    def next(self) -> Tuple[str, str, Dict[str, Any]]:
+        """(kind, path, json body)"""
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        serial = next(self._serial)
+        if kind == 'extract_hot':
+            return kind, '/api/extract', {'url': self._hot()}
+        if kind == 'extract_cold':
+            return kind, '/api/extract', {'url': f"{self.base_url}/watch/cold{serial}"}
+        if kind == 'extract_fallback':
+            return kind, '/api/extract', {'url': f"{self.base_url}/pages/plain.html?n={serial}", 'enrich': False}
+        if kind == 'extract_metadata':
+            return kind, '/api/extract', {'url': f"{self.base_url}/pages/og.html?n={serial}"}
+        if kind == 'extract_playlist':
+            return kind, '/api/extract', {'url': f"{self.base_url}/media/large.m3u8?n={serial}"}
+        if kind == 'download':
+            return kind, '/api/download', {'url': self._hot(), 'format_id': 'c720'}
+        if kind == 'subtitles':
+            return kind, '/api/subtitles', {'url': self._hot()}
+        return kind, '/api/convert', {'url': self._hot(), 'format': self.random.choice(['mp3', 'm4a', 'mp4'])}
+
+
+def parse_weights(mix: str, overrides: Optional[str], hot_ratio: Optional[float]) -> Dict[str, float]:
+    """Named mix, then kind=weight overrides, then the hot share of hot+cold extracts"""
+    weights = dict(MIXES[mix])
+    for item in filter(None, (overrides or '').split(',')):
+        kind, _, value = item.partition('=')
+        if kind.strip() not in weights:
+            raise SystemExit(f"Unknown request kind: {kind}")
+        weights[kind.strip()] = float(value)
+    if hot_ratio is not None:
+        total = weights['extract_hot'] + weights['extract_cold']
+        weights['extract_hot'] = total * hot_ratio
+        weights['extract_cold'] = total * (1 - hot_ratio)
+    return weights
+
+
+def parse_stages(text: str) -> List[Tuple[float, float]]:
+    """'30s:8,2m:16' -> [(30.0, 8.0), (120.0, 16.0)]: duration and users or requests/s"""
+    stages = []
+    for item in text.split(','):
+        duration, _, level = item.strip().partition(':')
+        seconds = float(duration[:-1]) * 60 if duration.endswith('m') else float(duration.rstrip('s'))
+        stages.append((seconds, float(level)))
+    return stages
+
+
+class LoadRun:
+    """Shared state of one run: the current stage and every completed request"""
+
+    def __init__(self, session, base_url: str, mix: TrafficMix, timeout: float):
+        self.session = session
+        self.base_url = base_url
+        self.mix = mix
+        self.timeout = timeout
+        self.stage = 0
+        self.results: List[Tuple[int, str, float, str]] = []
+        self.outstanding = 0
+        self.dropped: Dict[int, int] = defaultdict(int)
+
+    async def request(self) -> None:
+        import aiohttp
+
+        stage = self.stage
+        kind, path, body = self.mix.next()
+        self.outstanding += 1
+        started = time.perf_counter()
+        try:
+            async with self.session.post(self.base_url + path, json=body,
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                await response.read()
+                status = str(response.status)
+        except asyncio.TimeoutError:
+            status = 'timeout'
+        except Exception as e:
+            status = f"error:{type(e).__name__}"
+        finally:
+            self.outstanding -= 1
+        self.results.append((stage, kind, time.perf_counter() - started, status))
+
+
+async def run_closed(run: LoadRun, stages: List[Tuple[float, float]]) -> None:
+    """Each user sends its next request as soon as the previous one returns"""
+    users: List[asyncio.Task] = []
+    target = [0]
+
+    async def user(index: int):
+        while index < target[0]:
+            await run.request()
+
+    for stage, (duration, level) in enumerate(stages):
+        run.stage = stage
+        target[0] = int(level)
+        users = [task for task in users if not task.done()]
+        for index in range(len(users), target[0]):
+            users.append(asyncio.create_task(user(index)))
+        await asyncio.sleep(duration)
+    target[0] = 0
+    await asyncio.gather(*users, return_exceptions=True)
+
+
+async def run_open(run: LoadRun, stages: List[Tuple[float, float]], max_outstanding: int) -> None:
+    """Poisson arrivals at each stage's rate, regardless of how fast responses come back"""
+    rng = random.Random(0)
+    pending = set()
+    loop = asyncio.get_running_loop()
+    for stage, (duration, rate) in enumerate(stages):
+        run.stage = stage
+        ends = loop.time() + duration
+        next_arrival = loop.time()
+        while True:
+            next_arrival += rng.expovariate(rate)
+            if next_arrival >= ends:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+            if run.outstanding >= max_outstanding:
+                run.dropped[stage] += 1
+                continue
+            task = asyncio.create_task(run.request())
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.sleep(max(0.0, ends - loop.time()))
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def poll_server_stats(session, base_url: str, run: LoadRun, interval: float,
+                            samples: List[Dict[str, Any]]) -> None:
+    """Worker RSS, CPU share and loop lag over each polling interval"""
+    previous = None
+    while True:
+        try:
+            async with session.get(base_url + STATS_PATH) as response:
+                stats = await response.json()
+        except Exception:
+            stats = None
+        if stats and previous:
+            elapsed = stats['monotonic'] - previous['monotonic']
+            samples.append({
+                'stage': run.stage,
+                'rss_kb': stats['rss_kb'],
+                'cpu_percent': round((stats['cpu_seconds'] - previous['cpu_seconds']) / elapsed * 100, 1) if elapsed else 0.0,
+                'threads': stats['threads'],
+                'tasks': stats['tasks'],
+                'loop_lag_ms': stats['loop_lag_ms'],
+            })
+        previous = stats or previous
+        await asyncio.sleep(interval)
+
+
+def summarize_stage(stage: int, duration: float, level: float, mode: str, results, server_samples,
+                    dropped: int) -> Dict[str, Any]:
+    stage_results = [item for item in results if item[0] == stage]
+    statuses: Dict[str, int] = defaultdict(int)
+    by_kind: Dict[str, List[float]] = defaultdict(list)
+    for _, kind, latency, status in stage_results:
+        statuses[status] += 1
+        by_kind[kind].append(latency)
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    completed = len(stage_results)
+    samples = [sample for sample in server_samples if sample['stage'] == stage]
+    lag_p99 = [sample['loop_lag_ms'].get('p99', 0.0) for sample in samples if sample['loop_lag_ms']]
+    lag_max = [sample['loop_lag_ms'].get('max', 0.0) for sample in samples if sample['loop_lag_ms']]
+
+    return {
+        'stage': stage,
+        'duration_s': duration,
+        'users' if mode == 'closed' else 'offered_rps': level,
+        'completed': completed,
+        'dropped': dropped,
+        'throughput_rps': round(completed / duration, 2),
+        'error_rate': round(errors / completed, 4) if completed else 0.0,
+        'statuses': dict(sorted(statuses.items())),
+        'latency_ms': latency_summary([item[2] for item in stage_results]),
+        'latency_by_kind_ms': {kind: latency_summary(values) for kind, values in sorted(by_kind.items())},
+        'server': {
+            'rss_kb_max': max((sample['rss_kb'] for sample in samples), default=0),
+            'cpu_percent_avg': round(sum(sample['cpu_percent'] for sample in samples) / len(samples), 1) if samples else 0.0,
+            'cpu_percent_max': max((sample['cpu_percent'] for sample in samples), default=0.0),
+            'loop_lag_p99_ms': max(lag_p99, default=0.0),
+            'loop_lag_max_ms': max(lag_max, default=0.0),
+            'max_tasks': max((sample['tasks'] for sample in samples), default=0),
+        },
+    }
+
+
+def find_saturation(stages: List[Dict[str, Any]], mode: str, slo_p99_ms: float,
+                    max_error_rate: float) -> Optional[Dict[str, Any]]:
+    """First stage that breaks the p99 or error target, or stops scaling with the load"""
+    previous = None
+    for summary in stages:
+        reason = None
+        if summary['latency_ms'].get('p99', 0) > slo_p99_ms:
+            reason = f"p99 above {slo_p99_ms:.0f}ms"
+        elif summary['error_rate'] > max_error_rate:
+            reason = f"error rate above {max_error_rate:.1%}"
+        elif mode == 'open' and summary['throughput_rps'] < 0.9 * summary['offered_rps']:
+            reason = "throughput below 90% of the offered rate"
+        elif (mode == 'closed' and previous and summary['users'] > previous['users']
+              and summary['throughput_rps'] < previous['throughput_rps'] * 1.1):
+            reason = "throughput stopped growing with more users"
+        if reason:
+            return {'stage': summary['stage'], 'reason': reason,
+                    'last_good_throughput_rps': previous['throughput_rps'] if previous else 0.0}
+        previous = summary
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_worker(session, base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(base_url + '/api/health') as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit("Worker did not become healthy")
+
+
+async def run_load_test(args, fixtures_url: str, worker_url: str) -> Dict[str, Any]:
+    import aiohttp
+
+    stages = parse_stages(args.stages)
+    weights = parse_weights(args.mix, args.weights, args.hot_ratio)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await wait_for_worker(session, worker_url)
+        run = LoadRun(session, worker_url, TrafficMix(fixtures_url, weights, args.hot_urls, args.seed), args.timeout)
+        server_samples: List[Dict[str, Any]] = []
+        poller = asyncio.create_task(poll_server_stats(session, worker_url, run, args.stats_interval, server_samples))
+        try:
+            if args.mode == 'closed':
+                await run_closed(run, stages)
+            else:
+                await run_open(run, stages, args.max_outstanding)
+        finally:
+            poller.cancel()
+
+    summaries = [
+        summarize_stage(index, duration, level, args.mode, run.results, server_samples, run.dropped[index])
+        for index, (duration, level) in enumerate(stages)
+    ]
+    return {
+        'benchmark': 'load',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'mode': args.mode,
+            'stages': args.stages,
+            'mix': args.mix,
+            'weights': weights,
+            'hot_urls': args.hot_urls,
+            'ytdlp_latency_ms': args.ytdlp_latency_ms,
+            'slo_p99_ms': args.slo_p99_ms,
+            'max_error_rate': args.max_error_rate,
+        },
+        'stages': summaries,
+        'saturation': find_saturation(summaries, args.mode, args.slo_p99_ms, args.max_error_rate),
+        'server_samples': server_samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test for one API worker")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                        help="closed: stage level is concurrent users; open: requests per second")
+    parser.add_argument('--stages', default='20s:4,20s:8,20s:16,20s:32', help="Ramp schedule, duration:level,...")
+    parser.add_argument('--mix', choices=sorted(MIXES), default='default', help="Named traffic mix")
+    parser.add_argument('--weights', help="Override mix weights, e.g. extract_cold=30,convert=0")
+    parser.add_argument('--hot-ratio', type=float, help="Share of extracts that hit the hot URL set")
+    parser.add_argument('--hot-urls', type=int, default=20, help="Size of the hot URL set")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60, help="Client timeout per request")
+    parser.add_argument('--max-outstanding', type=int, default=2000, help="Open loop: drop arrivals beyond this")
+    parser.add_argument('--ytdlp-latency-ms', type=float, default=200)
+    parser.add_argument('--admission', action='store_true', help="Keep admission control on in the worker")
+    parser.add_argument('--target', help="Use an already running benchmarks.load_server instead of starting one")
+    parser.add_argument('--fixtures-port', type=int, default=0)
+    parser.add_argument('--stats-interval', type=float, default=1.0)
+    parser.add_argument('--slo-p99-ms', type=float, default=2000)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--worker-log', help="Worker stdout/stderr (default: a file in the temp dir)")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    from benchmarks.fixtures import FixtureServer
+
+    fixtures = FixtureServer(args.fixtures_port).start()
+    worker = None
+    worker_url = args.target
+    try:
+        if not worker_url:
+            port = free_port()
+            command = [
+                sys.executable, '-m', 'benchmarks.load_server', '--port', str(port),
+                '--fixtures-url', fixtures.base_url, '--ytdlp-latency-ms', str(args.ytdlp_latency_ms),
+            ] + (['--admission'] if args.admission else [])
+            worker_log = args.worker_log or str(Path(tempfile.gettempdir()) / f'load-worker-{port}.log')
+            print(f"Worker log: {worker_log}", file=sys.stderr)
+            with open(worker_log, 'w') as log:
+                worker = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+            worker_url = f"http://127.0.0.1:{port}"
+        report = asyncio.run(run_load_test(args, fixtures.base_url, worker_url))
+    finally:
+        if worker is not None:
+            worker.terminate()
+            worker.wait(timeout=30)
+        fixtures.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    print(json.dumps({'stages': [
+        {key: stage[key] for key in ('stage', 'users', 'offered_rps', 'throughput_rps', 'error_rate', 'latency_ms', 'server')
+         if key in stage}
+        for stage in report['stages']
+    ], 'saturation': report['saturation']}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
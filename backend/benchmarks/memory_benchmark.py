@@ -0,0 +1,142 @@
+"""
+Memory cost of cached extractions
+Runs synthetic yt-dlp info dicts (micro_benchmark.build_info plus a long
+description) through the real get_video_info into an ExtractionCache and
+reports the bytes retained per cached video, measured with tracemalloc, for
+the untrimmed dict layout, trimmed descriptions, and the compact store
+
+Usage (from the backend directory):
+    python -m benchmarks.memory_benchmark
+    python -m benchmarks.memory_benchmark --videos 2000 --formats 200 --output memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    'dict': {'trim': False, 'compact': False},
+    'trimmed': {'trim': True, 'compact': False},
+    'compact': {'trim': True, 'compact': True},
+}
+
+
+class SyntheticExtractor:
+    """yt_dlp stand-in returning a distinct recorded-shape info dict per URL"""
+
+    def __init__(self, format_count: int, description_chars: int):
+        self.format_count = format_count
+        self.description = ('Chapters, credits, links and sponsor notes. ' * (description_chars // 44 + 1))[:description_chars]
+
+    def info(self, url: str, format_id: Optional[str] = None) -> Dict[str, Any]:
+        from benchmarks.micro_benchmark import build_info
+
+        seed = int(url.rsplit('/', 1)[-1])
+        info = build_info(self.format_count, seed=seed)
+        info.update({
+            'id': f"video{seed:06d}",
+            'title': f"Synthetic video {seed}",
+            'description': f"{seed} {self.description}",
+            'thumbnail': f"https://i.ytimg.com/vi/video{seed:06d}/maxresdefault.jpg",
+            'uploader': 'Benchmark Channel',
+            'view_count': seed * 17,
+            'like_count': seed,
+            'upload_date': '20240101',
+            'webpage_url': url,
+        })
+        chosen = info['formats'][-1]
+        info.update({'url': chosen['url'], 'ext': chosen['ext'], 'filesize': chosen.get('filesize')})
+        return info
+
+
+def run_mode(name: str, videos: int) -> Dict[str, Any]:
+    from services import ytdlp_service
+    from services.cache_service import ExtractionCache
+
+    settings = MODES[name]
+    default_limit = ytdlp_service.DESCRIPTION_MAX_CHARS
+    if not settings['trim']:
+        ytdlp_service.DESCRIPTION_MAX_CHARS = 0
+    cache = ExtractionCache(max_entries=videos, ttl=3600, compact=settings['compact'])
+
+    try:
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        entries = []
+        started = time.perf_counter()
+        for index in range(videos):
+            data = ytdlp_service.get_video_info(f"https://www.youtube.com/watch/{index}")
+            entries.append(cache.set(f"key-{index}", {'success': True, 'method': 'yt-dlp', 'data': data}))
+        extract_seconds = time.perf_counter() - started
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        ytdlp_service.DESCRIPTION_MAX_CHARS = default_limit
+
+    # Cost of turning a stored entry back into the response dict (the
+    # synthetic signed URLs are long expired, so entries are read directly)
+    sample_entries = entries[:200]
+    started = time.perf_counter()
+    for entry in sample_entries:
+        entry.payload
+    expand_us = (time.perf_counter() - started) / len(sample_entries) * 1e6
+
+    sample = entries[0].payload
+    return {
+        'bytes_per_video': round((after - before) / videos),
+        'total_mb': round((after - before) / 1048576, 2),
+        'peak_mb': round((peak - before) / 1048576, 2),
+        'formats_per_video': len(sample['data']['formats']),
+        'description_chars': len(sample['data']['description']),
+        'extract_ms': round(extract_seconds / videos * 1000, 3),
+        'payload_us': round(expand_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes retained per cached extraction")
+    parser.add_argument('--videos', type=int, default=1000, help="Extractions kept in the cache")
+    parser.add_argument('--formats', type=int, default=100, help="Raw formats per info dict")
+    parser.add_argument('--description-chars', type=int, default=5000, help="Raw description length")
+    parser.add_argument('--mode', action='append', choices=sorted(MODES), help="Only these modes")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    # Every synthetic URL is on youtube.com, which our own limiter would throttle
+    os.environ['UPSTREAM_LIMITER_ENABLED'] = 'false'
+    from benchmarks import fake_ytdlp
+
+    fake_ytdlp.install_extractor(SyntheticExtractor(args.formats, args.description_chars))
+
+    results = {name: run_mode(name, args.videos) for name in (args.mode or MODES)}
+    report = {
+        'benchmark': 'memory',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'videos': args.videos,
+        'raw_formats': args.formats,
+        'modes': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+
+    for name, result in results.items():
+        print(f"{name:8s} {result['bytes_per_video']:9d} B/video  {result['total_mb']:8.2f} MB total  "
+              f"peak {result['peak_mb']:8.2f} MB  payload {result['payload_us']:7.2f} us  "
+              f"({result['formats_per_video']} formats, {result['description_chars']} chars)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Micro-benchmarks for the pure-Python code that runs on every request
+Format processing over recorded-shape yt-dlp info dicts (50 to 2000 formats),
+size formatting, subtitle language names, HTML media discovery and HLS
+parsing. Timings are divided by a fixed calibration workload measured right
+next to them so baselines stay comparable across machines, and --check fails
+when a case regresses past its tolerance (the noise seen while recording the
+baseline, at least --threshold percent)
+
+Usage (from the backend directory):
+    python -m benchmarks.micro_benchmark --check
+    python -m benchmarks.micro_benchmark --save-baseline
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Dict, Any, Callable, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines' / 'micro_benchmark.json'
+
+FORMAT_COUNTS = (50, 200, 500, 2000)
+
+# (height, width, fps, vcodec) ladder of a typical YouTube/Vimeo response
+VIDEO_LADDER = [
+    (144, 256, 30, 'avc1.4d400c'), (240, 426, 30, 'avc1.4d4015'), (360, 640, 30, 'avc1.4d401e'),
+    (480, 854, 30, 'avc1.4d401f'), (720, 1280, 30, 'avc1.64001f'), (720, 1280, 60, 'vp09.00.40.08'),
+    (1080, 1920, 30, 'avc1.640028'), (1080, 1920, 60, 'vp09.00.41.08'), (1440, 2560, 60, 'vp09.00.50.08'),
+    (2160, 3840, 60, 'av01.0.12M.08'),
+]
+PROTOCOLS = ('https', 'm3u8_native', 'http_dash_segments')
+SUBTITLE_LANGUAGES = [
+    'en', 'es', 'fr', 'de', 'it', 'pt', 'ru', 'ja', 'ko', 'zh', 'ar', 'hi', 'nl', 'sv', 'pl', 'tr',
+] + [f"{a}{b}" for a in 'abcdefghi' for b in 'klmnopqrstuvwx'][:134]
+
+
+def build_format(rng: random.Random, index: int) -> Dict[str, Any]:
+    """One format dict with the keys and value sizes yt-dlp produces"""
+    kind = rng.random()
+    protocol = PROTOCOLS[index % len(PROTOCOLS)]
+    signature = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(40))
+    url = (f"https://rr{index % 8}---sn-abc.googlevideo.com/videoplayback?expire=1735689600&ei={signature}"
+           f"&itag={index}&source=youtube&requiressl=yes&mime=video%2Fmp4&dur=612.3&lmt=17000000{index:05d}"
+           f"&sig={signature * 4}")
+    fmt = {
+        'format_id': f"{index}-{protocol}",
+        'format_note': '',
+        'url': url,
+        'protocol': protocol,
+        'ext': 'mp4',
+        'quality': rng.randint(-1, 10),
+        'source_preference': rng.randint(-10, 0),
+        'has_drm': False,
+        'language': None,
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/125.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-us,en;q=0.5',
+            'Sec-Fetch-Mode': 'navigate',
+        },
+        'downloader_options': {'http_chunk_size': 10485760},
+    }
+    if kind < 0.2:
+        abr = rng.choice((48, 70, 128, 160, 256))
+        fmt.update({
+            'acodec': rng.choice(('mp4a.40.2', 'opus')), 'vcodec': 'none', 'abr': abr, 'asr': 48000,
+            'ext': rng.choice(('m4a', 'webm')), 'format_note': 'medium', 'audio_channels': 2,
+            'filesize': abr * 76000 if rng.random() < 0.7 else None,
+        })
+    else:
+        height, width, fps, vcodec = VIDEO_LADDER[rng.randrange(len(VIDEO_LADDER))]
+        combined = kind > 0.85
+        tbr = height * rng.uniform(3.0, 6.0)
+        fmt.update({
+            'height': height, 'width': width, 'fps': fps, 'vcodec': vcodec,
+            'acodec': 'mp4a.40.2' if combined else 'none', 'tbr': round(tbr, 3),
+            'dynamic_range': 'SDR', 'aspect_ratio': 1.78, 'format_note': f"{height}p",
+            'resolution': f"{width}x{height}",
+            'filesize': int(tbr * 76000) if rng.random() < 0.5 else None,
+            'filesize_approx': int(tbr * 77000),
+        })
+        if protocol == 'http_dash_segments':
+            fmt['fragments'] = [{'url': f"{url}&range={n * 100000}-{n * 100000 + 99999}", 'duration': 5.0}
+                                for n in range(20)]
+    return fmt
+
+
+def build_info(format_count: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {
+        'id': 'dQw4w9WgXcQ',
+        'title': 'Recorded benchmark video',
+        'extractor_key': 'Youtube',
+        'duration': 612,
+        'formats': [build_format(rng, index) for index in range(format_count)],
+    }
+
+
+def calibration_workload() -> None:
+    """Fixed mix of dict building, sorting and string formatting, like the code under test"""
+    items = [{'a': i % 97, 'b': i * 31 % 1009, 'c': f"item-{i}"} for i in range(500)]
+    ordered = sorted(items, key=lambda item: (item['a'], item['b']), reverse=True)
+    seen = set()
+    for item in ordered:
+        key = f"{item['a']}p"
+        if key not in seen:
+            seen.add(key)
+
+
+def build_cases() -> Dict[str, Callable[[], Any]]:
+    from services.ytdlp_service import process_formats, format_file_size
+    from services.subtitle_service import get_language_name
+    from services.media_discovery import discover_media
+    from services.metadata_service import build_page_metadata
+    from services.direct_media_service import parse_hls_playlist
+    from benchmarks.fixtures import build_page, OG_PAGE, PLAIN_PAGE, LARGE_MEDIA_PLAYLIST
+
+    cases: Dict[str, Callable[[], Any]] = {}
+    for count in FORMAT_COUNTS:
+        info = build_info(count)
+        cases[f"process_formats[{count}]"] = lambda info=info: process_formats(info['formats'], info)
+
+    sizes = [None, 0] + [int(1.7 ** power) for power in range(60)]
+    cases['format_file_size[62]'] = lambda: [format_file_size(size) for size in sizes]
+
+    # Manual subtitles plus auto-translated captions, two formats each
+    languages = SUBTITLE_LANGUAGES * 2
+    cases[f"get_language_name[{len(languages)}]"] = lambda: [get_language_name(lang) for lang in languages]
+
+    og_page = build_page(OG_PAGE).decode()
+    plain_page = build_page(PLAIN_PAGE).decode()
+    large_page = build_page(OG_PAGE, paragraphs=2000).decode()
+    cases['discover_media[og]'] = lambda: discover_media(og_page)
+    cases['discover_media[plain]'] = lambda: discover_media(plain_page)
+    cases['discover_media[large]'] = lambda: discover_media(large_page)
+    og_discovery = discover_media(og_page)
+    cases['build_page_metadata[og]'] = lambda: build_page_metadata(og_discovery, 'https://example.com/watch')
+    cases['parse_hls_playlist[5000]'] = lambda: parse_hls_playlist(LARGE_MEDIA_PLAYLIST, 'https://cdn.example.com/v/')
+    return cases
+
+
+def loop_count(timer: timeit.Timer, min_time: float) -> int:
+    """Loops per timing run so one run takes about min_time seconds"""
+    number, elapsed = timer.autorange()
+    return max(1, int(number * min_time / max(elapsed, 1e-9)))
+
+
+def measure(func: Callable[[], Any], rounds: int, repeat: int, min_time: float) -> Dict[str, float]:
+    """
+    Per-call time in microseconds relative to the calibration workload
+    Rounds alternate calibration and case runs; load only ever slows a run
+    down, so the fastest case run over the fastest calibration run is the
+    steadiest ratio
+    """
+    func()
+    timer = timeit.Timer(func)
+    calibration_timer = timeit.Timer(calibration_workload)
+    number = loop_count(timer, min_time)
+    calibration_number = loop_count(calibration_timer, min_time / 2)
+    runs, calibrations = [], []
+    for _ in range(rounds):
+        calibrations.extend(value / calibration_number * 1e6
+                            for value in calibration_timer.repeat(repeat=repeat, number=calibration_number))
+        runs.extend(value / number * 1e6 for value in timer.repeat(repeat=repeat, number=number))
+    return {
+        'best_us': round(min(runs), 3),
+        'median_us': round(statistics.median(runs), 3),
+        'loops': number,
+        'calibration_us': round(min(calibrations), 3),
+        'relative': round(min(runs) / min(calibrations), 4),
+    }
+
+
+def run_benchmark(selected: List[str], rounds: int, repeat: int, min_time: float) -> Dict[str, Any]:
+    cases = build_cases()
+    results = {}
+    for name, func in cases.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(func, rounds, repeat, min_time)
+    return {
+        'benchmark': 'micro',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': results,
+    }
+
+
+def build_baseline(reports: List[Dict[str, Any]], threshold: float) -> Dict[str, Any]:
+    """
+    Median of several full runs; each case's tolerance is four times the
+    median deviation between those runs (never below threshold), so a
+    single disturbed run neither shifts the baseline nor widens the gate
+    """
+    baseline = dict(reports[-1], runs=len(reports))
+    for name, timing in baseline['cases'].items():
+        relatives = [report['cases'][name]['relative'] for report in reports]
+        median = statistics.median(relatives)
+        deviation = statistics.median(abs(relative / median - 1) for relative in relatives) * 100
+        baseline['cases'][name] = dict(timing, relative=round(median, 4),
+                                       tolerance_percent=round(max(threshold, 4 * deviation), 1))
+    return baseline
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Cases whose calibrated time grew by more than their tolerance (threshold when the baseline has none)"""
+    regressions = []
+    for name, timing in report['cases'].items():
+        reference = baseline.get('cases', {}).get(name)
+        if not reference:
+            continue
+        limit = max(threshold, reference.get('tolerance_percent', threshold))
+        change = (timing['relative'] / reference['relative'] - 1) * 100
+        timing['change_percent'] = round(change, 1)
+        if change > limit:
+            regressions.append({'case': name, 'change_percent': round(change, 1), 'limit_percent': limit,
+                                'baseline_relative': reference['relative'], 'relative': timing['relative']})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for per-request pure-Python paths")
+    parser.add_argument('--filter', action='append', help="Only cases whose name contains this")
+    parser.add_argument('--rounds', type=int, default=5, help="Alternating calibration/case rounds per case")
+    parser.add_argument('--repeat', type=int, default=3, help="Timing runs per side of each round")
+    parser.add_argument('--min-time', type=float, default=0.1, help="Minimum seconds per timing run")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--check', action='store_true', help="Exit 1 when a case regresses past --threshold")
+    parser.add_argument('--threshold', type=float, default=25.0,
+                        help="Allowed regression in percent (cases noisier than this get their own tolerance)")
+    parser.add_argument('--baseline-runs', type=int, default=5, help="Full runs combined by --save-baseline")
+    parser.add_argument('--retries', type=int, default=3, help="Re-measure regressed cases this many times")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    report = run_benchmark(args.filter or [], args.rounds, args.repeat, args.min_time)
+
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if args.check:
+        if not baseline_path.exists():
+            raise SystemExit(f"No baseline at {baseline_path}, run with --save-baseline first")
+        baseline = json.loads(baseline_path.read_text())
+        regressions = compare(report, baseline, args.threshold)
+        # A noisy neighbour can slow any single run, so a regression has to reproduce
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            rerun = run_benchmark([item['case'] for item in regressions], args.rounds, args.repeat, args.min_time)
+            for name, timing in rerun['cases'].items():
+                if timing['relative'] < report['cases'][name]['relative']:
+                    report['cases'][name] = timing
+            regressions = compare(report, baseline, args.threshold)
+        report['regressions'] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    if args.save_baseline:
+        reports = [report] + [run_benchmark(args.filter or [], args.rounds, args.repeat, args.min_time)
+                              for _ in range(args.baseline_runs - 1)]
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(build_baseline(reports, args.threshold), indent=2) + '\n')
+
+    for name, timing in report['cases'].items():
+        change = f"  {timing['change_percent']:+.1f}%" if 'change_percent' in timing else ''
+        print(f"{name:32s} {timing['best_us']:12.2f} us  x{timing['relative']:.3f}{change}")
+    if regressions:
+        for item in regressions:
+            print(f"REGRESSION {item['case']}: {item['change_percent']:+.1f}% (limit {item['limit_percent']:.0f}%)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
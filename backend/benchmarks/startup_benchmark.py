@@ -0,0 +1,120 @@
+"""
+Startup benchmark for the API process
+Measures import time and resident memory of one worker in a fresh interpreter,
+with and without the warm-up phase, so the numbers can be tracked across releases
+
+Usage (from the backend directory):
+    python -m benchmarks.startup_benchmark --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Executed in a fresh interpreter for every run
+CHILD_SCRIPT = r'''
+import json, sys, time
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+result = {'baseline_rss_kb': rss_kb()}
+started = time.perf_counter()
+import server
+result['import_ms'] = (time.perf_counter() - started) * 1000
+result['import_rss_kb'] = rss_kb()
+
+from services.warmup import HEAVY_MODULES, warm_up_services
+result['heavy_modules_after_import'] = [m for m in HEAVY_MODULES if m in sys.modules]
+
+if WARMUP:
+    started = time.perf_counter()
+    warm_up_services()
+    result['warmup_ms'] = (time.perf_counter() - started) * 1000
+    result['warmup_rss_kb'] = rss_kb()
+
+print(json.dumps(result))
+'''
+
+
+def run_once(warmup: bool) -> Dict[str, Any]:
+    """Run a single measurement in a child interpreter"""
+    script = f"WARMUP = {warmup!r}\n" + CHILD_SCRIPT
+    env = dict(os.environ, WARMUP_ON_STARTUP='false', PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    # server.py logs to stderr, the JSON result is the last stdout line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples: List[Dict[str, Any]], key: str) -> Dict[str, float]:
+    """Median/min/max of one metric across runs"""
+    values = [s[key] for s in samples if s.get(key) is not None]
+    if not values:
+        return {}
+    return {
+        'median': round(statistics.median(values), 1),
+        'min': round(min(values), 1),
+        'max': round(max(values), 1),
+    }
+
+
+def run_benchmark(runs: int) -> Dict[str, Any]:
+    """Collect cold-start numbers for plain import and import plus warm-up"""
+    cold = [run_once(warmup=False) for _ in range(runs)]
+    warm = [run_once(warmup=True) for _ in range(runs)]
+
+    return {
+        'benchmark': 'startup',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': runs,
+        'cold': {
+            'import_ms': summarize(cold, 'import_ms'),
+            'import_rss_kb': summarize(cold, 'import_rss_kb'),
+            'baseline_rss_kb': summarize(cold, 'baseline_rss_kb'),
+            'heavy_modules_after_import': cold[0]['heavy_modules_after_import'],
+        },
+        'warm': {
+            'import_ms': summarize(warm, 'import_ms'),
+            'warmup_ms': summarize(warm, 'warmup_ms'),
+            'warmup_rss_kb': summarize(warm, 'warmup_rss_kb'),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API worker import time and RSS")
+    parser.add_argument('--runs', type=int, default=5, help="Runs per scenario")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs)
+    text = json.dumps(report, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
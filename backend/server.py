@@ -1,28 +1,116 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, HttpUrl
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from contextlib import asynccontextmanager
 import asyncio
-
-# Import our services
-from services.ytdlp_service import get_video_info, get_direct_download_url
-from services.playwright_service import extract_with_playwright, scrape_with_beautifulsoup
-from services.converter_service import convert_media, get_supported_formats
-from services.subtitle_service import get_subtitles
+import time
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Create the main app
-app = FastAPI(title="ReloadTheGraphics Video Downloader API")
-
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+# Import our services (heavy libraries are loaded lazily inside the services)
+from services.ytdlp_service import (
+    get_video_info,
+    get_direct_download_url,
+    is_fast_mode_enabled,
+    PROFILE_FULL,
+    PROFILE_FAST,
+)
+from services.playwright_service import extract_with_playwright, scrape_with_beautifulsoup
+from services.converter_service import (
+    convert_media,
+    get_supported_formats,
+    conversion_cache,
+    conversion_key,
+    prepare_conversion,
+)
+from services.subtitle_service import (
+    get_subtitles,
+    get_subtitle_tracks,
+    fetch_subtitle,
+    stream_subtitle_archive,
+    get_subtitle_stats,
+    SubtitleNotFound,
+    SUBTITLE_MAX_LANGUAGES,
+)
+from services.subtitle_converter import TARGET_FORMATS as SUBTITLE_FORMATS
+from services.direct_media_service import looks_like_direct_media, probe_direct_media
+from services.metadata_service import extract_page_metadata
+from services.warmup import is_warmup_enabled, warm_up_services
+from services.http_client import start_http_client, close_http_client, get_pool_stats
+from services.cache_service import (
+    CacheEntry,
+    canonicalize_url,
+    extraction_cache,
+    extraction_flight,
+    CACHE_FRESH,
+    CACHE_STALE,
+)
+from services.enrichment_service import is_enrichment_enabled, enrich_formats
+from services.thumbnail_service import get_thumbnail
+from services.database import (
+    init_database,
+    close_database,
+    bootstrap_indexes,
+    start_writers,
+    stop_writers,
+    database_health,
+    get_writer_stats,
+)
+from services.telemetry_service import record_extraction
+from services.warmer_service import cache_warmer, is_warmer_enabled
+from services.upstream_limiter import upstream_limiter, KNOWN_PLATFORMS
+from services.tracing_service import TracingMiddleware, current_span, span, get_tracing_stats
+from services.profiler_service import (
+    ProfilerMiddleware,
+    profile_store,
+    render_collapsed,
+    summarize_profile,
+    is_admin_enabled,
+    check_admin_token,
+    get_profiler_stats,
+)
+from services.response_service import (
+    CompressionMiddleware,
+    content_etag,
+    etag_matches,
+    sse_event,
+    version_etag,
+    get_compression_stats,
+)
+from services.metrics_service import (
+    MetricsMiddleware,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    is_metrics_enabled,
+    level_timer,
+    record_extraction_outcome,
+    render_metrics,
+    stats_collector,
+)
+from services.cluster_service import (
+    cluster,
+    check_cluster_token,
+    forwarded_request,
+    get_cluster_stats,
+    RemoteExtractionError,
+    TOKEN_HEADER as CLUSTER_TOKEN_HEADER,
+)
+from services.admission_service import admission, AdmissionRejected, CHEAP, EXTRACT, BROWSER, ENCODE
+from services.history_service import (
+    is_history_enabled,
+    is_valid_session_id,
+    record_history,
+    list_history,
+    clear_history,
+    find_thumbnail,
+    recent_canonical_urls,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -31,10 +119,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Proxies in front of the app that append to X-Forwarded-For (0 = use the socket address)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+EXTRACT_DEADLINE_SECONDS = float(os.environ.get('EXTRACT_DEADLINE_SECONDS', '90'))
+ENRICH_TIMEOUT = float(os.environ.get('ENRICH_TIMEOUT', '2'))
+EXTRACT_STREAM_BATCH = int(os.environ.get('EXTRACT_STREAM_BATCH', '10'))
+EXTRACT_STREAM_HEARTBEAT = float(os.environ.get('EXTRACT_STREAM_HEARTBEAT', '15'))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    await start_http_client()
+    init_database()
+    await bootstrap_indexes()
+    start_writers()
+    if is_warmup_enabled():
+        logger.info("Warming up extraction services...")
+        timings = await asyncio.to_thread(warm_up_services)
+        logger.info(f"Warm-up complete: {timings}")
+    if is_warmer_enabled():
+        if is_history_enabled():
+            try:
+                cache_warmer.seed(await recent_canonical_urls(cache_warmer.top_k))
+            except Exception as e:
+                logger.warning(f"Cache warmer seeding failed: {str(e)}")
+        cache_warmer.start(compute_extraction)
+    cluster.start()
+    yield
+    await cluster.stop()
+    await cache_warmer.stop()
+    await stop_writers()
+    close_database()
+    await close_http_client()
+
+
+# Create the main app
+# orjson serializes the large extraction payloads several times faster than stdlib json
+app = FastAPI(title="ReloadTheGraphics Video Downloader API", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
+
+# Create a router with the /api prefix
+api_router = APIRouter(prefix="/api")
+
 
 # Pydantic Models
 class ExtractRequest(BaseModel):
     url: str
+    enrich: Optional[bool] = None
+    fast: Optional[bool] = None
 
 
 class DownloadRequest(BaseModel):
@@ -62,7 +195,7 @@ async def root():
         "version": "2.0",
         "status": "operational",
         "features": [
-            "Multi-level extraction (yt-dlp, Playwright, BeautifulSoup)",
+            "Multi-level extraction (yt-dlp, page metadata, Playwright, BeautifulSoup)",
             "1000+ platforms supported",
             "Multiple quality options",
             "Direct download links",
@@ -71,113 +204,188 @@ async def root():
     }
 
 
-@api_router.post("/extract")
-async def extract_video(request: ExtractRequest):
+async def run_extraction_waterfall(url: str, profile: str = PROFILE_FULL) -> Dict[str, Any]:
     """
     Extract video information from URL using multi-level waterfall approach
+    profile selects the yt-dlp options (PROFILE_FAST skips manifests)
     
+    Level 0: Direct media links (.mp4/.webm/.m3u8, single ranged GET)
     Level 1: yt-dlp (primary, supports 1000+ platforms)
-    Level 2: Playwright (browser automation fallback)
-    Level 3: BeautifulSoup (HTML parsing fallback)
+    Level 2: Page metadata (OpenGraph, JSON-LD, oEmbed, no browser)
+    Level 3: Playwright (browser automation fallback)
+    Level 4: BeautifulSoup (HTML parsing fallback)
     """
-    url = request.url.strip()
-    
-    if not url:
-        raise HTTPException(status_code=400, detail="URL is required")
-    
     logger.info(f"Starting extraction for URL: {url}")
     
+    # Level 0: Direct media links skip yt-dlp and the browser entirely
+    if looks_like_direct_media(url):
+        try:
+            with level_timer('direct') as level:
+                logger.info("Level 0: Probing direct media link...")
+                direct_result = await probe_direct_media(url)
+                
+                if direct_result:
+                    logger.info(f"✅ Direct media SUCCESS: {direct_result['formats'][0]['ext']}")
+                    level.success()
+                    return {
+                        "success": True,
+                        "method": "direct",
+                        "data": direct_result
+                    }
+        except Exception as e:
+            logger.warning(f"Level 0 failed: {str(e)}")
+    
     # Level 1: Try yt-dlp first (most comprehensive)
     try:
-        logger.info("Level 1: Attempting yt-dlp extraction...")
-        video_info = get_video_info(url)
-        
-        if video_info and video_info.get('formats'):
-            logger.info(f"✅ yt-dlp SUCCESS: Found {len(video_info['formats'])} formats")
-            return JSONResponse(content={
-                "success": True,
-                "method": "yt-dlp",
-                "data": video_info
-            })
+        with level_timer('ytdlp' if profile == PROFILE_FULL else f"ytdlp_{profile}") as level:
+            logger.info(f"Level 1: Attempting yt-dlp extraction ({profile})...")
+            video_info = await asyncio.to_thread(get_video_info, url, profile)
+            
+            if video_info and video_info.get('formats'):
+                logger.info(f"✅ yt-dlp SUCCESS: Found {len(video_info['formats'])} formats")
+                level.success()
+                return {
+                    "success": True,
+                    "method": "yt-dlp",
+                    "data": video_info
+                }
     except Exception as e:
         logger.warning(f"Level 1 failed: {str(e)}")
     
-    # Level 2: Try Playwright browser automation
+    # Level 2: Try page metadata before paying for a browser
     try:
-        logger.info("Level 2: Attempting Playwright extraction...")
-        proxy_key = os.environ.get('SCRAPINGBEE_API_KEY')
-        playwright_result = await extract_with_playwright(url, proxy_key)
-        
-        if playwright_result and playwright_result.get('media_links'):
-            logger.info(f"✅ Playwright SUCCESS: Found {len(playwright_result['media_links'])} media links")
+        with level_timer('metadata') as level:
+            logger.info("Level 2: Attempting page metadata extraction...")
+            metadata_result = await extract_page_metadata(url)
             
-            # Convert to standard format
-            formats = []
-            for idx, link in enumerate(playwright_result['media_links']):
-                formats.append({
-                    'format_id': f'browser_{idx}',
-                    'quality': 'Best Available',
-                    'ext': 'mp4',
-                    'url': link['url'],
-                    'has_video': True,
-                    'has_audio': True,
-                    'type': 'video',
-                    'filesize': 0,
-                    'filesize_readable': 'Unknown'
-                })
-            
-            return JSONResponse(content={
-                "success": True,
-                "method": "playwright",
-                "data": {
-                    "title": playwright_result.get('title', 'Unknown'),
-                    "platform": playwright_result.get('platform', 'Browser'),
-                    "webpage_url": url,
-                    "formats": formats,
-                    "thumbnail": "",
-                    "duration": 0
+            if metadata_result and metadata_result.get('media_links'):
+                logger.info(f"✅ Metadata SUCCESS: Found {len(metadata_result['media_links'])} media links")
+                
+                formats = []
+                for idx, link in enumerate(metadata_result['media_links']):
+                    is_audio = link['type'] == 'audio'
+                    format_data = {
+                        'format_id': f'meta_{idx}',
+                        'quality': f"{link['height']}p" if link['height'] else 'Best Available',
+                        'ext': link['ext'],
+                        'url': link['url'],
+                        'has_video': not is_audio,
+                        'has_audio': True,
+                        'type': 'audio' if is_audio else 'video',
+                        'filesize': 0,
+                        'filesize_readable': 'Unknown'
+                    }
+                    if link['width'] and link['height']:
+                        format_data['resolution'] = f"{link['width']}x{link['height']}"
+                    formats.append(format_data)
+                
+                level.success()
+                return {
+                    "success": True,
+                    "method": "metadata",
+                    "data": {
+                        "title": metadata_result.get('title', 'Unknown'),
+                        "platform": metadata_result.get('platform', 'Page Metadata'),
+                        "webpage_url": url,
+                        "formats": formats,
+                        "thumbnail": metadata_result.get('thumbnail', ''),
+                        "duration": metadata_result.get('duration', 0),
+                        "uploader": metadata_result.get('uploader') or 'Unknown'
+                    }
                 }
-            })
     except Exception as e:
         logger.warning(f"Level 2 failed: {str(e)}")
     
-    # Level 3: Try BeautifulSoup HTML parsing
+    # Level 3: Try Playwright browser automation (limited Chromium slots)
+    browser_rejection = None
     try:
-        logger.info("Level 3: Attempting BeautifulSoup extraction...")
-        bs_result = await scrape_with_beautifulsoup(url)
-        
-        if bs_result and bs_result.get('media_links'):
-            logger.info(f"✅ BeautifulSoup SUCCESS: Found {len(bs_result['media_links'])} media links")
-            
-            formats = []
-            for idx, link in enumerate(bs_result['media_links']):
-                formats.append({
-                    'format_id': f'html_{idx}',
-                    'quality': 'Available',
-                    'ext': 'mp4',
-                    'url': link['url'],
-                    'has_video': True,
-                    'has_audio': True,
-                    'type': 'video',
-                    'filesize': 0,
-                    'filesize_readable': 'Unknown'
-                })
+        with level_timer('playwright') as level:
+            logger.info("Level 3: Attempting Playwright extraction...")
+            proxy_key = os.environ.get('SCRAPINGBEE_API_KEY')
+            async with admission.admit(BROWSER):
+                playwright_result = await extract_with_playwright(url, proxy_key)
             
-            return JSONResponse(content={
-                "success": True,
-                "method": "beautifulsoup",
-                "data": {
-                    "title": bs_result.get('title', 'Unknown'),
-                    "platform": bs_result.get('platform', 'HTML'),
-                    "webpage_url": url,
-                    "formats": formats,
-                    "thumbnail": "",
-                    "duration": 0
+            if playwright_result and playwright_result.get('media_links'):
+                logger.info(f"✅ Playwright SUCCESS: Found {len(playwright_result['media_links'])} media links")
+                
+                # Convert to standard format
+                formats = []
+                for idx, link in enumerate(playwright_result['media_links']):
+                    formats.append({
+                        'format_id': f'browser_{idx}',
+                        'quality': 'Best Available',
+                        'ext': 'mp4',
+                        'url': link['url'],
+                        'has_video': True,
+                        'has_audio': True,
+                        'type': 'video',
+                        'filesize': 0,
+                        'filesize_readable': 'Unknown'
+                    })
+                
+                level.success()
+                return {
+                    "success": True,
+                    "method": "playwright",
+                    "data": {
+                        "title": playwright_result.get('title', 'Unknown'),
+                        "platform": playwright_result.get('platform', 'Browser'),
+                        "webpage_url": url,
+                        "formats": formats,
+                        "thumbnail": "",
+                        "duration": 0
+                    }
                 }
-            })
+    except AdmissionRejected as e:
+        # Browser slots are busy, the HTML scraper may still find the media
+        browser_rejection = e
+        logger.warning(f"Level 3 skipped: {str(e)}")
     except Exception as e:
         logger.warning(f"Level 3 failed: {str(e)}")
     
+    # Level 4: Try BeautifulSoup HTML parsing
+    try:
+        with level_timer('beautifulsoup') as level:
+            logger.info("Level 4: Attempting BeautifulSoup extraction...")
+            bs_result = await scrape_with_beautifulsoup(url)
+            
+            if bs_result and bs_result.get('media_links'):
+                logger.info(f"✅ BeautifulSoup SUCCESS: Found {len(bs_result['media_links'])} media links")
+                
+                formats = []
+                for idx, link in enumerate(bs_result['media_links']):
+                    formats.append({
+                        'format_id': f'html_{idx}',
+                        'quality': 'Available',
+                        'ext': 'mp4',
+                        'url': link['url'],
+                        'has_video': True,
+                        'has_audio': True,
+                        'type': 'video',
+                        'filesize': 0,
+                        'filesize_readable': 'Unknown'
+                    })
+                
+                level.success()
+                return {
+                    "success": True,
+                    "method": "beautifulsoup",
+                    "data": {
+                        "title": bs_result.get('title', 'Unknown'),
+                        "platform": bs_result.get('platform', 'HTML'),
+                        "webpage_url": url,
+                        "formats": formats,
+                        "thumbnail": "",
+                        "duration": 0
+                    }
+                }
+    except Exception as e:
+        logger.warning(f"Level 4 failed: {str(e)}")
+    
+    # Ask the client to come back rather than report a page the browser never saw
+    if browser_rejection is not None:
+        raise browser_rejection
+    
     # All methods failed
     logger.error(f"❌ All extraction methods failed for URL: {url}")
     raise HTTPException(
@@ -186,29 +394,463 @@ async def extract_video(request: ExtractRequest):
     )
 
 
+async def compute_extraction(url: str, cache_key: str, enrich: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Run the waterfall, optionally fill in unknown file sizes and cache the result
+    """
+    started = time.monotonic()
+    try:
+        shared = await cluster.fetch(cache_key, url, enrich)
+    except RemoteExtractionError as e:
+        record_extraction_outcome(None, 'failed')
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if shared is not None:
+        # Another worker or node extracted it; cache it here for as long as it stays fresh
+        result, expires_in = shared
+        if expires_in > 0:
+            extraction_cache.set(cache_key, result, ttl=expires_in, compute_time=time.monotonic() - started)
+        record_extraction_outcome(result, 'cluster')
+        return result
+    
+    try:
+        try:
+            result = await run_extraction_waterfall(url)
+        except BaseException:
+            # Browser-tier 429s and cancellation included, not only HTTPException
+            record_extraction(cache_key, {}, (time.monotonic() - started) * 1000, cached=False, success=False)
+            record_extraction_outcome(None, 'failed')
+            raise
+        
+        # Size enrichment never pushes the response past the extract deadline
+        if is_enrichment_enabled(enrich):
+            elapsed = time.monotonic() - started
+            budget = min(ENRICH_TIMEOUT, EXTRACT_DEADLINE_SECONDS - elapsed)
+            try:
+                with span('enrich', budget_s=round(budget, 2)):
+                    await enrich_formats(result['data']['formats'], budget)
+            except Exception as e:
+                logger.warning(f"Size enrichment failed: {str(e)}")
+        
+        compute_time = time.monotonic() - started
+        entry = extraction_cache.set(cache_key, result, compute_time=compute_time,
+                                     enriched=is_enrichment_enabled(enrich))
+        await cluster.publish(cache_key, result, entry.expires_at, compute_time)
+    finally:
+        # Other workers wait on the lease; publish() already handed it back on success
+        await cluster.release(cache_key)
+    record_extraction(cache_key, result, compute_time * 1000, cached=False)
+    record_extraction_outcome(result, 'extracted')
+    return result
+
+
+async def enrich_cached_entry(cache_key: str, entry: CacheEntry) -> CacheEntry:
+    """
+    Probe the unknown sizes of an entry cached without enrichment and cache
+    it again for the rest of its lifetime, so enrich requests on a hit get sizes
+    """
+    payload = entry.payload
+    try:
+        with span('enrich', budget_s=ENRICH_TIMEOUT):
+            await enrich_formats(payload['data']['formats'], ENRICH_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Size enrichment failed: {str(e)}")
+        return entry
+    # A refresh may have replaced the entry meanwhile; never overwrite it with older formats
+    if extraction_cache.peek(cache_key) is not entry or not entry.is_fresh():
+        return entry
+    return extraction_cache.set(cache_key, payload, ttl=entry.expires_at - time.time(),
+                                compute_time=entry.compute_time, enriched=True)
+
+
+def is_fast_entry(entry) -> bool:
+    """Cached result of a fast-mode extraction (partial formats)"""
+    return entry.field('profile') == PROFILE_FAST
+
+
+async def compute_fast_extraction(url: str, cache_key: str, enrich: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Metadata-first extraction for the result card
+    The partial result is cached (never over a full one) and the full
+    extraction follows in the background for the download click
+    """
+    started = time.monotonic()
+    try:
+        result = await run_extraction_waterfall(url, PROFILE_FAST)
+    except HTTPException:
+        record_extraction(cache_key, {}, (time.monotonic() - started) * 1000, cached=False, success=False)
+        record_extraction_outcome(None, 'failed')
+        raise
+    
+    compute_time = time.monotonic() - started
+    if result['data'].get('profile') != PROFILE_FAST:
+        # Another level answered, which is already the complete result
+        extraction_cache.set(cache_key, result, compute_time=compute_time)
+    else:
+        current = extraction_cache.peek(cache_key)
+        if current is None or not current.is_servable() or is_fast_entry(current):
+            extraction_cache.set(cache_key, result, compute_time=compute_time)
+        extraction_flight.run(cache_key, lambda: compute_extraction(url, cache_key, enrich))
+    record_extraction(cache_key, result, compute_time * 1000, cached=False)
+    record_extraction_outcome(result, 'extracted')
+    return result
+
+
+async def get_extraction(url: str, enrich: Optional[bool] = None, fast: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Cached extraction for url
+    Stale (or early-expiring) entries are served immediately while a single
+    background refresh runs; concurrent misses share one extraction
+    """
+    payload, _ = await get_versioned_extraction(url, enrich, fast)
+    return payload
+
+
+async def resolve_extraction(url: str, enrich: Optional[bool] = None,
+                             fast: Optional[bool] = None) -> Tuple[Optional[CacheEntry], Optional[Dict[str, Any]]]:
+    """
+    Cache entry holding the extraction of url, or (None, result) when the
+    result could not be cached; callers expand entry.payload only when they
+    send it, so a 304 never pays for rebuilding a compact entry
+    Fast requests accept a partial (fast-mode) entry, others wait for the full one
+    """
+    started = time.monotonic()
+    cache_key = canonicalize_url(url)
+    cache_warmer.record(cache_key, url)
+    fast = is_fast_mode_enabled(fast)
+    
+    cached, state = extraction_cache.lookup(cache_key)
+    request_span = current_span()
+    if request_span is not None:
+        request_span.set('cache', state if cached else 'miss')
+    partial = None
+    if cached and not fast and is_fast_entry(cached):
+        partial, cached = cached, None
+    if cached:
+        if state == CACHE_FRESH:
+            logger.info(f"✅ Cache HIT: {cache_key}")
+        else:
+            logger.info(f"♻️ Cache {'STALE' if state == CACHE_STALE else 'early refresh'}: {cache_key}")
+            extraction_flight.run(cache_key, lambda: compute_extraction(url, cache_key, enrich))
+        if (cached.is_fresh() and not cached.enriched and is_enrichment_enabled(enrich)
+                and not is_fast_entry(cached)):
+            entry = cached
+            cached = await asyncio.shield(
+                extraction_flight.run(f"enrich|{cache_key}", lambda: enrich_cached_entry(cache_key, entry))
+            )
+        summary = cached.summary
+        record_extraction(cache_key, summary, (time.monotonic() - started) * 1000, cached=True)
+        record_extraction_outcome(summary, 'cache_hit' if state == CACHE_FRESH else 'cache_stale')
+        return cached, None
+    
+    if fast and not extraction_flight.is_running(cache_key):
+        task = extraction_flight.run(f"fast|{cache_key}", lambda: compute_fast_extraction(url, cache_key, enrich))
+    else:
+        # Usually already running in the background after a fast extraction
+        task = extraction_flight.run(cache_key, lambda: compute_extraction(url, cache_key, enrich))
+    try:
+        result = await asyncio.shield(task)
+    except HTTPException:
+        if partial is None:
+            raise
+        logger.warning(f"Full extraction failed, serving the fast-mode result: {cache_key}")
+        return partial, None
+    # Payload and version from the same entry, even if a refresh already replaced it
+    entry = extraction_cache.peek(cache_key)
+    if entry is not None and entry.is_servable():
+        return entry, None
+    return None, result
+
+
+async def get_versioned_extraction(url: str, enrich: Optional[bool] = None,
+                                   fast: Optional[bool] = None) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    get_extraction plus the cache version of the returned payload (None when
+    the result could not be cached), which the ETag is derived from
+    """
+    entry, result = await resolve_extraction(url, enrich, fast)
+    if entry is not None:
+        return entry.payload, entry.version
+    return result, None
+
+
+def get_client_id(request: Request) -> str:
+    """
+    Client address for admission control
+    The socket peer, unless TRUSTED_PROXY_HOPS is set: then X-Forwarded-For,
+    counting that many entries from the right so a client cannot pick its own
+    identity by sending the header
+    """
+    forwarded = request.headers.get('x-forwarded-for')
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        # Fewer entries than proxies means the header did not come through them
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[len(hops) - TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else 'unknown'
+
+
+def get_session_id(request: Request) -> Optional[str]:
+    """Browser session id sent by the frontend for server-side history"""
+    session_id = request.headers.get('x-session-id')
+    return session_id if is_valid_session_id(session_id) else None
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """304 when the client's If-None-Match already names this ETag"""
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
+    return None
+
+
+async def extraction_response(url: str, enrich: Optional[bool], fast: Optional[bool],
+                              http_request: Request) -> Response:
+    """
+    Extraction as JSON with a strong ETag from its cache version
+    Clients polling the same URL get 304 Not Modified until the entry changes
+    """
+    url = url.strip()
+    
+    if not url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    
+    async with admission.admit(EXTRACT, get_client_id(http_request)):
+        entry, result = await resolve_extraction(url, enrich, fast)
+    
+    # Signed format URLs expire, so caches must always revalidate
+    headers = {'Cache-Control': 'private, no-cache'}
+    if entry is not None:
+        headers['ETag'] = version_etag(entry.version)
+        cached_response = not_modified(http_request, headers['ETag'], headers['Cache-Control'])
+        if cached_response:
+            # A revalidating poll is not a new visit, so it adds no history entry
+            return cached_response
+        result = entry.payload
+    
+    session_id = get_session_id(http_request)
+    if session_id:
+        record_history(session_id, url, result)
+    return ORJSONResponse(content=result, headers=headers)
+
+
+@api_router.post("/extract")
+async def extract_video(request: ExtractRequest, http_request: Request):
+    """
+    Extract video information from URL
+    Served from the extraction cache when possible
+    """
+    return await extraction_response(request.url, request.enrich, request.fast, http_request)
+
+
+@api_router.get("/extract")
+async def extract_video_get(http_request: Request, url: str, enrich: Optional[bool] = None,
+                            fast: Optional[bool] = None):
+    """
+    GET form of /extract for polling
+    Browsers revalidate it with If-None-Match on their own, so a fast-mode
+    result is replaced by the full one as soon as it is cached
+    """
+    return await extraction_response(url, enrich, fast, http_request)
+
+
+async def heartbeat_until(task: asyncio.Future):
+    """SSE comments every EXTRACT_STREAM_HEARTBEAT seconds until task is done"""
+    while not task.done():
+        await asyncio.wait({task}, timeout=EXTRACT_STREAM_HEARTBEAT)
+        if not task.done():
+            yield b': keep-alive\n\n'
+
+
+def format_batches(formats: List[Dict[str, Any]], replace: bool = False):
+    """formats events of EXTRACT_STREAM_BATCH formats; replace marks the first batch of a new list"""
+    total = len(formats)
+    for start in range(0, max(total, 1), EXTRACT_STREAM_BATCH):
+        yield sse_event('formats', {
+            'formats': formats[start:start + EXTRACT_STREAM_BATCH],
+            'offset': start,
+            'total': total,
+            'replace': replace and start == 0,
+        })
+
+
+async def stream_extraction(url: str, enrich: Optional[bool], subtitles: bool, client_id: str,
+                            session_id: Optional[str]):
+    """
+    Server-sent events for one extraction
+    metadata, then formats in batches (a fast-mode result first, replaced
+    by the full list once it lands), then enrichment, then done or error
+    """
+    cache_key = canonicalize_url(url)
+    subtitle_task = None
+    try:
+        yield sse_event('status', {'stage': 'extracting'})
+        try:
+            async with admission.admit(EXTRACT, client_id):
+                # Fast mode first, a cached full result is served as it is
+                task = asyncio.ensure_future(get_extraction(url, enrich, fast=True))
+                async for beat in heartbeat_until(task):
+                    yield beat
+                result = task.result()
+                
+                data = result['data']
+                # Only yt-dlp knows about subtitle tracks; listed while the full formats load
+                if subtitles and result.get('method') == 'yt-dlp':
+                    subtitle_task = asyncio.ensure_future(get_subtitle_tracks(url))
+                yield sse_event('metadata', {
+                    'method': result.get('method'),
+                    **{key: value for key, value in data.items() if key != 'formats'},
+                })
+                for batch in format_batches(data['formats']):
+                    yield batch
+                
+                if data.get('profile') == PROFILE_FAST:
+                    yield sse_event('status', {'stage': 'formats'})
+                    # Started in the background by the fast extraction
+                    task = asyncio.ensure_future(asyncio.shield(
+                        extraction_flight.run(cache_key, lambda: compute_extraction(url, cache_key, enrich))
+                    ))
+                    async for beat in heartbeat_until(task):
+                        yield beat
+                    try:
+                        result = task.result()
+                        for batch in format_batches(result['data']['formats'], replace=True):
+                            yield batch
+                    except HTTPException as e:
+                        logger.warning(f"Full extraction failed after fast mode: {e.detail}")
+        except AdmissionRejected as e:
+            yield sse_event('error', {'status': 429, 'detail': f"Too many requests: {e.reason}", 'retry_after': e.retry_after})
+            return
+        except HTTPException as e:
+            yield sse_event('error', {'status': e.status_code, 'detail': e.detail})
+            return
+        
+        enrichment: Dict[str, Any] = {
+            'sizes': {
+                fmt['format_id']: fmt['filesize']
+                for fmt in result['data']['formats']
+                if fmt.get('format_id') and fmt.get('filesize')
+            },
+        }
+        if subtitle_task is not None:
+            yield sse_event('status', {'stage': 'enrichment'})
+            async for beat in heartbeat_until(subtitle_task):
+                yield beat
+            try:
+                tracks = subtitle_task.result()
+                enrichment['subtitles'] = {key: tracks[key] for key in ('available', 'manual_subtitles', 'automatic_captions')}
+            except Exception as e:
+                logger.warning(f"Subtitle listing failed: {str(e)}")
+        yield sse_event('enrichment', enrichment)
+        
+        if session_id:
+            record_history(session_id, url, result)
+        yield sse_event('done', {'success': result.get('success', True), 'method': result.get('method'),
+                                 'partial': result['data'].get('profile') == PROFILE_FAST})
+    finally:
+        if subtitle_task is not None and not subtitle_task.done():
+            subtitle_task.cancel()
+
+
+@api_router.get("/extract/stream")
+async def extract_video_stream(http_request: Request, url: str, enrich: Optional[bool] = None,
+                               subtitles: bool = True):
+    """
+    Streaming /extract as server-sent events (EventSource)
+    Errors, including admission 429s, arrive as an error event
+    """
+    url = url.strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    return StreamingResponse(
+        stream_extraction(url, enrich, subtitles, get_client_id(http_request), get_session_id(http_request)),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @api_router.post("/download")
-async def get_download_link(request: DownloadRequest):
+async def get_download_link(request: DownloadRequest, http_request: Request):
     """
     Get direct download link for a specific format
     """
+    async with admission.admit(EXTRACT, get_client_id(http_request)):
+        try:
+            result = await asyncio.to_thread(get_direct_download_url, request.url, request.format_id)
+            return ORJSONResponse(content={
+                "success": True,
+                "data": result
+            })
+        except Exception as e:
+            logger.error(f"Failed to get download link: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+def require_cluster_peer(request: Request) -> None:
+    """Internal endpoints answer other cluster members only; 404 otherwise"""
+    if not check_cluster_token(request.headers.get(CLUSTER_TOKEN_HEADER)):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+class InternalCacheRequest(BaseModel):
+    key: str
+
+
+@api_router.get("/internal/ping")
+async def internal_ping(request: Request):
+    """Liveness check between cluster members"""
+    require_cluster_peer(request)
+    return {"success": True}
+
+
+@api_router.post("/internal/extract")
+async def internal_extract(request: ExtractRequest, http_request: Request):
+    """
+    Extraction forwarded by a member that does not own the URL
+    Admission already ran on the forwarding member; failures are returned as
+    data so the forwarder can tell them from an unreachable owner
+    """
+    require_cluster_peer(http_request)
+    forwarded_request.set(True)
     try:
-        result = get_direct_download_url(request.url, request.format_id)
-        return JSONResponse(content={
-            "success": True,
-            "data": result
-        })
-    except Exception as e:
-        logger.error(f"Failed to get download link: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+        payload, _ = await get_versioned_extraction(request.url, request.enrich, fast=False)
+    except HTTPException as e:
+        return {"error": e.status_code, "detail": e.detail}
+    entry = extraction_cache.peek(canonicalize_url(request.url))
+    expires_in = 0.0
+    if entry is not None and entry.is_fresh() and not is_fast_entry(entry):
+        expires_in = entry.expires_at - time.time()
+    return {"data": payload, "expires_in": expires_in}
+
+
+@api_router.post("/internal/cache")
+async def internal_cache(request: InternalCacheRequest, http_request: Request):
+    """Fresh cached extraction for a key, asked by its new owner after a membership change"""
+    require_cluster_peer(http_request)
+    entry = extraction_cache.peek(request.key)
+    if entry is None or not entry.is_fresh() or is_fast_entry(entry):
+        return {"data": None}
+    return {"data": entry.payload, "expires_in": entry.expires_at - time.time()}
 
 
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
+    database = await database_health()
     return {
-        "status": "healthy",
+        # Extraction works without MongoDB, only history and telemetry degrade
+        "status": "healthy" if database['status'] != 'unavailable' else "degraded",
         "service": "video-downloader-api",
-        "version": "2.0"
+        "version": "2.0",
+        "http_pool": get_pool_stats(),
+        "extraction_cache": {**extraction_cache.stats(), "in_flight": extraction_flight.in_flight()},
+        "database": database,
+        "cache_warmer": cache_warmer.stats(),
+        "admission": admission.stats(),
+        "upstream": upstream_limiter.stats(),
+        "tracing": get_tracing_stats(),
+        "profiler": get_profiler_stats(),
+        "compression": get_compression_stats(),
+        "subtitles": get_subtitle_stats(),
+        "cluster": get_cluster_stats()
     }
 
 
@@ -217,7 +859,7 @@ async def get_formats():
     """Get list of supported conversion formats"""
     try:
         formats = get_supported_formats()
-        return JSONResponse(content={
+        return ORJSONResponse(content={
             "success": True,
             "data": formats
         })
@@ -227,50 +869,322 @@ async def get_formats():
 
 
 @api_router.post("/convert")
-async def convert_video(request: dict):
+async def convert_video(request: dict, http_request: Request):
     """Convert video to specified format"""
+    async with admission.admit(ENCODE, get_client_id(http_request)):
+        try:
+            url = request.get('url')
+            output_format = request.get('format', 'mp4')
+            quality = request.get('quality', 'medium')
+            
+            if not url:
+                raise HTTPException(status_code=400, detail="URL is required")
+            
+            cache_key = canonicalize_url(url)
+            cache_warmer.record_conversion(output_format)
+            prepared = conversion_cache.get(conversion_key(cache_key, output_format, quality))
+            if prepared:
+                result = prepared.payload
+            else:
+                extraction = extraction_cache.peek(cache_key)
+                if extraction and extraction.is_servable() and not is_fast_entry(extraction):
+                    result = await prepare_conversion(cache_key, output_format, quality, extraction.payload)
+                else:
+                    result = await convert_media(url, output_format, quality)
+            return ORJSONResponse(content={
+                "success": True,
+                "data": result
+            })
+        except Exception as e:
+            logger.error(f"Conversion failed: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+@api_router.post("/subtitles")
+async def extract_subtitles(request: ExtractRequest, http_request: Request):
+    """Extract subtitles from video"""
+    async with admission.admit(EXTRACT, get_client_id(http_request)):
+        try:
+            url = request.url.strip()
+            
+            if not url:
+                raise HTTPException(status_code=400, detail="URL is required")
+            
+            logger.info(f"Extracting subtitles from: {url}")
+            result = await asyncio.to_thread(get_subtitles, url)
+            
+            return ORJSONResponse(content={
+                "success": True,
+                "data": result
+            })
+        except Exception as e:
+            logger.error(f"Subtitle extraction failed: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+@api_router.get("/subtitles/{languages}")
+async def download_subtitles(languages: str, request: Request, url: str, format: str = "srt",
+                             type: Optional[str] = None):
+    """
+    Subtitle files converted to SRT or WebVTT
+    One language returns the file, a comma-separated list returns a zip of
+    every track found (fetched concurrently); missing languages are listed in
+    X-Subtitles-Missing
+    """
+    url = url.strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    if format not in SUBTITLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(SUBTITLE_FORMATS)}")
+    if type not in (None, 'manual', 'automatic'):
+        raise HTTPException(status_code=400, detail="Type must be manual or automatic")
+    requested = list(dict.fromkeys(lang.strip() for lang in languages.split(',') if lang.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="At least one language is required")
+    if len(requested) > SUBTITLE_MAX_LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"At most {SUBTITLE_MAX_LANGUAGES} languages per request")
+    
+    async with admission.admit(EXTRACT, get_client_id(request)):
+        results = await asyncio.gather(
+            *(fetch_subtitle(url, lang, format, type) for lang in requested),
+            return_exceptions=True
+        )
+    
+    found, missing, errors = [], [], []
+    for lang, result in zip(requested, results):
+        if isinstance(result, SubtitleNotFound):
+            missing.append(lang)
+        elif isinstance(result, Exception):
+            logger.error(f"Subtitle download failed ({lang}): {str(result)}")
+            errors.append(lang)
+        elif not any(item['language'] == result['language'] for item in found):
+            found.append(result)
+    if not found:
+        if errors:
+            raise HTTPException(status_code=502, detail="Could not download subtitles")
+        raise HTTPException(status_code=404, detail=f"No subtitles for: {', '.join(missing)}")
+    
+    headers = {}
+    if missing or errors:
+        headers['X-Subtitles-Missing'] = ','.join(missing + errors)
+    if len(requested) == 1:
+        subtitle = found[0]
+        headers['Content-Disposition'] = f'attachment; filename="{subtitle["language"]}.{format}"'
+        return Response(content=subtitle['content'], media_type=SUBTITLE_FORMATS[format], headers=headers)
+    
+    headers['Content-Disposition'] = 'attachment; filename="subtitles.zip"'
+    return StreamingResponse(stream_subtitle_archive(found), media_type='application/zip', headers=headers)
+
+
+@api_router.get("/thumb")
+async def get_thumb(request: Request, url: str, w: int = 320):
+    """
+    Resized thumbnail for a video URL
+    Uses the thumbnail of a cached extraction or history entry, re-encoded to
+    AVIF/WebP; 404 for anything else, so clients fall back to the original image
+    """
+    url = url.strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    if w < 1:
+        raise HTTPException(status_code=400, detail="Width must be positive")
+    
+    # Cached extraction first, then the history store; never an extraction, which
+    # would spend the client's extract admission on every uncached card of a page
+    thumbnail = None
+    cache_key = canonicalize_url(url)
+    cached = extraction_cache.peek(cache_key)
+    if cached is not None and cached.is_servable():
+        thumbnail = cached.field('thumbnail')
+    elif is_history_enabled():
+        try:
+            thumbnail = await find_thumbnail(cache_key)
+        except Exception as e:
+            logger.warning(f"History thumbnail lookup failed: {str(e)}")
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="No thumbnail for this video")
+    
+    # Pages load many thumbnails at once, so resizing counts as a cheap request
     try:
-        url = request.get('url')
-        output_format = request.get('format', 'mp4')
-        quality = request.get('quality', 'medium')
-        
-        if not url:
-            raise HTTPException(status_code=400, detail="URL is required")
-        
-        result = await convert_media(url, output_format, quality)
-        return JSONResponse(content={
+        async with admission.admit(CHEAP, get_client_id(request)):
+            thumb = await get_thumbnail(thumbnail, w, request.headers.get('accept', ''))
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Thumbnail failed: {str(e)}")
+        raise HTTPException(status_code=502, detail="Could not load thumbnail")
+    
+    headers = {
+        'ETag': thumb['etag'],
+        'Cache-Control': 'public, max-age=604800, immutable',
+        'Vary': 'Accept',
+    }
+    if etag_matches(request.headers.get('if-none-match'), thumb['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(content=thumb['body'], media_type=thumb['media_type'], headers=headers)
+
+
+@api_router.get("/history")
+async def get_history(request: Request, cursor: Optional[str] = None, limit: int = 20,
+                      fields: Optional[str] = None):
+    """
+    Server-side download history for the X-Session-Id session
+    Newest first, paginate with the returned next_cursor
+    """
+    session_id = get_session_id(request)
+    if not session_id:
+        raise HTTPException(status_code=400, detail="X-Session-Id header is required")
+    if not is_history_enabled():
+        raise HTTPException(status_code=503, detail="History storage is not configured")
+    
+    try:
+        async with admission.admit(CHEAP, get_client_id(request)):
+            result = await list_history(
+                session_id,
+                cursor=cursor,
+                limit=limit,
+                fields=fields.split(',') if fields else None
+            )
+        # History has no cache version, so the tag is a digest of the body
+        response = ORJSONResponse(content={
             "success": True,
             "data": result
         })
-    except Exception as e:
-        logger.error(f"Conversion failed: {str(e)}")
+        etag = content_etag(response.body)
+        cached_response = not_modified(request, etag, 'private, no-cache')
+        if cached_response:
+            return cached_response
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"History query failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="History storage unavailable")
 
 
-@api_router.post("/subtitles")
-async def extract_subtitles(request: ExtractRequest):
-    """Extract subtitles from video"""
+@api_router.delete("/history")
+async def delete_history(request: Request):
+    """Clear the server-side history of the X-Session-Id session"""
+    session_id = get_session_id(request)
+    if not session_id:
+        raise HTTPException(status_code=400, detail="X-Session-Id header is required")
+    if not is_history_enabled():
+        raise HTTPException(status_code=503, detail="History storage is not configured")
+    
     try:
-        url = request.url.strip()
-        
-        if not url:
-            raise HTTPException(status_code=400, detail="URL is required")
-        
-        logger.info(f"Extracting subtitles from: {url}")
-        result = get_subtitles(url)
-        
-        return JSONResponse(content={
+        async with admission.admit(CHEAP, get_client_id(request)):
+            deleted = await clear_history(session_id)
+        return ORJSONResponse(content={
             "success": True,
-            "data": result
+            "data": {"deleted": deleted}
         })
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        logger.error(f"Subtitle extraction failed: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+        logger.error(f"History clear failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="History storage unavailable")
+
+
+def require_admin(request: Request) -> None:
+    """Admin endpoints need ADMIN_TOKEN configured and sent as X-Admin-Token"""
+    if not is_admin_enabled():
+        raise HTTPException(status_code=404, detail="Admin API is disabled")
+    if not check_admin_token(request.headers.get('X-Admin-Token')):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@api_router.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """
+    Recently captured request profiles, newest first
+    Requested with X-Profile: 1 (or ?profile=1) or captured above PROFILE_SLOW_MS
+    """
+    require_admin(request)
+    return ORJSONResponse(content={
+        "success": True,
+        "data": profile_store.list()
+    })
+
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "collapsed"):
+    """One profile as collapsed stacks (flamegraph.pl, speedscope) or a JSON summary"""
+    require_admin(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return ORJSONResponse(content={
+            "success": True,
+            "data": summarize_profile(profile, top=20)
+        })
+    return PlainTextResponse(content=render_collapsed(profile))
+
+
+def service_metrics():
+    """Gauges and counters read from the services' stats() at scrape time"""
+    pool = get_pool_stats()
+    for key in ('in_use', 'idle', 'queued_now'):
+        if key in pool:
+            yield 'http_pool_connections', 'Outbound HTTP pool connections', {'state': key}, pool[key], 'gauge'
+    
+    cache = extraction_cache.stats()
+    yield 'extraction_cache_entries', 'Cached extractions', {}, cache['entries'], 'gauge'
+    yield 'extraction_cache_hit_ratio', 'Extraction cache hit ratio since start', {}, cache['hit_ratio'], 'gauge'
+    for key in ('hits', 'stale_hits', 'early_refreshes', 'misses'):
+        yield 'extraction_cache_lookups_total', 'Extraction cache lookups', {'result': key}, cache[key], 'counter'
+    yield 'extractions_in_flight', 'Extractions currently running', {}, extraction_flight.in_flight(), 'gauge'
+    
+    for name, limiter in admission.stats()['classes'].items():
+        yield 'admission_active', 'Admitted requests holding a slot', {'class': name}, limiter['active'], 'gauge'
+        yield 'admission_queued', 'Requests waiting for a slot', {'class': name}, limiter['queued'], 'gauge'
+        yield 'admission_rejected_total', 'Requests rejected with 429', {'class': name}, limiter['rejected'], 'counter'
+    
+    for name, writer in get_writer_stats().items():
+        yield 'batch_writer_queued', 'Documents waiting to be written', {'collection': name}, writer['queued'], 'gauge'
+        yield 'batch_writer_dropped_total', 'Documents dropped on a full queue', {'collection': name}, writer['dropped'], 'counter'
+    
+    # Arbitrary sites are already folded into "other" to keep label cardinality bounded
+    upstream = upstream_limiter.stats()
+    for name in sorted(KNOWN_PLATFORMS & upstream.keys()):
+        platform = upstream[name]
+        yield 'upstream_rate', 'Current upstream request rate per second', {'platform': name}, platform['rate'], 'gauge'
+        yield 'upstream_throttles_total', 'Throttling responses from upstream', {'platform': name}, platform['throttles'], 'counter'
+    yield 'upstream_throttles_total', 'Throttling responses from upstream', {'platform': 'other'}, upstream['other']['throttles'], 'counter'
+
+
+stats_collector.register('services', service_metrics)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if not is_metrics_enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Over-limit requests fail fast with 429 and a Retry-After hint"""
+    logger.info(f"🚦 Rejected {request.url.path} ({exc.endpoint_class}): {exc.reason}")
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": f"Too many requests: {exc.reason}. Retry in {exc.retry_after}s."},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Innermost, so metrics, traces and profiles include the compression time
+app.add_middleware(CompressionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -278,6 +1192,16 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Trace-Id", "X-Profile-Id", "ETag", "Content-Disposition", "X-Subtitles-Missing"],
 )
 
+# Inside tracing, so stored profiles carry the request's trace id
+app.add_middleware(ProfilerMiddleware)
+
+# Root span of every traced /api request
+app.add_middleware(TracingMiddleware)
+
+# Outermost, so request timings include CORS handling and 429s
+app.add_middleware(MetricsMiddleware)
+
 logger.info("🚀 ReloadTheGraphics Video Downloader API initialized")
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+Admission control service
+Per-client token buckets and per-class concurrency limits with bounded wait
+queues, so overload turns into fast 429s instead of a pile-up of timeouts
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Endpoint classes
+CHEAP = 'cheap'
+EXTRACT = 'extract'
+BROWSER = 'browser'
+ENCODE = 'encode'
+
+# rate/burst: per-client token bucket (rate 0 disables it)
+# concurrency/queue/queue_timeout: global slots, waiters and how long a waiter may wait
+# per_client: concurrent requests one client may hold in the class (0 disables it)
+DEFAULT_LIMITS = {
+    CHEAP: {'rate': 20, 'burst': 60, 'concurrency': 200, 'queue': 200, 'queue_timeout': 1, 'per_client': 0},
+    EXTRACT: {'rate': 0.5, 'burst': 10, 'concurrency': 16, 'queue': 32, 'queue_timeout': 5, 'per_client': 4},
+    BROWSER: {'rate': 0, 'burst': 0, 'concurrency': 2, 'queue': 4, 'queue_timeout': 10, 'per_client': 0},
+    ENCODE: {'rate': 1, 'burst': 10, 'concurrency': 4, 'queue': 16, 'queue_timeout': 5, 'per_client': 2},
+}
+
+MAX_TRACKED_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', '10000'))
+
+
+def is_admission_enabled() -> bool:
+    return os.environ.get('ADMISSION_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def load_limits(endpoint_class: str) -> Dict[str, float]:
+    """Defaults overridden by ADMISSION_<CLASS>_<SETTING>, e.g. ADMISSION_EXTRACT_RATE"""
+    limits = dict(DEFAULT_LIMITS[endpoint_class])
+    for setting in limits:
+        value = os.environ.get(f"ADMISSION_{endpoint_class.upper()}_{setting.upper()}")
+        if value:
+            limits[setting] = float(value)
+    return limits
+
+
+class AdmissionRejected(Exception):
+    """Request refused by admission control, served as 429 with Retry-After"""
+
+    def __init__(self, endpoint_class: str, reason: str, retry_after: float):
+        super().__init__(f"{endpoint_class} {reason}")
+        self.endpoint_class = endpoint_class
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token, returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClassLimiter:
+    """
+    Global concurrency slots for one endpoint class
+    Waiters are served FIFO; a full queue or an expired wait is rejected
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+        # Smoothed slot hold time, used to estimate Retry-After
+        self.avg_hold = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        return self.avg_hold * (len(self._waiters) + 1) / max(1, self.concurrency)
+
+    async def acquire(self) -> None:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, 'queue full', self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[waiter] = None
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._waiters.pop(waiter, None)
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as the wait expired, keep it
+                self.admitted += 1
+                return
+            waiter.cancel()
+            self.rejected += 1
+            raise AdmissionRejected(self.name, 'queue timeout', self.retry_after())
+        except asyncio.CancelledError:
+            self._waiters.pop(waiter, None)
+            if waiter.done() and not waiter.cancelled():
+                self.release(0)
+            raise
+        self.admitted += 1
+
+    def release(self, held: float) -> None:
+        self.avg_hold = 0.9 * self.avg_hold + 0.1 * held
+        # Hand the slot straight to the next waiter so it cannot be overtaken
+        while self._waiters:
+            waiter, _ = self._waiters.popitem(last=False)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'queued': len(self._waiters),
+            'concurrency': self.concurrency,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
+
+
+class ClientState:
+    """Token buckets and in-flight counts of one client"""
+
+    __slots__ = ('buckets', 'in_flight')
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.in_flight: Dict[str, int] = {}
+
+    def is_idle(self) -> bool:
+        return not any(self.in_flight.values())
+
+
+class AdmissionController:
+    """Admission decisions for every endpoint class"""
+
+    def __init__(self):
+        self.limits = {name: load_limits(name) for name in DEFAULT_LIMITS}
+        self.classes = {
+            name: ClassLimiter(name, int(limits['concurrency']), int(limits['queue']), limits['queue_timeout'])
+            for name, limits in self.limits.items()
+        }
+        self._clients: "OrderedDict[str, ClientState]" = OrderedDict()
+        self.rate_limited = 0
+
+    def _client(self, client_id: str) -> ClientState:
+        state = self._clients.get(client_id)
+        if state is None:
+            state = self._clients[client_id] = ClientState()
+            if len(self._clients) > MAX_TRACKED_CLIENTS:
+                for key in list(self._clients):
+                    if len(self._clients) <= MAX_TRACKED_CLIENTS:
+                        break
+                    if self._clients[key].is_idle():
+                        del self._clients[key]
+        else:
+            self._clients.move_to_end(client_id)
+        return state
+
+    def _check_client(self, endpoint_class: str, client_id: str) -> ClientState:
+        limits = self.limits[endpoint_class]
+        state = self._client(client_id)
+
+        per_client = int(limits['per_client'])
+        if per_client and state.in_flight.get(endpoint_class, 0) >= per_client:
+            self.rate_limited += 1
+            raise AdmissionRejected(endpoint_class, 'too many concurrent requests', self.classes[endpoint_class].avg_hold)
+
+        if limits['rate'] > 0:
+            bucket = state.buckets.get(endpoint_class)
+            if bucket is None:
+                bucket = state.buckets[endpoint_class] = TokenBucket(limits['rate'], limits['burst'])
+            wait = bucket.take()
+            if wait:
+                self.rate_limited += 1
+                raise AdmissionRejected(endpoint_class, 'rate limit exceeded', wait)
+        return state
+
+    @asynccontextmanager
+    async def admit(self, endpoint_class: str, client_id: Optional[str] = None):
+        """
+        Hold one slot of endpoint_class for the duration of the block
+        Raises AdmissionRejected when the client or the class is over its limit
+        """
+        if not is_admission_enabled():
+            yield
+            return
+
+        state = self._check_client(endpoint_class, client_id) if client_id else None
+        limiter = self.classes[endpoint_class]
+        # Queued requests count against the client's concurrency too
+        if state is not None:
+            state.in_flight[endpoint_class] = state.in_flight.get(endpoint_class, 0) + 1
+        try:
+            await limiter.acquire()
+        except BaseException:
+            if state is not None:
+                state.in_flight[endpoint_class] -= 1
+            raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            limiter.release(time.monotonic() - started)
+            if state is not None:
+                state.in_flight[endpoint_class] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': is_admission_enabled(),
+            'clients': len(self._clients),
+            'rate_limited': self.rate_limited,
+            'classes': {name: limiter.stats() for name, limiter in self.classes.items()},
+        }
+
+
+admission = AdmissionController()
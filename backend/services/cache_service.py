@@ -0,0 +1,314 @@
+"""
+Extraction cache service
+In-process LRU cache of /api/extract results keyed by canonical URL, served
+stale-while-revalidate with probabilistic early refresh
+"""
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from services.compact_extraction import compact_payload, expand_payload, payload_field, payload_summary
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change what gets extracted
+TRACKING_PARAMS = {
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+    'fbclid', 'gclid', 'igshid', 'si', 'feature', 'ref', 'ref_src',
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a video URL so equivalent links share one cache key
+    Lowercases scheme/host, drops fragments and tracking parameters,
+    sorts the query and maps youtu.be / shorts links to watch?v=
+    """
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or 'https').lower()
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host == 'm.youtube.com':
+        host = 'youtube.com'
+
+    path = parsed.path or '/'
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k.lower() not in TRACKING_PARAMS]
+
+    if host == 'youtu.be' and len(path) > 1:
+        query = [('v', path.lstrip('/').split('/')[0])] + [(k, v) for k, v in query if k != 'v']
+        host, path = 'youtube.com', '/watch'
+    elif host == 'youtube.com' and path.startswith('/shorts/'):
+        query = [('v', path.split('/')[2])] + [(k, v) for k, v in query if k != 'v']
+        path = '/watch'
+
+    if len(path) > 1:
+        path = path.rstrip('/')
+    try:
+        port = parsed.port
+    except ValueError:
+        # Malformed port: keep the key as typed and let the waterfall reject the URL
+        netloc = parsed.netloc.lower()
+    else:
+        netloc = host if not port or port in (80, 443) else f"{host}:{port}"
+    return urlunparse((scheme, netloc, path, '', urlencode(sorted(query)), ''))
+
+
+# Query parameters carrying an absolute expiry (unix seconds) on signed CDN URLs
+EXPIRY_PARAMS = ('expire', 'expires', 'exp', 'expiry', 'validto')
+
+# Lookup states
+CACHE_FRESH = 'fresh'
+CACHE_REFRESH = 'refresh'
+CACHE_STALE = 'stale'
+
+
+def signed_url_expiry(url: str) -> Optional[float]:
+    """
+    Absolute expiry of a signed media URL as a unix timestamp, None when unsigned
+    Understands expire=/expires= style parameters (googlevideo, CloudFront),
+    Akamai exp= tokens and S3 X-Amz-Date + X-Amz-Expires
+    """
+    params = {k.lower(): v for k, v in parse_qsl(urlparse(url).query)}
+    for name in ('hdnts', '__token__'):
+        for part in params.get(name, '').split('~'):
+            if part.startswith('exp='):
+                params.setdefault('exp', part[4:])
+
+    for name in EXPIRY_PARAMS:
+        value = params.get(name, '')
+        if value.isdigit():
+            expiry = float(value)
+            # Some CDNs use milliseconds
+            return expiry / 1000 if expiry > 1e12 else expiry
+
+    amz_date, amz_expires = params.get('x-amz-date'), params.get('x-amz-expires', '')
+    if amz_date and amz_expires.isdigit():
+        try:
+            signed_at = datetime.strptime(amz_date, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return signed_at.timestamp() + int(amz_expires)
+    return None
+
+
+def payload_url_expiry(payload: Any) -> Optional[float]:
+    """Earliest signed URL expiry across the formats of an extraction result"""
+    try:
+        formats: List[Dict[str, Any]] = payload['data']['formats']
+    except (KeyError, TypeError):
+        return None
+    expiries = [signed_url_expiry(fmt['url']) for fmt in formats if fmt.get('url')]
+    expiries = [expiry for expiry in expiries if expiry]
+    return min(expiries) if expiries else None
+
+
+class CacheEntry:
+    """
+    One cached extraction
+    stored may be a CompactExtraction; payload always returns the plain dict
+    """
+
+    __slots__ = ('key', 'stored', 'created_at', 'expires_at', 'stale_until', 'version', 'compute_time', 'enriched')
+
+    def __init__(self, key: str, stored: Any, ttl: float, version: int, compute_time: float,
+                 stale_ttl: float = 0.0, urls_expire_at: Optional[float] = None, enriched: bool = False):
+        self.key = key
+        self.stored = stored
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        self.stale_until = self.expires_at + stale_ttl
+        # Never serve format URLs the CDN is about to reject
+        if urls_expire_at is not None:
+            self.expires_at = min(self.expires_at, urls_expire_at)
+            self.stale_until = min(self.stale_until, urls_expire_at)
+        self.version = version
+        self.compute_time = compute_time
+        # Whether unknown file sizes were probed (see enrichment_service)
+        self.enriched = enriched
+
+    @property
+    def payload(self) -> Any:
+        """The cached result, expanded into a fresh dict when stored compact"""
+        return expand_payload(self.stored)
+
+    @property
+    def summary(self) -> Any:
+        """Method, platform and format count of the payload, without expanding it"""
+        return payload_summary(self.stored)
+
+    def field(self, key: str, default: Any = None) -> Any:
+        """One top-level data field, without expanding the formats"""
+        return payload_field(self.stored, key, default)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.expires_at
+
+    def is_servable(self, now: Optional[float] = None) -> bool:
+        """Fresh, or stale but still inside the stale window and URL expiry"""
+        return (now or time.time()) < self.stale_until
+
+    def should_refresh_early(self, beta: float, now: Optional[float] = None) -> bool:
+        """
+        Probabilistic early expiration (XFetch)
+        Refresh chance rises as expiry nears, scaled by how long the entry took
+        to compute, so hot keys refresh once before they ever go stale
+        """
+        if beta <= 0 or self.compute_time <= 0:
+            return False
+        now = now or time.time()
+        return now - self.compute_time * beta * math.log(1.0 - random.random()) >= self.expires_at
+
+
+class ExtractionCache:
+    """
+    Thread-safe LRU cache with per-entry expiry
+    Entries are also read from worker threads (yt-dlp runs off the event loop)
+    """
+
+    def __init__(self, max_entries: int, ttl: float, stale_ttl: float = 0.0,
+                 early_beta: float = 1.0, url_expiry_margin: float = 60.0, compact: bool = False):
+        self.max_entries = max_entries
+        self.compact = compact
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.early_beta = early_beta
+        self.url_expiry_margin = url_expiry_margin
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.early_refreshes = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the fresh entry for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_fresh():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def lookup(self, key: str) -> Tuple[Optional[CacheEntry], Optional[str]]:
+        """
+        Stale-while-revalidate lookup
+        Returns (entry, state): CACHE_FRESH, CACHE_REFRESH (fresh, but picked
+        for early refresh), CACHE_STALE (expired, still servable) or (None, None)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_servable(now):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if not entry.is_fresh(now):
+                self.stale_hits += 1
+                return entry, CACHE_STALE
+            if entry.should_refresh_early(self.early_beta, now):
+                self.early_refreshes += 1
+                return entry, CACHE_REFRESH
+            return entry, CACHE_FRESH
+
+    def set(self, key: str, payload: Any, ttl: Optional[float] = None, compute_time: float = 0.0,
+            enriched: bool = False) -> CacheEntry:
+        """Store a payload, evicting the least recently used entries past max_entries"""
+        urls_expire_at = payload_url_expiry(payload)
+        if urls_expire_at is not None:
+            urls_expire_at -= self.url_expiry_margin
+        stored = compact_payload(payload) if self.compact else payload
+        with self._lock:
+            self._version += 1
+            entry = CacheEntry(
+                key, stored, self.ttl if ttl is None else ttl, self._version, compute_time,
+                stale_ttl=self.stale_ttl, urls_expire_at=urls_expire_at, enriched=enriched,
+            )
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Entry for key in any state, without touching LRU order or hit counters"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'early_refreshes': self.early_refreshes,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """
+    Collapses concurrent computations of the same key into one asyncio task
+    Callers await the shared task through asyncio.shield, so a client that
+    disconnects does not cancel the work other callers are waiting on
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Return the in-flight task for key, starting factory() if there is none"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Background refreshes have no awaiter, consume their errors here
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight task for {key} failed: {task.exception()}")
+
+    def is_running(self, key: str) -> bool:
+        return key in self._tasks
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+
+extraction_cache = ExtractionCache(
+    max_entries=int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', '1000')),
+    ttl=float(os.environ.get('EXTRACTION_CACHE_TTL', '1800')),
+    stale_ttl=float(os.environ.get('EXTRACTION_CACHE_STALE_TTL', '600')),
+    early_beta=float(os.environ.get('EXTRACTION_CACHE_EARLY_BETA', '1.0')),
+    url_expiry_margin=float(os.environ.get('SIGNED_URL_EXPIRY_MARGIN', '120')),
+    compact=os.environ.get('EXTRACTION_CACHE_COMPACT', 'true').strip().lower() in ('1', 'true', 'yes', 'on'),
+)
+
+extraction_flight = SingleFlight()
@@ -0,0 +1,378 @@
+"""
+Cluster service
+Keeps one extraction per canonical URL across workers and nodes: workers on
+a host share a SQLite store (with leases so only one of them extracts), and
+nodes route each URL to its owner on a consistent-hash ring over CLUSTER_PEERS,
+falling back to local extraction when the owner cannot be reached
+"""
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Tuple
+
+import orjson
+
+from services.http_client import get_http_client, get_request_timeout
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_SELF_URL = os.environ.get('CLUSTER_SELF_URL', '').rstrip('/')
+CLUSTER_PEERS = [peer.strip().rstrip('/') for peer in os.environ.get('CLUSTER_PEERS', '').split(',') if peer.strip()]
+CLUSTER_TOKEN = os.environ.get('CLUSTER_TOKEN', '')
+CLUSTER_SHARED_CACHE = os.environ.get('CLUSTER_SHARED_CACHE', '')
+CLUSTER_VNODES = int(os.environ.get('CLUSTER_VNODES', '128'))
+CLUSTER_FORWARD_TIMEOUT = float(os.environ.get('CLUSTER_FORWARD_TIMEOUT', '95'))
+CLUSTER_HEALTH_INTERVAL = float(os.environ.get('CLUSTER_HEALTH_INTERVAL', '10'))
+CLUSTER_FAILURE_THRESHOLD = int(os.environ.get('CLUSTER_FAILURE_THRESHOLD', '2'))
+# After a membership change, new owners ask the previous owner for its cached copy this long
+CLUSTER_HANDOFF_SECONDS = float(os.environ.get('CLUSTER_HANDOFF_SECONDS', '300'))
+# A worker holding a lease is assumed dead after this long
+CLUSTER_LEASE_SECONDS = float(os.environ.get('CLUSTER_LEASE_SECONDS', '120'))
+
+TOKEN_HEADER = 'X-Cluster-Token'
+
+# Set while serving a forwarded request, so it is never forwarded again
+forwarded_request: ContextVar[bool] = ContextVar('forwarded_request', default=False)
+
+
+class RemoteExtractionError(Exception):
+    """The owner node ran the extraction and it failed"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def check_cluster_token(token: Optional[str]) -> bool:
+    """Constant-time comparison against CLUSTER_TOKEN, always False when unset"""
+    if not CLUSTER_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), CLUSTER_TOKEN.encode())
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent-hash ring with CLUSTER_VNODES points per member
+    Adding or removing a member only moves the keys that member owns
+    """
+
+    def __init__(self, members: List[str], vnodes: int = CLUSTER_VNODES):
+        self.members = sorted(set(members))
+        points = sorted((_hash(f"{member}#{index}"), member) for member in self.members for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class SharedStore:
+    """
+    SQLite file shared by the workers of one host
+    Holds finished extractions and short leases naming the worker that is
+    extracting a key right now
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; asyncio.to_thread spreads calls over the pool
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS extractions (key TEXT PRIMARY KEY, payload BLOB NOT NULL, '
+                'expires_at REAL NOT NULL, compute_time REAL NOT NULL DEFAULT 0)'
+            )
+            connection.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, holder TEXT NOT NULL, '
+                               'expires_at REAL NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float, float]]:
+        """(payload, expires_at, compute_time) of a fresh entry"""
+        row = self._connection().execute(
+            'SELECT payload, expires_at, compute_time FROM extractions WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return orjson.loads(row[0]), row[1], row[2]
+
+    def put(self, key: str, payload: Dict[str, Any], expires_at: float, compute_time: float) -> None:
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO extractions (key, payload, expires_at, compute_time) VALUES (?, ?, ?, ?)',
+            (key, orjson.dumps(payload), expires_at, compute_time)
+        )
+        connection.execute('DELETE FROM leases WHERE key = ?', (key,))
+
+    def acquire(self, key: str, holder: str, seconds: float) -> bool:
+        """Take the lease on key unless another live worker holds it"""
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT INTO leases (key, holder, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at '
+            'WHERE leases.expires_at <= ? OR leases.holder = excluded.holder',
+            (key, holder, now + seconds, now)
+        )
+        return cursor.rowcount > 0
+
+    def release(self, key: str, holder: str) -> None:
+        self._connection().execute('DELETE FROM leases WHERE key = ? AND holder = ?', (key, holder))
+
+    def is_leased(self, key: str) -> bool:
+        row = self._connection().execute(
+            'SELECT 1 FROM leases WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def purge(self) -> int:
+        connection = self._connection()
+        now = time.time()
+        removed = connection.execute('DELETE FROM extractions WHERE expires_at <= ?', (now,)).rowcount
+        connection.execute('DELETE FROM leases WHERE expires_at <= ?', (now,))
+        return removed
+
+
+class Cluster:
+    """
+    Coordination layer in front of the waterfall
+    fetch() returns a result another worker or node already has (or is
+    computing) and None when this worker should extract; publish() shares
+    what it extracted
+    """
+
+    def __init__(self, self_url: str, peers: List[str], shared_path: str):
+        self.self_url = self_url
+        self.peers = sorted(set(peers + ([self_url] if self_url and peers else [])))
+        self.store = SharedStore(shared_path) if shared_path else None
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._alive = set(self.peers)
+        self._failures: Dict[str, int] = {}
+        self.ring = HashRing(self.peers)
+        # Starting up is joining: until now the other members owned this member's keys
+        self._previous_ring = HashRing([peer for peer in self.peers if peer != self_url])
+        self._changed_at = time.monotonic()
+        self._leases: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {
+            'shared_hits': 0, 'lease_waits': 0, 'forwarded': 0, 'forward_failures': 0,
+            'handoffs': 0, 'membership_changes': 0,
+        }
+
+    @property
+    def routing_enabled(self) -> bool:
+        return bool(self.self_url and len(self.peers) > 1 and CLUSTER_TOKEN)
+
+    @property
+    def enabled(self) -> bool:
+        return self.routing_enabled or self.store is not None
+
+    def owner(self, key: str) -> Optional[str]:
+        return self.ring.owner(key) if self.routing_enabled else None
+
+    def _set_alive(self, member: str, alive: bool) -> None:
+        if alive == (member in self._alive):
+            return
+        if alive:
+            self._alive.add(member)
+        else:
+            self._alive.discard(member)
+        self._previous_ring = self.ring
+        self.ring = HashRing(sorted(self._alive | {self.self_url}))
+        self._changed_at = time.monotonic()
+        self.counters['membership_changes'] += 1
+        logger.warning(f"Cluster member {member} is {'back' if alive else 'down'}, "
+                       f"{len(self.ring.members)} of {len(self.peers)} members in the ring")
+
+    def _record_failure(self, member: str) -> None:
+        self._failures[member] = self._failures.get(member, 0) + 1
+        if self._failures[member] >= CLUSTER_FAILURE_THRESHOLD:
+            self._set_alive(member, False)
+
+    def _record_success(self, member: str) -> None:
+        self._failures[member] = 0
+        self._set_alive(member, True)
+
+    async def _post(self, member: str, path: str, body: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        session = get_http_client()
+        async with session.post(f"{member}{path}", json=body, headers={TOKEN_HEADER: CLUSTER_TOKEN},
+                                timeout=get_request_timeout(timeout)) as response:
+            if response.status != 200:
+                raise ConnectionError(f"HTTP {response.status} from {member}{path}")
+            return await response.json(loads=orjson.loads)
+
+    async def fetch(self, key: str, url: str, enrich: Optional[bool] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        (payload, seconds it stays fresh) from the owner node, the shared store
+        or the previous owner; None means extract locally and publish()
+        Raises RemoteExtractionError when the owner's extraction failed
+        """
+        owner = self.owner(key)
+        if owner and owner != self.self_url and not forwarded_request.get():
+            self.counters['forwarded'] += 1
+            try:
+                reply = await self._post(owner, '/api/internal/extract', {'url': url, 'enrich': enrich},
+                                         CLUSTER_FORWARD_TIMEOUT)
+            except Exception as e:
+                # Unreachable owner: extract here, and drop it from the ring after repeated failures
+                self.counters['forward_failures'] += 1
+                logger.warning(f"Forwarding {key} to {owner} failed: {str(e) or type(e).__name__}")
+                self._record_failure(owner)
+            else:
+                self._record_success(owner)
+                if 'error' in reply:
+                    raise RemoteExtractionError(reply['error'], reply.get('detail', 'Extraction failed'))
+                if self.store is not None and reply['expires_in'] > 0:
+                    await self.publish(key, reply['data'], time.time() + reply['expires_in'], 0.0)
+                return reply['data'], reply['expires_in']
+
+        if self.store is not None:
+            shared = await self._fetch_shared(key)
+            if shared is not None:
+                return shared
+
+        handed_off = await self._handoff(key)
+        if handed_off is not None and handed_off[1] > 0:
+            # Also lets go of the lease taken above
+            await self.publish(key, handed_off[0], time.time() + handed_off[1], 0.0)
+        return handed_off
+
+    async def _fetch_shared(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        deadline = time.monotonic() + CLUSTER_LEASE_SECONDS
+        waited = False
+        while True:
+            found = await asyncio.to_thread(self.store.get, key)
+            if found is not None:
+                self.counters['shared_hits'] += 1
+                payload, expires_at, _ = found
+                return payload, expires_at - time.time()
+            if await asyncio.to_thread(self.store.acquire, key, self.worker_id, CLUSTER_LEASE_SECONDS):
+                self._leases.add(key)
+                return None
+            # Another worker on this host is extracting it right now
+            if not waited:
+                self.counters['lease_waits'] += 1
+                waited = True
+            if time.monotonic() > deadline:
+                return None
+            await asyncio.sleep(0.2)
+
+    async def _handoff(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Cached copy from the member that owned key before the last membership change"""
+        if not self.routing_enabled or time.monotonic() - self._changed_at > CLUSTER_HANDOFF_SECONDS:
+            return None
+        previous = self._previous_ring.owner(key)
+        if not previous or previous == self.self_url or previous not in self._alive:
+            return None
+        try:
+            reply = await self._post(previous, '/api/internal/cache', {'key': key}, 2)
+        except Exception as e:
+            logger.debug(f"Handoff of {key} from {previous} failed: {str(e)}")
+            return None
+        if reply.get('data') is None:
+            return None
+        self.counters['handoffs'] += 1
+        return reply['data'], reply['expires_in']
+
+    async def publish(self, key: str, payload: Dict[str, Any], expires_at: float, compute_time: float) -> None:
+        """Share a finished extraction with the other workers of this host"""
+        if self.store is None:
+            return
+        try:
+            await asyncio.to_thread(self.store.put, key, payload, expires_at, compute_time)
+        except Exception as e:
+            # The lease stays in _leases for release() to drop
+            logger.warning(f"Shared cache write failed: {str(e)}")
+            return
+        self._leases.discard(key)
+
+    async def release(self, key: str) -> None:
+        """Give up a lease that publish() did not, so waiting workers try themselves"""
+        if self.store is None or key not in self._leases:
+            return
+        self._leases.discard(key)
+        try:
+            await asyncio.to_thread(self.store.release, key, self.worker_id)
+        except Exception as e:
+            logger.warning(f"Shared cache lease release failed: {str(e)}")
+
+    async def _check_members(self) -> None:
+        session = get_http_client()
+        for member in self.peers:
+            if member == self.self_url:
+                continue
+            try:
+                async with session.get(f"{member}/api/internal/ping", headers={TOKEN_HEADER: CLUSTER_TOKEN},
+                                       timeout=get_request_timeout(2)) as response:
+                    if response.status != 200:
+                        raise ValueError(f"HTTP {response.status}")
+                self._record_success(member)
+            except Exception as e:
+                logger.debug(f"Cluster ping to {member} failed: {str(e)}")
+                self._record_failure(member)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(CLUSTER_HEALTH_INTERVAL)
+            try:
+                if self.routing_enabled:
+                    await self._check_members()
+                if self.store is not None:
+                    await asyncio.to_thread(self.store.purge)
+            except Exception as e:
+                logger.warning(f"Cluster maintenance failed: {str(e)}")
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Cluster layer started: {len(self.peers)} members, "
+                        f"shared store {'on' if self.store else 'off'}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'self': self.self_url or None,
+            'members': self.peers,
+            'ring': self.ring.members if self.routing_enabled else [],
+            'shared_store': self.store.path if self.store else None,
+            'leases_held': len(self._leases),
+            **self.counters,
+        }
+
+
+cluster = Cluster(CLUSTER_SELF_URL, CLUSTER_PEERS, CLUSTER_SHARED_CACHE)
+
+
+def get_cluster_stats() -> Dict[str, Any]:
+    return cluster.stats()
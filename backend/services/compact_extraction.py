@@ -0,0 +1,106 @@
+"""
+Compact extraction storage
+Cached extraction results kept as shared key tuples plus value tuples, with
+short repeated strings (codecs, extensions, quality labels) interned, and
+expanded back into the JSON-facing dicts only when a response is built
+"""
+import sys
+from typing import Dict, Any, Optional, Tuple
+
+# Longer strings (URLs, titles) are unique per video and not worth interning
+INTERN_MAX_CHARS = 64
+MAX_SHAPES = 1024
+
+_shapes: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _shape(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """One shared key tuple per distinct dict layout"""
+    shape = _shapes.get(keys)
+    if shape is None:
+        shape = tuple(sys.intern(key) for key in keys)
+        if len(_shapes) < MAX_SHAPES:
+            _shapes[shape] = shape
+    return shape
+
+
+def _intern(value: Any) -> Any:
+    if type(value) is str and len(value) <= INTERN_MAX_CHARS:
+        return sys.intern(value)
+    return value
+
+
+class CompactRecord:
+    """A flat dict stored as (shared keys, values)"""
+
+    __slots__ = ('keys', 'values')
+
+    def __init__(self, mapping: Dict[str, Any]):
+        self.keys = _shape(tuple(mapping))
+        self.values = tuple(_intern(value) for value in mapping.values())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self.values[self.keys.index(key)]
+        except ValueError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.keys, self.values))
+
+
+class CompactExtraction:
+    """
+    An extraction result ({success, method, data: {..., formats: [...]}})
+    Key order is kept, so to_payload() returns exactly what was stored
+    """
+
+    __slots__ = ('envelope', 'data', 'formats')
+
+    def __init__(self, payload: Dict[str, Any]):
+        data = payload['data']
+        self.envelope = CompactRecord({**payload, 'data': None})
+        self.data = CompactRecord({**data, 'formats': None})
+        self.formats = tuple(CompactRecord(fmt) for fmt in data['formats'])
+
+    def get_data(self, key: str, default: Any = None) -> Any:
+        """One top-level data field without expanding the formats"""
+        return self.data.get(key, default)
+
+    def summary(self) -> Dict[str, Any]:
+        """Envelope, platform and the (unexpanded) formats, enough for telemetry"""
+        payload = self.envelope.to_dict()
+        payload['data'] = {'platform': self.data.get('platform', 'Unknown'), 'formats': self.formats}
+        return payload
+
+    def to_payload(self) -> Dict[str, Any]:
+        data = self.data.to_dict()
+        data['formats'] = [fmt.to_dict() for fmt in self.formats]
+        payload = self.envelope.to_dict()
+        payload['data'] = data
+        return payload
+
+
+def compact_payload(payload: Any) -> Any:
+    """CompactExtraction for extraction-shaped payloads, anything else unchanged"""
+    data = payload.get('data') if isinstance(payload, dict) else None
+    formats = data.get('formats') if isinstance(data, dict) else None
+    if not isinstance(formats, list) or not all(isinstance(fmt, dict) for fmt in formats):
+        return payload
+    return CompactExtraction(payload)
+
+
+def expand_payload(stored: Any) -> Any:
+    return stored.to_payload() if isinstance(stored, CompactExtraction) else stored
+
+
+def payload_field(stored: Any, key: str, default: Optional[Any] = None) -> Any:
+    """A top-level data field of a stored payload, compact or not"""
+    if isinstance(stored, CompactExtraction):
+        return stored.get_data(key, default)
+    return stored.get('data', {}).get(key, default)
+
+
+def payload_summary(stored: Any) -> Any:
+    """The stored payload as far as counters need it, without expanding the formats"""
+    return stored.summary() if isinstance(stored, CompactExtraction) else stored
@@ -6,11 +6,20 @@ import logging
 import os
 import tempfile
 import subprocess
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, List, Any, Optional
 import asyncio
 
+from services.cache_service import ExtractionCache, signed_url_expiry
+
 logger = logging.getLogger(__name__)
 
+# Prepared conversions (plan plus chosen source stream) keyed by canonical URL, format and quality
+conversion_cache = ExtractionCache(
+    max_entries=int(os.environ.get('CONVERSION_CACHE_MAX_ENTRIES', '2000')),
+    ttl=float(os.environ.get('EXTRACTION_CACHE_TTL', '1800')),
+)
+
 SUPPORTED_FORMATS = {
     'mp3': {'ext': 'mp3', 'codec': 'libmp3lame', 'type': 'audio'},
     'mp4': {'ext': 'mp4', 'codec': 'libx264', 'type': 'video'},
@@ -67,3 +76,49 @@ def get_supported_formats() -> Dict[str, Any]:
         'audio_formats': [k for k, v in SUPPORTED_FORMATS.items() if v['type'] == 'audio'],
         'video_formats': [k for k, v in SUPPORTED_FORMATS.items() if v['type'] == 'video']
     }
+
+
+def conversion_key(canonical_url: str, output_format: str, quality: str) -> str:
+    return f"{canonical_url}|{output_format}|{quality}"
+
+
+def select_source_format(formats: List[Dict[str, Any]], output_format: str) -> Optional[Dict[str, Any]]:
+    """
+    Stream a conversion should start from
+    Audio targets prefer the largest audio-only stream, falling back to the
+    smallest combined format; video targets take the first (best) combined format
+    """
+    with_audio = [fmt for fmt in formats if fmt.get('url') and fmt.get('has_audio', True)]
+    if not with_audio:
+        return None
+    if SUPPORTED_FORMATS.get(output_format, {}).get('type') == 'audio':
+        audio_only = [fmt for fmt in with_audio if not fmt.get('has_video')]
+        if audio_only:
+            return max(audio_only, key=lambda fmt: fmt.get('filesize') or 0)
+        return min(with_audio, key=lambda fmt: fmt.get('filesize') or float('inf'))
+    return with_audio[0]
+
+
+async def prepare_conversion(canonical_url: str, output_format: str, quality: str = 'medium',
+                             extraction: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build and cache the conversion plan for a video
+    When the extraction is known the plan also names the source stream
+    """
+    result = await convert_media(canonical_url, output_format, quality)
+    if extraction:
+        ttl = conversion_cache.ttl
+        source = select_source_format(extraction.get('data', {}).get('formats', []), output_format)
+        if source:
+            result['source'] = {
+                'format_id': source.get('format_id'),
+                'ext': source.get('ext'),
+                'url': source.get('url'),
+                'filesize': source.get('filesize') or 0,
+            }
+            expiry = signed_url_expiry(source['url'])
+            if expiry:
+                ttl = min(ttl, expiry - conversion_cache.url_expiry_margin - time.time())
+        if ttl > 0:
+            conversion_cache.set(conversion_key(canonical_url, output_format, quality), result, ttl=ttl)
+    return result
@@ -0,0 +1,252 @@
+"""
+Database service
+One async MongoDB client (motor) per process, created in the app lifespan,
+with index bootstrapping and batched background writes
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+# collection -> list of (keys, options) registered by the services
+_index_specs: Dict[str, List[tuple]] = {}
+_writers: List["BatchWriter"] = []
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def get_pool_options() -> Dict[str, int]:
+    """Connection pool settings, sized for one client shared by the whole process"""
+    return {
+        'maxPoolSize': _env_int('MONGO_MAX_POOL_SIZE', 50),
+        'minPoolSize': _env_int('MONGO_MIN_POOL_SIZE', 2),
+        'maxIdleTimeMS': _env_int('MONGO_MAX_IDLE_TIME_MS', 60000),
+        'waitQueueTimeoutMS': _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000),
+        'serverSelectionTimeoutMS': _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 3000),
+        'connectTimeoutMS': _env_int('MONGO_CONNECT_TIMEOUT_MS', 3000),
+    }
+
+
+def _create_client():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        retryWrites=True,
+        appname='reload-video-downloader',
+        **get_pool_options(),
+    )
+
+
+def is_database_configured() -> bool:
+    return bool(os.environ.get('MONGO_URL'))
+
+
+def init_database() -> None:
+    """Create the shared client (called from the app lifespan)"""
+    global _client
+    if _client is None and is_database_configured():
+        _client = _create_client()
+        logger.info("MongoDB client created")
+
+
+def get_database():
+    """
+    Return the application database, or None when MONGO_URL is not configured
+    Falls back to creating the client on first use outside the lifespan
+    """
+    if not is_database_configured():
+        return None
+    if _client is None:
+        init_database()
+    return _client[os.environ.get('DB_NAME', 'video_downloader')]
+
+
+def close_database() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def register_indexes(collection_name: str, indexes: List[tuple]) -> None:
+    """
+    Declare indexes for a collection, created by bootstrap_indexes at startup
+    Each entry is (keys, options) as passed to create_index
+    """
+    _index_specs.setdefault(collection_name, []).extend(indexes)
+
+
+async def bootstrap_indexes() -> None:
+    """
+    Create every registered index
+    An unreachable server is logged once and does not block startup
+    """
+    db = get_database()
+    if db is None:
+        return
+    try:
+        await db.command('ping')
+    except Exception as e:
+        logger.warning(f"MongoDB unreachable, skipping index bootstrap: {str(e)[:200]}")
+        return
+
+    for collection_name, indexes in _index_specs.items():
+        for keys, options in indexes:
+            try:
+                await db[collection_name].create_index(keys, **options)
+            except Exception as e:
+                logger.warning(f"Index {options.get('name', keys)} on {collection_name} failed: {str(e)}")
+
+
+def register_writer(writer: "BatchWriter") -> "BatchWriter":
+    """Track a BatchWriter so the lifespan starts and drains it"""
+    _writers.append(writer)
+    return writer
+
+
+def start_writers() -> None:
+    if not is_database_configured():
+        return
+    for writer in _writers:
+        writer.start()
+
+
+async def stop_writers() -> None:
+    for writer in _writers:
+        await writer.stop()
+
+
+def get_writer_stats() -> Dict[str, Dict[str, Any]]:
+    return {writer.collection_name: writer.stats() for writer in _writers}
+
+
+async def database_health() -> Dict[str, Any]:
+    """Ping the server and report pool settings and writer backlogs"""
+    if not is_database_configured():
+        return {'status': 'disabled'}
+
+    health: Dict[str, Any] = {
+        'writers': get_writer_stats(),
+    }
+    try:
+        db = get_database()
+        started = time.perf_counter()
+        await asyncio.wait_for(db.command('ping'), timeout=2)
+        health['status'] = 'ok'
+        health['ping_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        health['status'] = 'unavailable'
+        health['error'] = str(e)[:200]
+
+    health['pool'] = get_pool_options()
+    return health
+
+
+# Queued by BatchWriter.stop() to end the writer loop
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Buffers documents in memory and writes them with insert_many off the request path
+    Flushes every batch_size documents or flush_interval seconds, whichever comes first
+    """
+
+    def __init__(self, collection_name: str, batch_size: int = 100,
+                 flush_interval: float = 1.0, max_queue: int = 10000):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, document: Dict[str, Any]) -> bool:
+        """Queue a document without waiting, returns False when it had to be dropped"""
+        try:
+            self._queue.put_nowait(document)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the background task and flush whatever is still queued
+        The task is told to stop with a sentinel rather than cancelled, so the
+        batch it is collecting is written instead of lost
+        """
+        if self._task is not None:
+            if not self._task.done():
+                await self._queue.put(_STOP)
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Batch writer for {self.collection_name} failed: {str(e)}")
+            self._task = None
+
+        remaining = []
+        while not self._queue.empty():
+            document = self._queue.get_nowait()
+            if document is not _STOP:
+                remaining.append(document)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            document = await self._queue.get()
+            if document is _STOP:
+                return
+            batch = [document]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    document = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if document is _STOP:
+                    stopping = True
+                    break
+                batch.append(document)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        db = get_database()
+        if db is None or not batch:
+            return
+        try:
+            await db[self.collection_name].insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Batch write to {self.collection_name} failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
@@ -0,0 +1,395 @@
+"""
+Direct media service for links that point straight at a media file
+Recognizes .mp4/.webm/.m3u8 style URLs and probes them with one ranged GET,
+so they never go through yt-dlp's generic extractor or a browser
+"""
+import logging
+import os
+import re
+import struct
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlparse, unquote, urljoin
+
+from services.ytdlp_service import format_file_size
+from services.http_client import get_http_client, get_request_timeout
+
+logger = logging.getLogger(__name__)
+
+# Extension -> container
+DIRECT_MEDIA_EXTENSIONS = {
+    'mp4': 'mp4',
+    'm4v': 'mp4',
+    'mov': 'mov',
+    'webm': 'webm',
+    'mkv': 'mkv',
+    'm3u8': 'm3u8',
+    'mp3': 'mp3',
+    'm4a': 'm4a',
+    'aac': 'aac',
+    'ogg': 'ogg',
+    'opus': 'opus',
+    'wav': 'wav',
+    'flac': 'flac',
+}
+
+# Content-Type -> container
+MEDIA_CONTENT_TYPES = {
+    'video/mp4': 'mp4',
+    'video/x-m4v': 'mp4',
+    'video/quicktime': 'mov',
+    'video/webm': 'webm',
+    'video/x-matroska': 'mkv',
+    'application/vnd.apple.mpegurl': 'm3u8',
+    'application/x-mpegurl': 'm3u8',
+    'audio/mpegurl': 'm3u8',
+    'audio/x-mpegurl': 'm3u8',
+    'audio/mpeg': 'mp3',
+    'audio/mp4': 'm4a',
+    'audio/aac': 'aac',
+    'audio/ogg': 'ogg',
+    'audio/opus': 'opus',
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/flac': 'flac',
+    'audio/webm': 'webm',
+    'audio/x-matroska': 'mka',
+    'video/mp2t': 'ts',
+    'video/mpeg': 'mpg',
+    'video/x-msvideo': 'avi',
+    'video/avi': 'avi',
+    'video/x-flv': 'flv',
+    'video/x-f4v': 'mp4',
+    'video/3gpp': '3gp',
+    'video/x-ms-wmv': 'wmv',
+    'video/x-ms-asf': 'asf',
+    'video/ogg': 'ogv',
+}
+
+# Extensions that may be media but are often served as something else; they get
+# one quick Content-Type probe (anything else goes to yt-dlp). Extension ->
+# container for generic octet-stream responses, None where only the type can tell
+GUESSED_MEDIA_EXTENSIONS = {
+    'bin': None,
+    'dat': None,
+    'ts': 'ts',
+    'm2ts': 'ts',
+    'mts': 'ts',
+    'mpg': 'mpg',
+    'mpeg': 'mpg',
+    'avi': 'avi',
+    'flv': 'flv',
+    'f4v': 'mp4',
+    '3gp': '3gp',
+    'wmv': 'wmv',
+    'asf': 'asf',
+    'ogv': 'ogv',
+    'oga': 'ogg',
+    'weba': 'webm',
+    'mka': 'mka',
+}
+
+AUDIO_CONTAINERS = {'mp3', 'm4a', 'aac', 'ogg', 'opus', 'wav', 'flac', 'mka'}
+
+PROBE_BYTES = 64 * 1024
+MOOV_PROBE_BYTES = 16 * 1024
+MAX_BOX_HOPS = 3
+
+
+def get_url_extension(url: str) -> str:
+    """Lowercase extension of the URL path ('' if none)"""
+    filename = unquote(urlparse(url).path.rsplit('/', 1)[-1])
+    if '.' not in filename:
+        return ''
+    return filename.rsplit('.', 1)[-1].lower()
+
+
+def looks_like_direct_media(url: str) -> bool:
+    """
+    Level 0 classifier
+    True for known media extensions and for GUESSED_MEDIA_EXTENSIONS, which
+    are worth one short Content-Type probe
+    """
+    if not url.lower().startswith(('http://', 'https://')):
+        return False
+
+    ext = get_url_extension(url)
+    return ext in DIRECT_MEDIA_EXTENSIONS or ext in GUESSED_MEDIA_EXTENSIONS
+
+
+def container_from_content_type(content_type: str) -> Optional[str]:
+    """Map a Content-Type header to a container name"""
+    mime = (content_type or '').split(';')[0].strip().lower()
+    return MEDIA_CONTENT_TYPES.get(mime)
+
+
+def parse_total_size(headers: Dict[str, str], status: int) -> int:
+    """Total resource size from Content-Range, or Content-Length on a full response"""
+    content_range = headers.get('Content-Range', '')
+    match = re.match(r'bytes\s+\d+-\d+/(\d+)', content_range)
+    if match:
+        return int(match.group(1))
+    if status == 200 and headers.get('Content-Length', '').isdigit():
+        return int(headers['Content-Length'])
+    return 0
+
+
+def iter_mp4_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, header_size, box_size, offset) for ISO BMFF boxes in data"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type.decode('latin-1'), header, size, offset
+        offset += size
+
+
+def parse_mvhd_duration(data: bytes, offset: int) -> Optional[float]:
+    """Duration in seconds from an mvhd box payload"""
+    if offset + 4 > len(data):
+        return None
+    version = data[offset]
+    if version == 1 and offset + 32 <= len(data):
+        timescale, duration = struct.unpack('>IQ', data[offset + 20:offset + 32])
+    elif version == 0 and offset + 20 <= len(data):
+        timescale, duration = struct.unpack('>II', data[offset + 12:offset + 20])
+    else:
+        return None
+    return duration / timescale if timescale else None
+
+
+def probe_mp4_duration(data: bytes) -> Tuple[Optional[float], Optional[int]]:
+    """
+    Look for moov/mvhd in a chunk that starts on a box boundary
+    Returns (duration, None) when found, or (None, offset_of_next_box) when
+    the chunk ends inside a box (usually mdat before moov)
+    """
+    for box_type, header, size, offset in iter_mp4_boxes(data):
+        if box_type == 'moov':
+            for child_type, child_header, _, child_offset in iter_mp4_boxes(data, offset + header, min(offset + size, len(data))):
+                if child_type == 'mvhd':
+                    return parse_mvhd_duration(data, child_offset + child_header), None
+            return None, None
+        if offset + size > len(data):
+            return None, offset + size
+    return None, None
+
+
+def read_ebml_vint(data: bytes, offset: int, keep_marker: bool) -> Tuple[Optional[int], int]:
+    """Read an EBML variable-length integer, returns (value, length)"""
+    if offset >= len(data):
+        return None, 0
+    first = data[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or offset + length > len(data):
+        return None, 0
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TIMECODE_SCALE = 0x2AD7B1
+EBML_DURATION = 0x4489
+
+
+def probe_webm_duration(data: bytes) -> Optional[float]:
+    """Duration in seconds from the Segment/Info element of a WebM/Matroska head"""
+    offset = 0
+    info_end = None
+    timecode_scale = 1000000
+    duration = None
+
+    while offset < len(data) and (info_end is None or offset < info_end):
+        element_id, id_length = read_ebml_vint(data, offset, keep_marker=True)
+        size, size_length = read_ebml_vint(data, offset + id_length, keep_marker=False)
+        if element_id is None or size is None:
+            break
+        payload = offset + id_length + size_length
+
+        if element_id == EBML_SEGMENT:
+            # Descend, the Segment size is often "unknown"
+            offset = payload
+            continue
+        if element_id == EBML_INFO:
+            info_end = payload + size
+            offset = payload
+            continue
+        if element_id == EBML_TIMECODE_SCALE:
+            timecode_scale = int.from_bytes(data[payload:payload + size], 'big') or timecode_scale
+        elif element_id == EBML_DURATION:
+            if size == 4:
+                duration = struct.unpack('>f', data[payload:payload + 4])[0]
+            elif size == 8:
+                duration = struct.unpack('>d', data[payload:payload + 8])[0]
+        offset = payload + size
+
+    if duration is None:
+        return None
+    return duration * timecode_scale / 1e9
+
+
+def parse_hls_playlist(text: str, base_url: str) -> Dict[str, Any]:
+    """
+    Parse an HLS playlist
+    Media playlists give a duration, master playlists give their variants
+    """
+    duration = 0.0
+    variants = []
+    pending_variant = None
+    is_vod = '#EXT-X-ENDLIST' in text
+
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXTINF:'):
+            try:
+                duration += float(line[8:].split(',', 1)[0])
+            except ValueError:
+                pass
+        elif line.startswith('#EXT-X-STREAM-INF:'):
+            attrs = dict(re.findall(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)', line[18:]))
+            pending_variant = {k: v.strip('"') for k, v in attrs.items()}
+        elif line and not line.startswith('#') and pending_variant is not None:
+            pending_variant['url'] = urljoin(base_url, line)
+            variants.append(pending_variant)
+            pending_variant = None
+
+    return {
+        'duration': duration if is_vod else 0,
+        'variants': variants,
+    }
+
+
+def build_format(url: str, container: str, filesize: int, format_id: str = 'direct',
+                 quality: str = 'Best Available', resolution: Optional[str] = None) -> Dict[str, Any]:
+    """Format entry in the same shape as process_formats output"""
+    is_audio = container in AUDIO_CONTAINERS
+    format_data = {
+        'format_id': format_id,
+        'quality': quality if not is_audio else 'Audio Only',
+        'ext': container,
+        'filesize': filesize,
+        'filesize_readable': format_file_size(filesize) if filesize else 'Unknown',
+        'url': url,
+        'has_video': not is_audio,
+        'has_audio': True,
+        'type': 'audio' if is_audio else 'video',
+    }
+    if resolution:
+        format_data['resolution'] = resolution
+    return format_data
+
+
+def build_hls_formats(url: str, playlist: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One format per master playlist variant, or the playlist itself"""
+    if not playlist['variants']:
+        return [build_format(url, 'm3u8', 0)]
+
+    formats = []
+    variants = sorted(playlist['variants'], key=lambda v: int(v.get('BANDWIDTH', 0) or 0), reverse=True)
+    for idx, variant in enumerate(variants):
+        resolution = variant.get('RESOLUTION')
+        height = resolution.split('x')[-1] if resolution else ''
+        quality = f"{height}p" if height.isdigit() else f"{int(variant.get('BANDWIDTH', 0) or 0) // 1000}kbps"
+        formats.append(build_format(variant['url'], 'm3u8', 0, f'hls_{idx}', quality, resolution))
+    return formats
+
+
+async def fetch_range(session, url: str, start: int, length: int, timeout) -> Tuple[int, Dict[str, str], bytes]:
+    """Ranged GET that reads at most length bytes even if the server ignores Range"""
+    headers = {'Range': f'bytes={start}-{start + length - 1}'}
+    async with session.get(url, headers=headers, allow_redirects=True, timeout=timeout) as response:
+        chunks = []
+        received = 0
+        async for chunk in response.content.iter_chunked(8192):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= length:
+                break
+        return response.status, dict(response.headers), b''.join(chunks)[:length]
+
+
+async def probe_direct_media(url: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Probe a direct media URL with one ranged GET on the shared client
+    Returns video data in the /api/extract shape, or None when the URL is not media
+    """
+    if timeout is None:
+        if get_url_extension(url) in DIRECT_MEDIA_EXTENSIONS:
+            timeout = float(os.environ.get('DIRECT_MEDIA_PROBE_TIMEOUT', '3'))
+        else:
+            # Only a guess, so yt-dlp is not kept waiting on a slow page
+            timeout = float(os.environ.get('DIRECT_MEDIA_GUESS_TIMEOUT', '0.5'))
+
+    try:
+        session = get_http_client()
+        request_timeout = get_request_timeout(timeout)
+
+        status, headers, head = await fetch_range(session, url, 0, PROBE_BYTES, request_timeout)
+        if status >= 400:
+            raise ValueError(f"HTTP {status}")
+
+        container = container_from_content_type(headers.get('Content-Type', ''))
+        if container is None:
+            # Generic types (octet-stream, binary/octet-stream) fall back to the extension
+            mime = headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if mime.startswith('text/html'):
+                return None
+            ext = get_url_extension(url)
+            container = DIRECT_MEDIA_EXTENSIONS.get(ext) or GUESSED_MEDIA_EXTENSIONS.get(ext)
+        if container is None and head.startswith(b'#EXTM3U'):
+            container = 'm3u8'
+        if container is None:
+            return None
+
+        filesize = parse_total_size(headers, status)
+        duration = None
+
+        if container == 'm3u8':
+            playlist = parse_hls_playlist(head.decode('utf-8', errors='replace'), url)
+            duration = playlist['duration']
+            formats = build_hls_formats(url, playlist)
+        else:
+            if container in ('mp4', 'mov', 'm4a'):
+                duration, next_box = probe_mp4_duration(head)
+                hops = 0
+                # moov after mdat: jump straight to the next box header
+                while duration is None and next_box and hops < MAX_BOX_HOPS and (not filesize or next_box < filesize):
+                    _, _, chunk = await fetch_range(session, url, next_box, MOOV_PROBE_BYTES, request_timeout)
+                    duration, relative_next = probe_mp4_duration(chunk)
+                    next_box = next_box + relative_next if relative_next else None
+                    hops += 1
+            elif container in ('webm', 'mkv'):
+                duration = probe_webm_duration(head)
+            formats = [build_format(url, container, filesize)]
+
+        filename = unquote(urlparse(url).path.rsplit('/', 1)[-1]) or 'Direct Media'
+        logger.info(f"Direct media probe: {container}, {filesize} bytes, duration={duration}")
+
+        return {
+            'title': filename,
+            'platform': 'Direct Link',
+            'webpage_url': url,
+            'formats': formats,
+            'thumbnail': '',
+            'duration': int(round(duration)) if duration else 0,
+        }
+
+    except Exception as e:
+        logger.error(f"Direct media probe failed: {str(e)}")
+        raise ValueError(f"Direct media probe failed: {str(e)}")
@@ -0,0 +1,90 @@
+"""
+Format enrichment service
+Fills in unknown file sizes and content types with concurrent, time-boxed
+HEAD / ranged GET probes over the shared connection pool
+"""
+import asyncio
+import logging
+import os
+import re
+from typing import Dict, List, Any, Optional
+
+from services.http_client import get_http_client, get_request_timeout
+from services.ytdlp_service import format_file_size
+
+logger = logging.getLogger(__name__)
+
+ENRICH_CONCURRENCY = int(os.environ.get('ENRICH_CONCURRENCY', '8'))
+
+# Manifests have no meaningful Content-Length
+SKIP_EXTENSIONS = {'m3u8', 'mpd'}
+
+
+def is_enrichment_enabled(requested: Optional[bool] = None) -> bool:
+    """Per-request flag wins, otherwise the ENRICH_FILESIZES environment default"""
+    if requested is not None:
+        return requested
+    return os.environ.get('ENRICH_FILESIZES', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def needs_probe(fmt: Dict[str, Any]) -> bool:
+    return bool(fmt.get('url')) and not fmt.get('filesize') and fmt.get('ext') not in SKIP_EXTENSIONS
+
+
+async def probe_url(session, url: str, timeout) -> Dict[str, Any]:
+    """
+    HEAD first, ranged GET of one byte when HEAD is refused or has no length
+    Returns {'filesize', 'content_type'}
+    """
+    async with session.head(url, allow_redirects=True, timeout=timeout) as response:
+        content_type = response.headers.get('Content-Type', '')
+        length = response.headers.get('Content-Length', '')
+        if response.status < 400 and length.isdigit() and int(length) > 0:
+            return {'filesize': int(length), 'content_type': content_type}
+
+    async with session.get(url, headers={'Range': 'bytes=0-0'}, allow_redirects=True, timeout=timeout) as response:
+        content_type = response.headers.get('Content-Type', content_type)
+        match = re.match(r'bytes\s+\d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+        if match:
+            return {'filesize': int(match.group(1)), 'content_type': content_type}
+
+    return {'filesize': 0, 'content_type': content_type}
+
+
+async def enrich_formats(formats: List[Dict[str, Any]], budget: float) -> Dict[str, Any]:
+    """
+    Probe every format without a size, in place, within budget seconds
+    Probes still running when the budget runs out are cancelled
+    Returns counters for logging
+    """
+    targets = [fmt for fmt in formats if needs_probe(fmt)]
+    stats = {'probed': len(targets), 'filled': 0, 'timed_out': 0}
+    if not targets or budget <= 0:
+        return stats
+
+    session = get_http_client()
+    timeout = get_request_timeout(budget)
+    semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+    async def probe(fmt: Dict[str, Any]) -> None:
+        async with semaphore:
+            try:
+                result = await probe_url(session, fmt['url'], timeout)
+            except Exception as e:
+                logger.debug(f"Size probe failed for {fmt.get('format_id')}: {str(e)}")
+                return
+        if result['filesize']:
+            fmt['filesize'] = result['filesize']
+            fmt['filesize_readable'] = format_file_size(result['filesize'])
+            stats['filled'] += 1
+        if result['content_type']:
+            fmt['content_type'] = result['content_type'].split(';')[0].strip()
+
+    tasks = [asyncio.create_task(probe(fmt)) for fmt in targets]
+    _, pending = await asyncio.wait(tasks, timeout=budget)
+    for task in pending:
+        task.cancel()
+    stats['timed_out'] = len(pending)
+
+    logger.info(f"Enrichment filled {stats['filled']}/{stats['probed']} sizes ({stats['timed_out']} timed out)")
+    return stats
@@ -0,0 +1,171 @@
+"""
+Download history service
+Server-side history per browser session, written in batches off the request
+path and read back with cursor-based pagination
+"""
+import base64
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+
+from services.cache_service import canonicalize_url
+from services.database import get_database, register_indexes, register_writer, BatchWriter
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLLECTION = 'history'
+HISTORY_MAX_LIMIT = 100
+
+# Fields a client may ask for, _id/created_at always come back as id/timestamp
+HISTORY_FIELDS = {'url', 'canonical_url', 'title', 'thumbnail', 'platform', 'method', 'duration'}
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+history_writer = register_writer(BatchWriter(
+    HISTORY_COLLECTION,
+    batch_size=int(os.environ.get('HISTORY_BATCH_SIZE', '100')),
+    flush_interval=float(os.environ.get('HISTORY_FLUSH_INTERVAL', '1')),
+))
+
+# Per-session listing, canonical URL lookups and recent-URL scans
+register_indexes(HISTORY_COLLECTION, [
+    ([('session_id', 1), ('created_at', -1), ('_id', -1)], {'name': 'session_created_at'}),
+    ([('canonical_url', 1)], {'name': 'canonical_url'}),
+    ([('created_at', -1)], {'name': 'created_at'}),
+])
+
+
+def is_history_enabled() -> bool:
+    return get_database() is not None
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    return bool(session_id and SESSION_ID_PATTERN.match(session_id))
+
+
+def record_history(session_id: str, url: str, result: Dict[str, Any]) -> None:
+    """Queue a history entry for an extraction result (never blocks the request)"""
+    if not is_history_enabled():
+        return
+    data = result.get('data', {})
+    history_writer.submit({
+        'session_id': session_id,
+        'url': url,
+        'canonical_url': canonicalize_url(url),
+        'title': data.get('title', 'Unknown'),
+        'thumbnail': data.get('thumbnail', ''),
+        'platform': data.get('platform', 'Unknown'),
+        'method': result.get('method', ''),
+        'duration': data.get('duration', 0),
+        'created_at': datetime.now(timezone.utc),
+    })
+
+
+def encode_cursor(created_at: datetime, object_id) -> str:
+    millis = int(created_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    raw = f"{millis}:{object_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Returns (created_at, ObjectId), raises ValueError on malformed cursors"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        millis, object_id = base64.urlsafe_b64decode(padded).decode().split(':', 1)
+        created_at = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc)
+        return created_at, ObjectId(object_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+
+def to_history_item(document: Dict[str, Any]) -> Dict[str, Any]:
+    item = {key: value for key, value in document.items() if key in HISTORY_FIELDS}
+    item['id'] = str(document['_id'])
+    item['timestamp'] = int(document['created_at'].replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return item
+
+
+async def list_history(session_id: str, cursor: Optional[str] = None, limit: int = 20,
+                       fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    One page of a session's history, newest first
+    Seeks on (created_at, _id) so every page costs the same regardless of depth
+    """
+    db = get_database()
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    wanted = [f for f in (fields or HISTORY_FIELDS) if f in HISTORY_FIELDS]
+    projection = {field: 1 for field in wanted}
+    projection['created_at'] = 1
+
+    query: Dict[str, Any] = {'session_id': session_id}
+    if cursor:
+        created_at, object_id = decode_cursor(cursor)
+        query['$or'] = [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': object_id}},
+        ]
+
+    documents = await (
+        db[HISTORY_COLLECTION]
+        .find(query, projection)
+        .sort([('created_at', -1), ('_id', -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = None
+    if has_more:
+        last = documents[-1]
+        next_cursor = encode_cursor(last['created_at'], last['_id'])
+
+    return {
+        'items': [to_history_item(doc) for doc in documents],
+        'next_cursor': next_cursor,
+    }
+
+
+async def clear_history(session_id: str) -> int:
+    db = get_database()
+    result = await db[HISTORY_COLLECTION].delete_many({'session_id': session_id})
+    return result.deleted_count
+
+
+async def find_thumbnail(canonical_url: str) -> Optional[str]:
+    """Thumbnail recorded for a canonical URL, avoids re-extracting for history cards"""
+    db = get_database()
+    if db is None:
+        return None
+    document = await db[HISTORY_COLLECTION].find_one(
+        {'canonical_url': canonical_url, 'thumbnail': {'$nin': ['', None]}},
+        {'thumbnail': 1, '_id': 0},
+    )
+    return document['thumbnail'] if document else None
+
+
+async def recent_canonical_urls(limit: int = 100) -> List[str]:
+    """Most recently requested canonical URLs across all sessions (cache warmer input)"""
+    db = get_database()
+    if db is None:
+        return []
+    documents = await (
+        db[HISTORY_COLLECTION]
+        .find({}, {'canonical_url': 1, '_id': 0})
+        .sort([('created_at', -1)])
+        .limit(limit * 5)
+        .to_list(length=limit * 5)
+    )
+    urls = []
+    for doc in documents:
+        url = doc.get('canonical_url')
+        if url and url not in urls:
+            urls.append(url)
+            if len(urls) >= limit:
+                break
+    return urls
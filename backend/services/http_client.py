@@ -0,0 +1,178 @@
+"""
+Shared HTTP client for all outbound requests
+One aiohttp session per process with a bounded keep-alive connection pool and
+DNS cache, opened and closed by the FastAPI lifespan
+"""
+import logging
+import os
+from typing import Dict, Any, Optional
+
+from services.tracing_service import span
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
+
+_session = None
+
+# Counters fed by aiohttp trace hooks
+_stats = {
+    'requests': 0,
+    'request_errors': 0,
+    'connections_created': 0,
+    'connections_reused': 0,
+    'connections_queued': 0,
+    'dns_cache_hits': 0,
+    'dns_cache_misses': 0,
+}
+_queued_now = 0
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def _build_trace_config():
+    import aiohttp
+
+    trace_config = aiohttp.TraceConfig()
+
+    # Request, DNS and connect spans hang off the caller's current span
+    async def on_request_start(session, ctx, params):
+        ctx.span = span(f"http.{params.method.lower()}", host=params.url.host or '', path=params.url.path[:120])
+
+    async def on_request_end(session, ctx, params):
+        _stats['requests'] += 1
+        ctx.span.set('http.status_code', params.response.status)
+        ctx.span.finish()
+
+    async def on_request_exception(session, ctx, params):
+        _stats['request_errors'] += 1
+        ctx.span.record_error(params.exception)
+        ctx.span.finish()
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.dns_span = span('dns', parent=ctx.span, host=params.host)
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        ctx.dns_span.finish()
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.connect_span = span('connect', parent=ctx.span)
+
+    async def on_connection_create_end(session, ctx, params):
+        _stats['connections_created'] += 1
+        ctx.connect_span.finish()
+
+    async def on_connection_reuseconn(session, ctx, params):
+        _stats['connections_reused'] += 1
+
+    async def on_connection_queued_start(session, ctx, params):
+        global _queued_now
+        _stats['connections_queued'] += 1
+        _queued_now += 1
+
+    async def on_connection_queued_end(session, ctx, params):
+        global _queued_now
+        _queued_now -= 1
+
+    async def on_dns_cache_hit(session, ctx, params):
+        _stats['dns_cache_hits'] += 1
+
+    async def on_dns_cache_miss(session, ctx, params):
+        _stats['dns_cache_misses'] += 1
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+    return trace_config
+
+
+def _create_session():
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(
+        limit=_env_int('HTTP_POOL_LIMIT', 100),
+        limit_per_host=_env_int('HTTP_POOL_LIMIT_PER_HOST', 10),
+        ttl_dns_cache=_env_int('HTTP_DNS_CACHE_TTL', 300),
+        keepalive_timeout=_env_int('HTTP_KEEPALIVE_TIMEOUT', 30),
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=_env_int('HTTP_DEFAULT_TIMEOUT', 30)),
+        headers={'User-Agent': USER_AGENT},
+        trace_configs=[_build_trace_config()],
+    )
+
+
+async def start_http_client() -> None:
+    """Open the shared session (called from the app lifespan)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+        logger.info("Shared HTTP client started")
+
+
+async def close_http_client() -> None:
+    """Close the shared session and its pooled connections"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Shared HTTP client closed")
+    _session = None
+
+
+def get_http_client():
+    """
+    Return the shared aiohttp session
+    Created on first use when the lifespan did not run (scripts, benchmarks)
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Connection pool usage and request counters"""
+    stats: Dict[str, Any] = dict(_stats)
+    stats['queued_now'] = _queued_now
+
+    if _session is None or _session.closed:
+        stats['open'] = False
+        return stats
+
+    connector = _session.connector
+    # aiohttp keeps pool state in private attributes, read them defensively
+    acquired_per_host = getattr(connector, '_acquired_per_host', {}) or {}
+    idle = getattr(connector, '_conns', {}) or {}
+    stats.update({
+        'open': True,
+        'limit': connector.limit,
+        'limit_per_host': connector.limit_per_host,
+        'in_use': len(getattr(connector, '_acquired', ()) or ()),
+        'idle': sum(len(conns) for conns in idle.values()),
+        'hosts': {
+            f"{key.host}:{key.port}": len(conns)
+            for key, conns in acquired_per_host.items()
+            if conns
+        },
+    })
+    return stats
+
+
+def get_request_timeout(seconds: Optional[float]):
+    """Per-request timeout object for calls on the shared session"""
+    import aiohttp
+
+    return aiohttp.ClientTimeout(total=seconds)
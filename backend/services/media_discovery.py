@@ -0,0 +1,151 @@
+"""
+Media discovery shared by the scraping tiers
+Streams HTML into lxml's incremental (libxml2) parser and keeps only the
+elements the extractors look at, so large pages never build a full tree
+"""
+import logging
+import os
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+HTML_MAX_BYTES = int(os.environ.get('HTML_MAX_BYTES', str(2 * 1024 * 1024)))
+HTML_CHUNK_BYTES = 16 * 1024
+
+# Extensions the <img> scan treats as misnamed video
+IMG_VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov')
+
+
+class MediaDiscovery:
+    """
+    Incremental collector for <meta>, <link>, JSON-LD, <title>, <video>/<source> and <img>
+    Feed bytes as they arrive, read the collected fields at any point
+    """
+
+    def __init__(self, encoding: Optional[str] = None):
+        from lxml import etree
+
+        self._parser = etree.HTMLPullParser(events=('end',), encoding=encoding)
+        self.meta: Dict[str, str] = {}
+        self.links: List[Dict[str, str]] = []
+        self.ld_json: List[str] = []
+        self.videos: List[Dict[str, Any]] = []
+        self.img_sources: List[str] = []
+        self.title: str = ''
+        self.head_closed = False
+        self.bytes_read = 0
+
+    def feed(self, data) -> None:
+        """Parse another chunk (bytes or str)"""
+        self.bytes_read += len(data)
+        self._parser.feed(data)
+        self._collect()
+
+    def close(self) -> None:
+        """Flush the parser at end of input or when stopping early"""
+        try:
+            self._parser.close()
+        except Exception:
+            # Truncated documents are expected when the byte cap is hit
+            pass
+        self._collect()
+
+    def _collect(self) -> None:
+        for _, element in self._parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ''
+
+            if tag == 'meta':
+                key = (element.get('property') or element.get('name') or '').strip().lower()
+                content = element.get('content')
+                if key and content and key not in self.meta:
+                    self.meta[key] = content.strip()
+            elif tag == 'link':
+                if element.get('href'):
+                    self.links.append({
+                        'rel': (element.get('rel') or '').lower(),
+                        'type': (element.get('type') or '').lower(),
+                        'href': element.get('href'),
+                    })
+            elif tag == 'script':
+                if (element.get('type') or '').lower() == 'application/ld+json' and element.text:
+                    self.ld_json.append(element.text)
+            elif tag == 'title':
+                if not self.title:
+                    self.title = (element.text or '').strip()
+            elif tag == 'video':
+                self.videos.append({
+                    'src': element.get('src'),
+                    'poster': element.get('poster'),
+                    'sources': [
+                        {'src': source.get('src'), 'type': source.get('type')}
+                        for source in element.iter('source')
+                        if source.get('src')
+                    ],
+                })
+            elif tag == 'img':
+                src = element.get('src')
+                if src and any(ext in src for ext in IMG_VIDEO_EXTENSIONS):
+                    self.img_sources.append(src)
+            elif tag == 'head':
+                self.head_closed = True
+
+            # Children of <video> are read when it closes, everything else can go
+            if next(element.iterancestors('video'), None) is not None:
+                continue
+            parent = element.getparent()
+            element.clear()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def has_head_media(self) -> bool:
+        """True once the <head> exposed a video URL or JSON-LD block"""
+        return self.head_closed and bool(
+            self.ld_json
+            or any(key.startswith(('og:video', 'twitter:player:stream')) for key in self.meta)
+        )
+
+
+def discover_media(html: str) -> MediaDiscovery:
+    """Run discovery over an already loaded document (e.g. Playwright page content)"""
+    discovery = MediaDiscovery()
+    discovery.feed(html)
+    discovery.close()
+    return discovery
+
+
+async def fetch_and_discover(session, url: str, stop_at_head: bool = False,
+                             max_bytes: Optional[int] = None, timeout=None) -> Dict[str, Any]:
+    """
+    Stream a page into MediaDiscovery
+    Stops at the byte cap, or right after </head> when stop_at_head is set and
+    the head already carried media metadata
+    Returns {'discovery', 'url', 'status', 'truncated'}
+    """
+    max_bytes = max_bytes or HTML_MAX_BYTES
+    request_kwargs = {'timeout': timeout} if timeout is not None else {}
+
+    async with session.get(url, **request_kwargs) as response:
+        if response.status >= 400:
+            raise ValueError(f"HTTP {response.status}")
+
+        discovery = MediaDiscovery(encoding=response.charset)
+        truncated = False
+
+        async for chunk in response.content.iter_chunked(HTML_CHUNK_BYTES):
+            discovery.feed(chunk)
+            if stop_at_head and discovery.has_head_media():
+                truncated = True
+                break
+            if discovery.bytes_read >= max_bytes:
+                truncated = True
+                logger.info(f"HTML byte cap reached after {discovery.bytes_read} bytes: {url}")
+                break
+
+        discovery.close()
+        return {
+            'discovery': discovery,
+            'url': str(response.url),
+            'status': response.status,
+            'truncated': truncated,
+        }
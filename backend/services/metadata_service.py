@@ -0,0 +1,216 @@
+"""
+Page metadata service for lightweight extraction
+Reads OpenGraph, Twitter player, JSON-LD VideoObject and oEmbed data from a
+single page fetch, used before falling back to a browser
+"""
+import json
+import logging
+import re
+from typing import Dict, List, Any, Optional
+from urllib.parse import urljoin
+
+from services.media_discovery import fetch_and_discover
+from services.http_client import get_http_client, get_request_timeout
+from services.direct_media_service import (
+    DIRECT_MEDIA_EXTENSIONS,
+    container_from_content_type,
+    get_url_extension,
+)
+
+logger = logging.getLogger(__name__)
+
+# Meta properties that carry a media URL
+VIDEO_URL_PROPERTIES = [
+    'og:video:secure_url',
+    'og:video:url',
+    'og:video',
+    'twitter:player:stream',
+]
+
+OEMBED_TYPES = ('application/json+oembed', 'text/json+oembed')
+
+ISO_DURATION = re.compile(
+    r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$'
+)
+
+
+def parse_iso_duration(value: Any) -> int:
+    """Convert an ISO 8601 duration (PT1M30S) or plain seconds to seconds"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return 0
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    match = ISO_DURATION.match(value.upper())
+    if not match:
+        return 0
+    days, hours, minutes, seconds = match.groups()
+    return int(
+        int(days or 0) * 86400
+        + int(hours or 0) * 3600
+        + int(minutes or 0) * 60
+        + float(seconds or 0)
+    )
+
+
+def media_ext(url: str, mime: Optional[str] = None) -> Optional[str]:
+    """Container for a candidate URL, None when it is a player page rather than media"""
+    if mime:
+        container = container_from_content_type(mime)
+        if container:
+            return container
+        if mime.lower().startswith('text/html'):
+            return None
+    return DIRECT_MEDIA_EXTENSIONS.get(get_url_extension(url))
+
+
+def find_video_objects(data: Any) -> List[Dict[str, Any]]:
+    """Collect VideoObject nodes from parsed JSON-LD (lists, @graph, nested)"""
+    found = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            node_type = node.get('@type')
+            types = node_type if isinstance(node_type, list) else [node_type]
+            if 'VideoObject' in types:
+                found.append(node)
+            for key in ('@graph', 'video', 'mainEntity', 'subjectOf'):
+                if key in node:
+                    stack.append(node[key])
+    return found
+
+
+def first_string(value: Any) -> str:
+    """JSON-LD fields may be a string, a list or an ImageObject"""
+    if isinstance(value, list):
+        value = value[0] if value else ''
+    if isinstance(value, dict):
+        value = value.get('url') or value.get('contentUrl') or ''
+    return value if isinstance(value, str) else ''
+
+
+def build_page_metadata(discovery, base_url: str) -> Dict[str, Any]:
+    """
+    Turn a MediaDiscovery result into media candidates and card metadata
+    Returns title, thumbnail, duration, uploader, media_links and oembed_url
+    """
+    meta = discovery.meta
+
+    media_links = []
+    seen = set()
+
+    def add_link(link_url: str, source: str, mime: Optional[str] = None,
+                 width: Any = None, height: Any = None):
+        if not link_url:
+            return
+        link_url = urljoin(base_url, link_url)
+        ext = media_ext(link_url, mime)
+        if not ext or link_url in seen:
+            return
+        seen.add(link_url)
+        media_links.append({
+            'type': 'audio' if mime and mime.lower().startswith('audio/') else 'video',
+            'url': link_url,
+            'ext': ext,
+            'width': int(width) if str(width or '').isdigit() else 0,
+            'height': int(height) if str(height or '').isdigit() else 0,
+            'source': source,
+        })
+
+    # OpenGraph and Twitter player stream
+    for prop in VIDEO_URL_PROPERTIES:
+        if prop.startswith('twitter:'):
+            add_link(meta.get(prop), 'twitter_player', meta.get('twitter:player:stream:content_type'))
+        else:
+            add_link(meta.get(prop), 'opengraph', meta.get('og:video:type'),
+                     meta.get('og:video:width'), meta.get('og:video:height'))
+
+    # JSON-LD VideoObject
+    video_object = {}
+    for block in discovery.ld_json:
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for node in find_video_objects(data):
+            video_object = video_object or node
+            add_link(first_string(node.get('contentUrl')), 'json_ld', node.get('encodingFormat'),
+                     node.get('width'), node.get('height'))
+
+    # oEmbed discovery
+    oembed_url = None
+    for link in discovery.links:
+        if link['type'] in OEMBED_TYPES:
+            oembed_url = urljoin(base_url, link['href'])
+            break
+
+    title = (
+        meta.get('og:title')
+        or first_string(video_object.get('name'))
+        or meta.get('twitter:title')
+        or discovery.title
+    )
+    thumbnail = (
+        meta.get('og:image')
+        or first_string(video_object.get('thumbnailUrl'))
+        or meta.get('twitter:image')
+        or ''
+    )
+    author = video_object.get('author')
+    if isinstance(author, list):
+        author = author[0] if author else ''
+    if isinstance(author, dict):
+        author = author.get('name', '')
+
+    return {
+        'title': title or 'Unknown Title',
+        'thumbnail': urljoin(base_url, thumbnail) if thumbnail else '',
+        'duration': parse_iso_duration(
+            meta.get('video:duration') or meta.get('og:video:duration') or video_object.get('duration')
+        ),
+        'uploader': author if isinstance(author, str) else '',
+        'media_links': media_links,
+        'oembed_url': oembed_url,
+    }
+
+
+async def extract_page_metadata(url: str) -> Dict[str, Any]:
+    """
+    Lightweight extraction tier, one streamed page fetch and at most one oEmbed call
+    Never starts a browser
+    """
+    try:
+        logger.info(f"Attempting metadata extraction for: {url}")
+
+        session = get_http_client()
+        timeout = get_request_timeout(15)
+
+        page = await fetch_and_discover(session, url, stop_at_head=True, timeout=timeout)
+        result = build_page_metadata(page['discovery'], page['url'])
+        if not result['media_links']:
+            raise ValueError("No media links in page metadata")
+
+        # oEmbed fills in card fields the page did not expose
+        if result['oembed_url'] and not (result['thumbnail'] and result['uploader']):
+            try:
+                async with session.get(result['oembed_url'], timeout=timeout) as response:
+                    oembed = await response.json(content_type=None)
+                if result['title'] == 'Unknown Title':
+                    result['title'] = oembed.get('title') or result['title']
+                result['thumbnail'] = result['thumbnail'] or oembed.get('thumbnail_url', '')
+                result['uploader'] = result['uploader'] or oembed.get('author_name', '')
+            except Exception as e:
+                logger.warning(f"oEmbed lookup failed: {str(e)}")
+
+        result['platform'] = 'Page Metadata'
+        logger.info(f"Metadata tier found {len(result['media_links'])} media links")
+        return result
+
+    except Exception as e:
+        logger.error(f"Metadata extraction failed: {str(e)}")
+        raise ValueError(f"Metadata extraction failed: {str(e)}")
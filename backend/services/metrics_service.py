@@ -0,0 +1,175 @@
+"""
+Metrics service
+Prometheus histograms and counters for endpoints and waterfall levels, plus
+gauges for pools, queues and caches that are read only when /metrics is scraped
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Any, Callable, Iterable, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+from services.tracing_service import span
+
+logger = logging.getLogger(__name__)
+
+registry = CollectorRegistry(auto_describe=True)
+
+# Extractions range from a cache hit (ms) to a browser fallback (a minute)
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by endpoint',
+    ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS, registry=registry,
+)
+level_duration = Histogram(
+    'extraction_level_duration_seconds', 'Time spent in each waterfall level',
+    ['level', 'outcome'], buckets=LATENCY_BUCKETS, registry=registry,
+)
+level_failures = Counter(
+    'extraction_level_failures_total', 'Waterfall level failures by reason',
+    ['level', 'reason'], registry=registry,
+)
+extractions = Counter(
+    'extractions_total', 'Extraction results by platform, method and outcome',
+    ['platform', 'method', 'outcome'], registry=registry,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def is_metrics_enabled() -> bool:
+    return os.environ.get('METRICS_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def failure_reason(error: BaseException) -> str:
+    """Small fixed set of reasons so label cardinality stays bounded"""
+    message = str(error).lower()
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or 'timed out' in message or 'timeout' in message:
+        return 'timeout'
+    if '429' in message or 'too many requests' in message or 'budget exhausted' in message or 'rate limit' in message:
+        return 'throttled'
+    if '403' in message or 'forbidden' in message or 'sign in' in message or 'not a bot' in message:
+        return 'blocked'
+    if 'unsupported url' in message or 'no video' in message or 'not found' in message or '404' in message:
+        return 'not_found'
+    return 'error'
+
+
+class LevelTimer:
+    """
+    Times one waterfall level and traces it as a level.<name> span
+    Outcome is 'success' when marked, 'error' when the block raised, 'empty' otherwise
+    """
+
+    __slots__ = ('level', 'outcome', 'started', 'span')
+
+    def __init__(self, level: str):
+        self.level = level
+        self.outcome = 'empty'
+        self.started = 0.0
+        self.span = span(f"level.{level}")
+
+    def success(self) -> None:
+        self.outcome = 'success'
+
+    def __enter__(self) -> 'LevelTimer':
+        self.started = time.perf_counter()
+        self.span.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None:
+            self.outcome = 'error'
+            level_failures.labels(self.level, failure_reason(exc)).inc()
+        level_duration.labels(self.level, self.outcome).observe(time.perf_counter() - self.started)
+        self.span.set('outcome', self.outcome)
+        self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def level_timer(level: str) -> LevelTimer:
+    return LevelTimer(level)
+
+
+def record_extraction_outcome(result: Optional[Dict[str, Any]], outcome: str) -> None:
+    """Count one extraction; only yt-dlp extractor keys are used as platform labels"""
+    method = result.get('method', 'none') if result else 'none'
+    platform = result.get('data', {}).get('platform', 'Unknown') if method == 'yt-dlp' else method
+    extractions.labels(platform, method, outcome).inc()
+
+
+class StatsCollector:
+    """
+    Turns the services' stats() dictionaries into gauges at scrape time,
+    so pools, queues and caches cost nothing on the request path
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Iterable]] = {}
+
+    def register(self, name: str, source: Callable[[], Iterable]) -> None:
+        """source() yields (metric_name, help, labels dict, value, kind) tuples"""
+        self._sources[name] = source
+
+    def collect(self):
+        families: Dict[str, Any] = {}
+        for name, source in self._sources.items():
+            try:
+                samples = list(source())
+            except Exception as e:
+                logger.debug(f"Metrics source {name} failed: {str(e)}")
+                continue
+            for metric, help_text, labels, value, kind in samples:
+                family = families.get(metric)
+                if family is None:
+                    family_class = CounterMetricFamily if kind == 'counter' else GaugeMetricFamily
+                    family = families[metric] = family_class(metric, help_text, labels=list(labels))
+                family.add_metric(list(labels.values()), value)
+        return list(families.values())
+
+    def describe(self):
+        return []
+
+
+stats_collector = StatsCollector()
+registry.register(stats_collector)
+
+
+def render_metrics() -> bytes:
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request
+    Labelled by endpoint function name (bounded), never by raw path
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status_holder[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = scope.get('endpoint')
+            name = getattr(endpoint, '__name__', 'unmatched')
+            http_request_duration.labels(name, scope['method'], f"{status_holder[0] // 100}xx").observe(
+                time.perf_counter() - started
+            )
@@ -5,10 +5,13 @@ Used as fallback when yt-dlp fails
 import asyncio
 import logging
 from typing import Dict, List, Any, Optional
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
-from bs4 import BeautifulSoup
 import os
 
+from services.media_discovery import discover_media, fetch_and_discover
+from services.http_client import get_http_client, get_request_timeout
+from services.tracing_service import span
+from services.upstream_limiter import upstream_limiter
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,41 +20,55 @@ async def extract_with_playwright(url: str, proxy_api_key: Optional[str] = None)
     Extract media links using Playwright browser automation
     """
     try:
+        from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
         logger.info(f"Attempting Playwright extraction for: {url}")
         
         async with async_playwright() as p:
             # Launch browser with appropriate options
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
+            with span('browser.launch'):
+                browser = await p.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-setuid-sandbox']
+                )
             
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            
-            page = await context.new_page()
+            with span('browser.new_page'):
+                context = await browser.new_context(
+                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                )
+                
+                page = await context.new_page()
             
-            # Navigate to the URL
-            try:
-                await page.goto(url, timeout=30000, wait_until='networkidle')
-            except PlaywrightTimeout:
-                # Try with domcontentloaded if networkidle times out
-                await page.goto(url, timeout=30000, wait_until='domcontentloaded')
+            # Navigate to the URL, paced per platform
+            async with upstream_limiter.limit_async(url) as reservation:
+                try:
+                    with span('page.goto', wait_until='networkidle') as goto_span:
+                        response = await page.goto(url, timeout=30000, wait_until='networkidle')
+                except PlaywrightTimeout:
+                    # Try with domcontentloaded if networkidle times out
+                    with span('page.goto', wait_until='domcontentloaded') as goto_span:
+                        response = await page.goto(url, timeout=30000, wait_until='domcontentloaded')
+                if response is not None:
+                    goto_span.set('http.status_code', response.status)
+                    reservation.report_status(response.status, response.headers.get('retry-after'))
             
             # Wait for potential video elements to load
-            await asyncio.sleep(2)
+            with span('page.settle', seconds=2):
+                await asyncio.sleep(2)
             
             # Get page content
-            content = await page.content()
-            soup = BeautifulSoup(content, 'html.parser')
+            with span('page.content') as content_span:
+                content = await page.content()
+                content_span.set('bytes', len(content))
+            with span('discover_media'):
+                discovery = discover_media(content)
             
             # Extract media links
             media_links = []
             
             # Look for video elements
-            for video in soup.find_all('video'):
-                src = video.get('src')
+            for video in discovery.videos:
+                src = video['src']
                 if src:
                     media_links.append({
                         'type': 'video',
@@ -60,38 +77,29 @@ async def extract_with_playwright(url: str, proxy_api_key: Optional[str] = None)
                     })
                 
                 # Check source tags
-                for source in video.find_all('source'):
-                    src = source.get('src')
-                    if src:
-                        media_links.append({
-                            'type': 'video',
-                            'url': src,
-                            'source': 'source_tag'
-                        })
+                for source in video['sources']:
+                    media_links.append({
+                        'type': 'video',
+                        'url': source['src'],
+                        'source': 'source_tag'
+                    })
             
             # Look for meta tags with video info
-            for meta in soup.find_all('meta'):
-                property_val = meta.get('property', '')
-                if 'video' in property_val.lower():
-                    content_val = meta.get('content')
-                    if content_val:
-                        media_links.append({
-                            'type': 'video',
-                            'url': content_val,
-                            'source': 'meta_tag'
-                        })
+            for property_val, content_val in discovery.meta.items():
+                if 'video' in property_val:
+                    media_links.append({
+                        'type': 'video',
+                        'url': content_val,
+                        'source': 'meta_tag'
+                    })
             
             await browser.close()
             
             if not media_links:
                 raise ValueError("No media links found")
             
-            # Get page title
-            title = soup.find('title')
-            title_text = title.get_text() if title else 'Unknown Title'
-            
             result = {
-                'title': title_text,
+                'title': discovery.title or 'Unknown Title',
                 'media_links': media_links,
                 'platform': 'Browser Extraction',
             }
@@ -106,45 +114,37 @@ async def extract_with_playwright(url: str, proxy_api_key: Optional[str] = None)
 
 async def scrape_with_beautifulsoup(url: str) -> Dict[str, Any]:
     """
-    Basic HTML scraping with BeautifulSoup
-    Last fallback method
+    Basic HTML scraping of <video> and misnamed <img> tags
+    Last fallback method, streams the page through the shared media discovery parser
     """
     try:
-        import aiohttp
+        logger.info(f"Attempting HTML scraping for: {url}")
         
-        logger.info(f"Attempting BeautifulSoup extraction for: {url}")
+        page = await fetch_and_discover(get_http_client(), url, timeout=get_request_timeout(30))
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=30) as response:
-                html = await response.text()
-                
-        soup = BeautifulSoup(html, 'html.parser')
+        discovery = page['discovery']
         
         # Look for video and image links
         media_links = []
         
-        for video in soup.find_all('video'):
-            src = video.get('src')
-            if src:
-                media_links.append({'type': 'video', 'url': src})
+        for video in discovery.videos:
+            if video['src']:
+                media_links.append({'type': 'video', 'url': video['src']})
+            for source in video['sources']:
+                media_links.append({'type': 'video', 'url': source['src']})
         
-        for img in soup.find_all('img'):
-            src = img.get('src')
-            if src and any(ext in src for ext in ['.mp4', '.webm', '.mov']):
-                media_links.append({'type': 'video', 'url': src})
+        for src in discovery.img_sources:
+            media_links.append({'type': 'video', 'url': src})
         
         if not media_links:
             raise ValueError("No media found in HTML")
         
-        title = soup.find('title')
-        title_text = title.get_text() if title else 'Unknown Title'
-        
         return {
-            'title': title_text,
+            'title': discovery.title or 'Unknown Title',
             'media_links': media_links,
             'platform': 'HTML Scraping',
         }
         
     except Exception as e:
-        logger.error(f"BeautifulSoup extraction failed: {str(e)}")
+        logger.error(f"HTML scraping failed: {str(e)}")
         raise ValueError(f"HTML scraping failed: {str(e)}")
@@ -0,0 +1,271 @@
+"""
+Profiler service
+Low-overhead stack sampling for individual requests: an admin can profile one
+request on demand, and requests slower than PROFILE_SLOW_MS are captured
+automatically into a ring buffer of collapsed-stack (flamegraph) profiles
+"""
+import hmac
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Any, Optional
+from urllib.parse import parse_qs
+
+from services.tracing_service import current_span
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '10'))
+PROFILE_HISTORY_SECONDS = float(os.environ.get('PROFILE_HISTORY_SECONDS', '120'))
+PROFILE_RING_SIZE = int(os.environ.get('PROFILE_RING_SIZE', '20'))
+PROFILE_MAX_DEPTH = 128
+
+# Leaf frames of threads parked waiting for work; they only add noise
+IDLE_LEAVES = {
+    ('thread.py', '_worker'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+}
+
+
+def is_admin_enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def is_auto_profiling_enabled() -> bool:
+    return PROFILE_SLOW_MS > 0
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """Constant-time comparison against ADMIN_TOKEN, always False when unset"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+class StackSampler:
+    """
+    Samples every thread's stack on a background thread while anyone needs it
+    Samples go to one shared timeline, so a profile is simply the samples taken
+    between a request's start and end (including concurrent requests' work,
+    which is exactly what shows up when the event loop is blocked)
+    """
+
+    def __init__(self, interval: float, history_seconds: float):
+        self.interval = interval
+        self._timeline: deque = deque(maxlen=max(1000, int(history_seconds / interval) * 4))
+        self._users = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[Any, str] = {}
+        self._stacks: Dict[tuple, Optional[str]] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._names_refreshed = 0.0
+        self.samples = 0
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._users += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _collapse(self, frame, thread_name: str) -> Optional[str]:
+        codes = []
+        while frame is not None and len(codes) < PROFILE_MAX_DEPTH:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        key = (thread_name, *codes)
+        if key in self._stacks:
+            return self._stacks[key]
+        leaf = codes[0] if codes else None
+        if leaf is None or (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+            stack = None
+        else:
+            stack = ';'.join([thread_name] + [self._label(code) for code in reversed(codes)])
+        if len(self._stacks) > 20000:
+            self._stacks.clear()
+        self._stacks[key] = stack
+        return stack
+
+    def _sample(self, own_ident: int) -> None:
+        now = time.monotonic()
+        if now - self._names_refreshed > 1.0:
+            self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self._names_refreshed = now
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = self._collapse(frame, self._thread_names.get(ident, f"thread-{ident}"))
+            if stack is not None:
+                self._timeline.append((now, stack))
+        self.samples += 1
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                if self._users <= 0:
+                    self._thread = None
+                    return
+            try:
+                self._sample(own_ident)
+            except Exception as e:
+                logger.debug(f"Stack sample failed: {str(e)}")
+            time.sleep(self.interval)
+
+    def collect(self, started: float, ended: float) -> Counter:
+        """Collapsed stacks sampled between two time.monotonic() readings"""
+        stacks: Counter = Counter()
+        for timestamp, stack in reversed(list(self._timeline)):
+            if timestamp < started:
+                break
+            if timestamp <= ended:
+                stacks[stack] += 1
+        return stacks
+
+
+class ProfileStore:
+    """Ring buffer of the most recent captured profiles"""
+
+    def __init__(self, size: int):
+        self._profiles: deque = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self.captured = 0
+
+    def next_id(self) -> str:
+        return f"{int(time.time())}-{next(self._ids)}"
+
+    def add(self, profile: Dict[str, Any]) -> None:
+        self._profiles.append(profile)
+        self.captured += 1
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        for profile in self._profiles:
+            if profile['id'] == profile_id:
+                return profile
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [summarize_profile(profile) for profile in reversed(self._profiles)]
+
+
+def summarize_profile(profile: Dict[str, Any], top: int = 5) -> Dict[str, Any]:
+    """Profile metadata plus the functions most often on top of the stack"""
+    leaves: Counter = Counter()
+    for stack, count in profile['stacks'].items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    summary = {key: value for key, value in profile.items() if key != 'stacks'}
+    summary['top'] = [{'frame': frame, 'samples': count} for frame, count in leaves.most_common(top)]
+    return summary
+
+
+def render_collapsed(profile: Dict[str, Any]) -> str:
+    """Brendan Gregg's collapsed format, readable by flamegraph.pl, speedscope and inferno"""
+    return ''.join(f"{stack} {count}\n" for stack, count in profile['stacks'].most_common())
+
+
+sampler = StackSampler(PROFILE_INTERVAL_MS / 1000, PROFILE_HISTORY_SECONDS)
+profile_store = ProfileStore(PROFILE_RING_SIZE)
+
+
+def get_profiler_stats() -> Dict[str, Any]:
+    return {
+        'admin_enabled': is_admin_enabled(),
+        'auto_threshold_ms': PROFILE_SLOW_MS,
+        'interval_ms': PROFILE_INTERVAL_MS,
+        'sampling': sampler.is_running(),
+        'samples': sampler.samples,
+        'captured': profile_store.captured,
+    }
+
+
+def _wants_profile(scope) -> bool:
+    """X-Profile header or ?profile=1, honoured only with a valid X-Admin-Token"""
+    headers = dict(scope.get('headers') or [])
+    flag = headers.get(b'x-profile', b'').decode('latin-1')
+    if not flag:
+        flag = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('profile', [''])[0]
+    if flag.strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return False
+    return check_admin_token(headers.get(b'x-admin-token', b'').decode('latin-1'))
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware holding the sampler for profiled /api requests
+    On-demand profiles are always stored and their id returned as X-Profile-Id;
+    with PROFILE_SLOW_MS set every request is sampled and slow ones are kept
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path', '')
+        if scope['type'] != 'http' or not path.startswith('/api') or path.startswith('/api/admin'):
+            await self.app(scope, receive, send)
+            return
+
+        requested = _wants_profile(scope)
+        if not requested and not is_auto_profiling_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = profile_store.next_id() if requested else None
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status_holder[0] = message['status']
+                if profile_id:
+                    message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', profile_id.encode())]
+            await send(message)
+
+        request_span = current_span()
+        sampler.acquire()
+        started = time.monotonic()
+        wall_started = time.time()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            ended = time.monotonic()
+            sampler.release()
+            duration_ms = (ended - started) * 1000
+            if requested or duration_ms >= PROFILE_SLOW_MS:
+                stacks = sampler.collect(started, ended)
+                endpoint = scope.get('endpoint')
+                profile_store.add({
+                    'id': profile_id or profile_store.next_id(),
+                    'trigger': 'requested' if requested else 'slow',
+                    'method': scope['method'],
+                    'path': path,
+                    'endpoint': getattr(endpoint, '__name__', None),
+                    'status': status_holder[0],
+                    'trace_id': request_span.trace.trace_id if request_span is not None else None,
+                    'started_at': wall_started,
+                    'duration_ms': round(duration_ms, 1),
+                    'samples': sum(stacks.values()),
+                    'stacks': stacks,
+                })
+                if not requested:
+                    logger.warning(f"🐢 Slow request profiled: {scope['method']} {path} took {duration_ms:.0f}ms")
@@ -0,0 +1,237 @@
+"""
+Response service
+Brotli/gzip compression of large API bodies, the ETag helpers behind
+conditional (304 Not Modified) responses and server-sent event framing
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import secrets
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+# Quality 4 compresses about as well as gzip -6 at a fraction of brotli's default (11) cost
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+# Bodies above this are compressed in a worker thread instead of on the event loop
+COMPRESSION_THREAD_BYTES = int(os.environ.get('COMPRESSION_THREAD_BYTES', '262144'))
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/vnd.apple.mpegurl',
+    'application/x-subrip',
+    'image/svg+xml',
+    'text/',
+)
+
+# Cache versions restart at 1 in every process, so tags carry a per-process prefix
+ETAG_EPOCH = secrets.token_hex(4)
+
+# Suffixes added to strong ETags of compressed bodies, see strip_encoding_suffix
+ENCODING_SUFFIXES = {'br': '-br', 'gzip': '-gzip'}
+
+_brotli = None
+_brotli_checked = False
+
+_stats = {'compressed': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+
+def is_compression_enabled() -> bool:
+    return os.environ.get('COMPRESSION_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_brotli():
+    """The brotli module when installed, otherwise None (gzip only)"""
+    global _brotli, _brotli_checked
+    if not _brotli_checked:
+        _brotli_checked = True
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            logger.info("brotli is not installed, responses are compressed with gzip only")
+    return _brotli
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """One server-sent event with a JSON payload"""
+    return b'event: ' + event.encode() + b'\ndata: ' + orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS) + b'\n\n'
+
+
+def version_etag(version: int) -> str:
+    """Strong ETag for one version of a cached extraction"""
+    return f'"x{ETAG_EPOCH}-{version}"'
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag from the serialized body, for responses without a cache version"""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def strip_encoding_suffix(etag: str) -> str:
+    for suffix in ENCODING_SUFFIXES.values():
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, as RFC 9110 asks for)
+    Tags handed out for compressed bodies match their uncompressed tag
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if strip_encoding_suffix(candidate) == etag:
+            return True
+    return False
+
+
+def parse_accept_encoding(header: str) -> List[Tuple[str, float]]:
+    codings = []
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            codings.append((name.strip().lower(), quality))
+    return codings
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br when the client takes it and brotli is installed, else gzip, else None"""
+    accepted = {name: quality for name, quality in parse_accept_encoding(accept_encoding)}
+    wildcard = accepted.get('*', 0.0)
+    for coding in ('br', 'gzip'):
+        if coding == 'br' and get_brotli() is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return get_brotli().compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.split(';', 1)[0].strip().lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing complete text/JSON bodies with br or gzip
+    Bodies under COMPRESSION_MIN_BYTES, already encoded bodies and streamed
+    responses (downloads, archives) are passed through unchanged
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not is_compression_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ''
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+        encoding = choose_encoding(accept_encoding)
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                headers = {name.lower(): value for name, value in message.get('headers', [])}
+                if not is_compressible(headers.get(b'content-type', b'').decode('latin-1')):
+                    await send(message)
+                    return
+                add_vary(message)
+                if encoding is None or b'content-encoding' in headers:
+                    await send(message)
+                    return
+                # Held back until the body shows whether it is worth compressing
+                start_message = message
+                return
+
+            if message['type'] != 'http.response.body' or start_message is None:
+                await send(message)
+                return
+
+            pending, start_message = start_message, None
+            body = message.get('body', b'')
+            if message.get('more_body', False) or len(body) < COMPRESSION_MIN_BYTES:
+                await send(pending)
+                await send(message)
+                return
+
+            if len(body) > COMPRESSION_THREAD_BYTES:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            _stats['compressed'] += 1
+            _stats['bytes_in'] += len(body)
+            _stats['bytes_out'] += len(compressed)
+
+            headers = []
+            for name, value in pending.get('headers', []):
+                lowered = name.lower()
+                if lowered == b'content-length':
+                    continue
+                if lowered == b'etag' and not value.startswith(b'W/'):
+                    # A strong tag names exact bytes, so the compressed body gets its own
+                    value = value[:-1] + ENCODING_SUFFIXES[encoding].encode() + b'"'
+                headers.append((name, value))
+            headers.append((b'content-encoding', encoding.encode()))
+            headers.append((b'content-length', str(len(compressed)).encode()))
+            await send({**pending, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def add_vary(message) -> None:
+    headers = list(message.get('headers', []))
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b'vary':
+            if b'accept-encoding' not in value.lower():
+                headers[index] = (name, value + b', Accept-Encoding')
+            break
+    else:
+        headers.append((b'vary', b'Accept-Encoding'))
+    message['headers'] = headers
+
+
+def get_compression_stats() -> dict:
+    return {
+        'enabled': is_compression_enabled(),
+        'brotli': get_brotli() is not None,
+        'compressed_responses': _stats['compressed'],
+        'bytes_in': _stats['bytes_in'],
+        'bytes_out': _stats['bytes_out'],
+        'ratio': round(_stats['bytes_out'] / _stats['bytes_in'], 3) if _stats['bytes_in'] else None,
+    }
@@ -0,0 +1,263 @@
+"""
+Subtitle converter
+Incremental parsers for WebVTT/SRT, YouTube srv1-3 (XML) and json3 tracks that
+turn each chunk of a download into SRT or WebVTT text as soon as its cues are
+complete, so a track never has to be held whole before conversion starts
+"""
+import codecs
+import html
+import json
+import re
+import xml.etree.ElementTree as ET
+from typing import List, NamedTuple, Optional
+
+SOURCE_FORMATS = ('vtt', 'srt', 'srv1', 'srv2', 'srv3', 'json3')
+TARGET_FORMATS = {
+    'srt': 'application/x-subrip',
+    'vtt': 'text/vtt',
+}
+
+TIMING_RE = re.compile(
+    r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})'
+)
+# Karaoke timestamps and class/voice spans of auto captions; SRT keeps only i/b/u
+TAG_RE = re.compile(r'<(?!/?[ibu]>)[^>]*>')
+STYLE_TAG_RE = re.compile(r'(</?[ibu]>)')
+EVENTS_RE = re.compile(r'"events"\s*:\s*\[')
+
+
+class Cue(NamedTuple):
+    """text is WebVTT cue markup: &, < and > escaped, i/b/u tags kept"""
+    start_ms: int
+    end_ms: int
+    text: str
+
+
+def clean_lines(text: str) -> str:
+    lines = [line.strip() for line in text.replace('\r', '').split('\n')]
+    return '\n'.join(line for line in lines if line)
+
+
+def clean_text(text: str) -> str:
+    """Cue text of a markup source (WebVTT, SRT) without tags other than i/b/u"""
+    return clean_lines(TAG_RE.sub('', text))
+
+
+def escape_text(text: str) -> str:
+    """Plain text as cue markup"""
+    return html.escape(clean_lines(text), quote=False)
+
+
+def escape_markup(text: str) -> str:
+    """SRT text as cue markup: everything but its i/b/u tags is literal"""
+    return ''.join(part if index % 2 else html.escape(part, quote=False)
+                   for index, part in enumerate(STYLE_TAG_RE.split(text)))
+
+
+def _timing_ms(hours: Optional[str], minutes: str, seconds: str, millis: str) -> int:
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis.ljust(3, '0'))
+
+
+class BlockParser:
+    """WebVTT and SRT: blank-line separated blocks with a timing line"""
+
+    def __init__(self, escaped: bool):
+        # WebVTT text is markup already, SRT text is literal apart from its tags
+        self._escaped = escaped
+        self._buffer = ''
+        self._carry = ''
+
+    def feed(self, text: str) -> List[Cue]:
+        # A chunk ending in "\r" may be half of a CRLF, so it waits for the next one
+        text = self._carry + text
+        self._carry = '\r' if text.endswith('\r') else ''
+        if self._carry:
+            text = text[:-1]
+        self._buffer += text.replace('\r\n', '\n').replace('\r', '\n')
+        blocks = self._buffer.split('\n\n')
+        self._buffer = blocks.pop()
+        return self._parse(blocks)
+
+    def close(self) -> List[Cue]:
+        blocks, self._buffer, self._carry = [self._buffer + ('\n' if self._carry else '')], '', ''
+        return self._parse(blocks)
+
+    def _parse(self, blocks: List[str]) -> List[Cue]:
+        cues = []
+        for block in blocks:
+            lines = block.strip('\n').split('\n')
+            # Header, NOTE, STYLE and REGION blocks have no timing line
+            for index, line in enumerate(lines[:2]):
+                match = TIMING_RE.search(line)
+                if match:
+                    text = clean_text('\n'.join(lines[index + 1:]))
+                    if not self._escaped:
+                        text = escape_markup(text)
+                    if text:
+                        groups = match.groups()
+                        cues.append(Cue(_timing_ms(*groups[:4]), _timing_ms(*groups[4:]), text))
+                    break
+        return cues
+
+
+class TimedTextParser:
+    """
+    YouTube timedtext XML
+    srv3 and srv2 use <p>/<text> with t and d in milliseconds, srv1 uses <text>
+    with start and dur in seconds
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('end',))
+
+    def feed(self, text: str) -> List[Cue]:
+        self._parser.feed(text)
+        return self._read()
+
+    def close(self) -> List[Cue]:
+        self._parser.close()
+        return self._read()
+
+    def _read(self) -> List[Cue]:
+        cues = []
+        for _, element in self._parser.read_events():
+            if element.tag not in ('p', 'text'):
+                continue
+            if 't' in element.attrib:
+                start = int(float(element.get('t', 0)))
+                duration = int(float(element.get('d', 0)))
+                text = ''.join(element.itertext())
+            else:
+                start = int(float(element.get('start', 0)) * 1000)
+                duration = int(float(element.get('dur', 0)) * 1000)
+                # srv1 escapes the text a second time
+                text = html.unescape(''.join(element.itertext()))
+            # Plain text, so a literal "<...>" is kept instead of read as a tag
+            text = escape_text(text)
+            element.clear()
+            if text:
+                cues.append(Cue(start, start + duration, text))
+        return cues
+
+
+class Json3Parser:
+    """
+    YouTube json3: decodes the "events" array one event at a time as the
+    download arrives instead of loading the whole document
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._in_events = False
+        self._done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> List[Cue]:
+        self._buffer += text
+        return self._read(final=False)
+
+    def close(self) -> List[Cue]:
+        cues = self._read(final=True)
+        if not self._done and self._buffer.strip():
+            raise ValueError("Malformed json3 subtitles")
+        return cues
+
+    def _read(self, final: bool) -> List[Cue]:
+        cues = []
+        if not self._in_events:
+            match = EVENTS_RE.search(self._buffer)
+            if match is None:
+                # Keep enough of the tail for a split '"events": ['
+                self._buffer = self._buffer[-32:]
+                if final:
+                    self._done = True
+                return cues
+            self._buffer = self._buffer[match.end():]
+            self._in_events = True
+
+        position = 0
+        length = len(self._buffer)
+        while not self._done:
+            while position < length and self._buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= length:
+                break
+            if self._buffer[position] == ']':
+                self._done = True
+                break
+            try:
+                event, position = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                # Most likely an event cut off at the chunk boundary
+                if final:
+                    raise ValueError("Malformed json3 subtitles")
+                break
+            cue = self._event_cue(event)
+            if cue:
+                cues.append(cue)
+        self._buffer = '' if self._done else self._buffer[position:]
+        return cues
+
+    @staticmethod
+    def _event_cue(event) -> Optional[Cue]:
+        if not isinstance(event, dict) or not event.get('segs'):
+            return None
+        text = escape_text(''.join(seg.get('utf8', '') for seg in event['segs'] if isinstance(seg, dict)))
+        if not text:
+            return None
+        start = int(event.get('tStartMs', 0))
+        return Cue(start, start + int(event.get('dDurationMs', 0)), text)
+
+
+def format_timestamp(millis: int, separator: str) -> str:
+    hours, millis = divmod(max(0, millis), 3600000)
+    minutes, millis = divmod(millis, 60000)
+    seconds, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{millis:03d}"
+
+
+class SubtitleConverter:
+    """
+    Converts a subtitle download chunk by chunk
+    feed() takes raw bytes and returns the output text for the cues completed
+    so far, close() returns the rest
+    """
+
+    def __init__(self, source_format: str, target_format: str):
+        if source_format not in SOURCE_FORMATS:
+            raise ValueError(f"Unsupported subtitle format: {source_format}")
+        if target_format not in TARGET_FORMATS:
+            raise ValueError(f"Unsupported output format: {target_format}")
+        if source_format in ('vtt', 'srt'):
+            self._parser = BlockParser(escaped=source_format == 'vtt')
+        elif source_format == 'json3':
+            self._parser = Json3Parser()
+        else:
+            self._parser = TimedTextParser()
+        self.target_format = target_format
+        self.cues = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self._started = False
+
+    def feed(self, chunk: bytes) -> str:
+        return self._render(self._parser.feed(self._decoder.decode(chunk)))
+
+    def close(self) -> str:
+        cues = self._parser.feed(self._decoder.decode(b'', final=True)) + self._parser.close()
+        return self._render(cues)
+
+    def _render(self, cues: List[Cue]) -> str:
+        parts = []
+        if not self._started and self.target_format == 'vtt':
+            parts.append('WEBVTT\n\n')
+        self._started = True
+        for cue in cues:
+            self.cues += 1
+            if self.target_format == 'srt':
+                # SRT has no character references, only the i/b/u tags stay markup
+                parts.append(f"{self.cues}\n{format_timestamp(cue.start_ms, ',')} --> "
+                             f"{format_timestamp(cue.end_ms, ',')}\n{html.unescape(cue.text)}\n\n")
+            else:
+                parts.append(f"{format_timestamp(cue.start_ms, '.')} --> "
+                             f"{format_timestamp(cue.end_ms, '.')}\n{cue.text}\n\n")
+        return ''.join(parts)
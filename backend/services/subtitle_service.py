@@ -2,12 +2,66 @@
 Subtitle Extraction Service
 Extracts subtitles and closed captions from videos
 """
+import asyncio
+import io
 import logging
-import yt_dlp
-from typing import Dict, List, Any, Optional
+import os
+import time
+import zipfile
+from typing import Dict, List, Any, Optional, Iterator
+
+from services.cache_service import ExtractionCache, SingleFlight, canonicalize_url, signed_url_expiry
+from services.http_client import get_http_client, get_request_timeout
+from services.subtitle_converter import SubtitleConverter, SOURCE_FORMATS, TARGET_FORMATS
+from services.tracing_service import span
+from services.upstream_limiter import upstream_limiter
+from services.ytdlp_service import trace_requests
 
 logger = logging.getLogger(__name__)
 
+SUBTITLE_FETCH_TIMEOUT = float(os.environ.get('SUBTITLE_FETCH_TIMEOUT', '15'))
+SUBTITLE_MAX_BYTES = int(os.environ.get('SUBTITLE_MAX_BYTES', str(16 * 1024 * 1024)))
+SUBTITLE_MAX_LANGUAGES = int(os.environ.get('SUBTITLE_MAX_LANGUAGES', '10'))
+
+# Upstream formats to download when a track offers several, best timing first
+SOURCE_PREFERENCE = ('json3', 'srv3', 'vtt', 'srv2', 'srv1', 'srt')
+
+# Track listings hold signed URLs and expire with them; converted text keeps longer
+subtitle_track_cache = ExtractionCache(
+    max_entries=int(os.environ.get('SUBTITLE_CACHE_MAX_ENTRIES', '500')),
+    ttl=float(os.environ.get('EXTRACTION_CACHE_TTL', '1800')),
+)
+subtitle_cache = ExtractionCache(
+    max_entries=int(os.environ.get('SUBTITLE_CACHE_MAX_ENTRIES', '500')),
+    ttl=float(os.environ.get('SUBTITLE_CACHE_TTL', '86400')),
+)
+subtitle_flight = SingleFlight()
+
+
+class SubtitleNotFound(ValueError):
+    """The video has no track for the requested language"""
+
+
+# Built once, looked up for every subtitle track
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'zh': 'Chinese',
+    'ar': 'Arabic',
+    'hi': 'Hindi',
+    'nl': 'Dutch',
+    'sv': 'Swedish',
+    'pl': 'Polish',
+    'tr': 'Turkish'
+}
+
 
 def get_subtitles(url: str) -> Dict[str, Any]:
     """
@@ -24,9 +78,13 @@ def get_subtitles(url: str) -> Dict[str, Any]:
             'skip_download': True,
         }
         
+        import yt_dlp
+
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             logger.info(f"Extracting subtitles from: {url}")
-            info = ydl.extract_info(url, download=False)
+            trace_requests(ydl)
+            with upstream_limiter.limit(url), span('ytdlp.extract_info', url=url, subtitles=True):
+                info = ydl.extract_info(url, download=False)
             
             if info is None:
                 raise ValueError("Could not extract video information")
@@ -87,22 +145,142 @@ def get_subtitles(url: str) -> Dict[str, Any]:
 
 def get_language_name(lang_code: str) -> str:
     """Convert language code to readable name"""
-    language_names = {
-        'en': 'English',
-        'es': 'Spanish',
-        'fr': 'French',
-        'de': 'German',
-        'it': 'Italian',
-        'pt': 'Portuguese',
-        'ru': 'Russian',
-        'ja': 'Japanese',
-        'ko': 'Korean',
-        'zh': 'Chinese',
-        'ar': 'Arabic',
-        'hi': 'Hindi',
-        'nl': 'Dutch',
-        'sv': 'Swedish',
-        'pl': 'Polish',
-        'tr': 'Turkish'
+    return LANGUAGE_NAMES.get(lang_code, lang_code.upper())
+
+
+def select_track(tracks: Dict[str, Any], language: str, kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Best downloadable track for language from a get_subtitles() result
+    Manual subtitles win over automatic captions unless kind asks for one;
+    'en' also matches regional tracks such as 'en-US'
+    """
+    candidates = [
+        entry for entry in tracks.get('subtitle_data', [])
+        if entry.get('url') and entry.get('format') in SOURCE_FORMATS
+        and (kind is None or entry.get('type') == kind)
+    ]
+    for matches in (lambda code: code == language, lambda code: code.split('-')[0] == language.split('-')[0]):
+        found = [entry for entry in candidates if matches(entry['language'])]
+        if found:
+            return min(found, key=lambda entry: (
+                entry['type'] != 'manual',
+                SOURCE_PREFERENCE.index(entry['format']) if entry['format'] in SOURCE_PREFERENCE else len(SOURCE_PREFERENCE),
+            ))
+    return None
+
+
+async def _load_tracks(url: str, cache_key: str) -> Dict[str, Any]:
+    tracks = await asyncio.to_thread(get_subtitles, url)
+    if tracks['available']:
+        ttl = subtitle_track_cache.ttl
+        expiries = [signed_url_expiry(entry['url']) for entry in tracks['subtitle_data'] if entry.get('url')]
+        expiries = [expiry for expiry in expiries if expiry]
+        if expiries:
+            ttl = min(ttl, min(expiries) - subtitle_track_cache.url_expiry_margin - time.time())
+        if ttl > 0:
+            subtitle_track_cache.set(cache_key, tracks, ttl=ttl)
+    return tracks
+
+
+async def get_subtitle_tracks(url: str) -> Dict[str, Any]:
+    """Cached get_subtitles(), one yt-dlp extraction per video while it is valid"""
+    cache_key = canonicalize_url(url)
+    cached = subtitle_track_cache.get(cache_key)
+    if cached:
+        return cached.payload
+    task = subtitle_flight.run(f"tracks|{cache_key}", lambda: _load_tracks(url, cache_key))
+    return await asyncio.shield(task)
+
+
+async def _fetch_and_convert(url: str, language: str, output_format: str, kind: Optional[str],
+                             cache_key: str) -> Dict[str, Any]:
+    tracks = await get_subtitle_tracks(url)
+    track = select_track(tracks, language, kind)
+    if track is None:
+        raise SubtitleNotFound(f"No {kind + ' ' if kind else ''}subtitles for language '{language}'")
+
+    converter = SubtitleConverter(track['format'], output_format)
+    parts = []
+    started = time.monotonic()
+    session = get_http_client()
+    with span('subtitles.fetch', language=track['language'], source=track['format']):
+        async with upstream_limiter.limit_async(track['url']) as reservation:
+            async with session.get(track['url'], timeout=get_request_timeout(SUBTITLE_FETCH_TIMEOUT)) as response:
+                reservation.report_status(response.status, response.headers.get('Retry-After'))
+                if response.status >= 400:
+                    raise ValueError(f"Subtitle download failed: HTTP {response.status}")
+                received = 0
+                # Converted as it arrives, so only the output text is held
+                async for chunk in response.content.iter_chunked(65536):
+                    received += len(chunk)
+                    if received > SUBTITLE_MAX_BYTES:
+                        raise ValueError("Subtitle track is too large")
+                    parts.append(converter.feed(chunk))
+        parts.append(converter.close())
+
+    result = {
+        'language': track['language'],
+        'language_name': track['language_name'],
+        'type': track['type'],
+        'source_format': track['format'],
+        'format': output_format,
+        'cues': converter.cues,
+        'content': ''.join(parts),
+    }
+    subtitle_cache.set(cache_key, result, compute_time=time.monotonic() - started)
+    logger.info(f"Converted {track['language']} subtitles ({track['format']} -> {output_format}, {converter.cues} cues)")
+    return result
+
+
+async def fetch_subtitle(url: str, language: str, output_format: str = 'srt',
+                         kind: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One subtitle track downloaded over the shared client and converted to
+    SRT or WebVTT, cached by video, language, type and output format
+    Raises SubtitleNotFound when the video has no such track
+    """
+    if output_format not in TARGET_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    cache_key = f"{canonicalize_url(url)}|{language}|{kind or 'any'}|{output_format}"
+    cached = subtitle_cache.get(cache_key)
+    if cached:
+        return cached.payload
+    task = subtitle_flight.run(cache_key, lambda: _fetch_and_convert(url, language, output_format, kind, cache_key))
+    return await asyncio.shield(task)
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only, unseekable sink; zipfile then streams with data descriptors"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+def stream_subtitle_archive(subtitles: List[Dict[str, Any]]) -> Iterator[bytes]:
+    """Zip of converted subtitles, yielded file by file"""
+    writer = _ChunkWriter()
+    with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for subtitle in subtitles:
+            name = f"{subtitle['language']}{'.auto' if subtitle['type'] == 'automatic' else ''}.{subtitle['format']}"
+            archive.writestr(name, subtitle['content'])
+            yield writer.drain()
+    yield writer.drain()
+
+
+def get_subtitle_stats() -> Dict[str, Any]:
+    return {
+        'tracks': subtitle_track_cache.stats(),
+        'converted': subtitle_cache.stats(),
+        'in_flight': subtitle_flight.in_flight(),
     }
-    return language_names.get(lang_code, lang_code.upper())
@@ -0,0 +1,50 @@
+"""
+Extraction telemetry service
+One small event per /api/extract call, written in batches and expired by a TTL index
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+from services.database import get_database, register_indexes, register_writer, BatchWriter
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_COLLECTION = 'extraction_events'
+TELEMETRY_TTL_SECONDS = int(os.environ.get('TELEMETRY_TTL_SECONDS', str(7 * 24 * 3600)))
+
+telemetry_writer = register_writer(BatchWriter(
+    TELEMETRY_COLLECTION,
+    batch_size=int(os.environ.get('TELEMETRY_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('TELEMETRY_FLUSH_INTERVAL', '2')),
+))
+
+register_indexes(TELEMETRY_COLLECTION, [
+    ([('created_at', 1)], {'name': 'created_at_ttl', 'expireAfterSeconds': TELEMETRY_TTL_SECONDS}),
+    ([('canonical_url', 1), ('created_at', -1)], {'name': 'canonical_url_created_at'}),
+])
+
+
+def is_telemetry_enabled() -> bool:
+    if os.environ.get('TELEMETRY_ENABLED', 'true').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return False
+    return get_database() is not None
+
+
+def record_extraction(canonical_url: str, result: Dict[str, Any], duration_ms: float,
+                      cached: bool, success: bool = True) -> None:
+    """Queue one extraction event (never blocks the request)"""
+    if not is_telemetry_enabled():
+        return
+    data = result.get('data', {}) if result else {}
+    telemetry_writer.submit({
+        'canonical_url': canonical_url,
+        'method': result.get('method', '') if result else '',
+        'platform': data.get('platform', 'Unknown'),
+        'format_count': len(data.get('formats', [])),
+        'duration_ms': round(duration_ms, 1),
+        'cached': cached,
+        'success': success,
+        'created_at': datetime.now(timezone.utc),
+    })
@@ -0,0 +1,192 @@
+"""
+Thumbnail service
+Fetches platform thumbnails, resizes and re-encodes them to WebP/AVIF in a
+worker pool and keeps the results in a size-bounded disk cache
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from services.http_client import get_http_client, get_request_timeout
+
+logger = logging.getLogger(__name__)
+
+THUMB_CACHE_DIR = Path(os.environ.get('THUMB_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'reload-thumbs')))
+THUMB_CACHE_MAX_BYTES = int(os.environ.get('THUMB_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+THUMB_MAX_SOURCE_BYTES = int(os.environ.get('THUMB_MAX_SOURCE_BYTES', str(10 * 1024 * 1024)))
+THUMB_WORKERS = int(os.environ.get('THUMB_WORKERS', '2'))
+
+# Requested widths snap to these so the cache key space stays small
+THUMB_WIDTHS = (96, 160, 240, 320, 480, 640, 960, 1280)
+
+OUTPUT_FORMATS = {
+    'avif': {'pil': 'AVIF', 'mime': 'image/avif', 'options': {'quality': 50}},
+    'webp': {'pil': 'WEBP', 'mime': 'image/webp', 'options': {'quality': 80, 'method': 4}},
+    'jpeg': {'pil': 'JPEG', 'mime': 'image/jpeg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+# Pillow releases the GIL while decoding, resampling and encoding
+_executor = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix='thumb')
+_cache_lock = threading.Lock()
+_cache_bytes: Optional[int] = None
+_avif_supported: Optional[bool] = None
+
+
+def snap_width(width: int) -> int:
+    """Smallest allowed width that is at least the requested one"""
+    for allowed in THUMB_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return THUMB_WIDTHS[-1]
+
+
+def choose_format(accept: str) -> str:
+    """Pick the output encoding from the client's Accept header"""
+    global _avif_supported
+    accept = (accept or '').lower()
+    if 'image/avif' in accept:
+        if _avif_supported is None:
+            from PIL import features
+            _avif_supported = bool(features.check('avif'))
+        if _avif_supported:
+            return 'avif'
+    if 'image/webp' in accept or 'image/*' in accept or '*/*' in accept:
+        return 'webp'
+    return 'jpeg'
+
+
+def render_thumbnail(data: bytes, width: int, output_format: str) -> bytes:
+    """Decode, downscale and re-encode one image (runs in the worker pool)"""
+    from PIL import Image
+
+    spec = OUTPUT_FORMATS[output_format]
+    with Image.open(BytesIO(data)) as image:
+        # JPEG sources decode at a reduced scale straight away
+        image.draft('RGB', (width, width * 4))
+        image = image.convert('RGBA' if output_format != 'jpeg' and image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        buffer = BytesIO()
+        image.save(buffer, spec['pil'], **spec['options'])
+    return buffer.getvalue()
+
+
+def _cache_path(key: str, output_format: str) -> Path:
+    return THUMB_CACHE_DIR / key[:2] / f"{key}.{output_format}"
+
+
+def _scan_cache_size() -> int:
+    total = 0
+    if THUMB_CACHE_DIR.exists():
+        for path in THUMB_CACHE_DIR.rglob('*.*'):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+    return total
+
+
+def _evict_if_needed() -> None:
+    """Drop least recently used files until the cache is under 90% of its bound"""
+    global _cache_bytes
+    if _cache_bytes is None or _cache_bytes <= THUMB_CACHE_MAX_BYTES:
+        return
+
+    files = []
+    for path in THUMB_CACHE_DIR.rglob('*.*'):
+        try:
+            stat = path.stat()
+            files.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            pass
+    files.sort()
+
+    target = int(THUMB_CACHE_MAX_BYTES * 0.9)
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= target:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+    _cache_bytes = total
+    logger.info(f"Thumbnail cache evicted down to {total} bytes")
+
+
+def read_cached(key: str, output_format: str) -> Optional[bytes]:
+    path = _cache_path(key, output_format)
+    try:
+        body = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        # mtime doubles as the LRU clock
+        os.utime(path)
+    except OSError:
+        pass
+    return body
+
+
+def write_cached(key: str, output_format: str, body: bytes) -> None:
+    global _cache_bytes
+    path = _cache_path(key, output_format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.write_bytes(body)
+    os.replace(tmp_path, path)
+
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = _scan_cache_size()
+        else:
+            _cache_bytes += len(body)
+        _evict_if_needed()
+
+
+async def fetch_source(url: str) -> bytes:
+    """Download the original thumbnail, bounded by THUMB_MAX_SOURCE_BYTES"""
+    session = get_http_client()
+    async with session.get(url, timeout=get_request_timeout(10)) as response:
+        if response.status >= 400:
+            raise ValueError(f"Thumbnail fetch failed: HTTP {response.status}")
+        chunks = []
+        received = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            received += len(chunk)
+            if received > THUMB_MAX_SOURCE_BYTES:
+                raise ValueError("Thumbnail source too large")
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+async def get_thumbnail(source_url: str, width: int, accept: str = '') -> Dict[str, Any]:
+    """
+    Resized thumbnail for source_url
+    Returns {'body', 'media_type', 'etag'}
+    """
+    width = snap_width(width)
+    output_format = choose_format(accept)
+    key = hashlib.sha256(f"{source_url}|{width}".encode()).hexdigest()
+    loop = asyncio.get_running_loop()
+
+    body = await loop.run_in_executor(_executor, read_cached, key, output_format)
+    if body is None:
+        source = await fetch_source(source_url)
+        body = await loop.run_in_executor(_executor, render_thumbnail, source, width, output_format)
+        await loop.run_in_executor(_executor, write_cached, key, output_format, body)
+
+    return {
+        'body': body,
+        'media_type': OUTPUT_FORMATS[output_format]['mime'],
+        'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+    }
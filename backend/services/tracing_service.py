@@ -0,0 +1,334 @@
+"""
+Tracing service
+Per-request traces with nested spans carried in contextvars (they follow
+asyncio tasks and asyncio.to_thread workers), tail-sampled and exported to
+a JSON-lines file or an OTLP/HTTP collector from a background thread
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT', '')
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.05'))
+TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', '5000'))
+TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', '500'))
+SERVICE_NAME = 'video-downloader-api'
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+def is_tracing_enabled() -> bool:
+    return bool(TRACE_FILE or TRACE_OTLP_ENDPOINT)
+
+
+def _new_id(bytes_count: int) -> str:
+    return random.getrandbits(bytes_count * 8).to_bytes(bytes_count, 'big').hex()
+
+
+class Trace:
+    """All spans of one request, exported together once the root span ends"""
+
+    __slots__ = ('trace_id', 'spans', 'force_sample', 'closed', 'error')
+
+    def __init__(self, trace_id: Optional[str] = None, force_sample: bool = False):
+        self.trace_id = trace_id or _new_id(16)
+        self.spans: List['Span'] = []
+        self.force_sample = force_sample
+        self.closed = False
+        self.error = False
+
+
+class Span:
+    """
+    One timed operation
+    Use as a context manager to make it the parent of spans opened inside it
+    """
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes', 'status', '_token')
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = 'ok'
+        self._token = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = 'error'
+        self.attributes['error'] = f"{type(error).__name__}: {str(error)[:300]}"
+        self.trace.error = True
+
+    def finish(self) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        trace = self.trace
+        if not trace.closed and len(trace.spans) < TRACE_MAX_SPANS:
+            trace.spans.append(self)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None and exc_type is not GeneratorExit:
+            self.record_error(exc)
+        self.finish()
+        _current_span.reset(self._token)
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class NoopSpan:
+    """Returned when no trace is active, so instrumented code never branches"""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def __enter__(self) -> 'NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def span(name: str, parent: Optional[Span] = None, **attributes) -> Any:
+    """
+    Child span of parent (default: the current span)
+    Not made current until entered with `with`; a no-op without an active trace
+    """
+    parent = parent or _current_span.get()
+    if parent is None or parent is NOOP_SPAN or parent.trace.closed:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def parse_traceparent(header: Optional[str]):
+    """W3C traceparent -> (trace_id, parent_span_id, sampled), or None"""
+    if not header:
+        return None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == '01'
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Span:
+    """Root span for a request; continues the caller's trace when traceparent is sent"""
+    incoming = parse_traceparent(traceparent)
+    if incoming:
+        trace = Trace(incoming[0], force_sample=incoming[2])
+        return Span(trace, name, incoming[1], attributes)
+    return Span(Trace(), name, None, attributes)
+
+
+def finish_trace(root: Span) -> None:
+    """Close the trace and hand it to the exporter when the sampler keeps it"""
+    root.finish()
+    trace = root.trace
+    trace.closed = True
+    keep = (
+        trace.force_sample
+        or trace.error
+        or root.duration_ms >= TRACE_SLOW_MS
+        or random.random() < TRACE_SAMPLE_RATE
+    )
+    if keep:
+        _exporter.submit(root, trace)
+
+
+def trace_to_json(root: Span, trace: Trace) -> Dict[str, Any]:
+    """Compact JSON-lines record: one trace per line, span times relative to the root"""
+    return {
+        'trace_id': trace.trace_id,
+        'name': root.name,
+        'start': root.start_ns / 1e9,
+        'duration_ms': round(root.duration_ms, 2),
+        'error': trace.error,
+        'spans': [
+            {
+                'span_id': item.span_id,
+                'parent_id': item.parent_id,
+                'name': item.name,
+                'offset_ms': round((item.start_ns - root.start_ns) / 1e6, 2),
+                'duration_ms': round(item.duration_ms, 2),
+                'status': item.status,
+                'attributes': item.attributes,
+            }
+            for item in sorted(trace.spans, key=lambda item: item.start_ns)
+        ],
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def trace_to_otlp(trace: Trace) -> Dict[str, Any]:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest)"""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'reload.tracing'},
+                'spans': [
+                    {
+                        'traceId': trace.trace_id,
+                        'spanId': item.span_id,
+                        'parentSpanId': item.parent_id or '',
+                        'name': item.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(item.start_ns),
+                        'endTimeUnixNano': str(item.end_ns),
+                        'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in item.attributes.items()],
+                        'status': {'code': 2 if item.status == 'error' else 1},
+                    }
+                    for item in trace.spans
+                ],
+            }],
+        }],
+    }
+
+
+class TraceExporter:
+    """Background thread so file and network writes stay off the event loop"""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, root: Span, trace: Trace) -> None:
+        if not is_tracing_enabled():
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((root, trace))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            root, trace = self._queue.get()
+            try:
+                if TRACE_FILE:
+                    with open(TRACE_FILE, 'a', encoding='utf-8') as handle:
+                        handle.write(json.dumps(trace_to_json(root, trace), default=str) + '\n')
+                if TRACE_OTLP_ENDPOINT:
+                    request = urllib.request.Request(
+                        TRACE_OTLP_ENDPOINT,
+                        data=json.dumps(trace_to_otlp(trace), default=str).encode(),
+                        headers={'Content-Type': 'application/json'},
+                        method='POST',
+                    )
+                    urllib.request.urlopen(request, timeout=5).close()
+                self.exported += 1
+            except Exception as e:
+                self.failed += 1
+                logger.debug(f"Trace export failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': is_tracing_enabled(),
+            'sample_rate': TRACE_SAMPLE_RATE,
+            'slow_ms': TRACE_SLOW_MS,
+            'queued': self._queue.qsize(),
+            'exported': self.exported,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+
+_exporter = TraceExporter()
+
+
+def get_tracing_stats() -> Dict[str, Any]:
+    return _exporter.stats()
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening the root span of every /api request
+    Echoes the trace id as X-Trace-Id so a slow response can be looked up
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not is_tracing_enabled() or not scope['path'].startswith('/api'):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        traceparent = headers.get(b'traceparent', b'').decode('latin-1') or None
+        root = start_trace(f"{scope['method']} {scope['path']}", traceparent,
+                           **{'http.method': scope['method'], 'http.target': scope['path']})
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                root.set('http.status_code', message['status'])
+                if message['status'] >= 500:
+                    root.trace.error = True
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [(b'x-trace-id', root.trace.trace_id.encode())]
+            await send(message)
+
+        try:
+            with root:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = scope.get('endpoint')
+            if endpoint is not None:
+                root.name = f"{scope['method']} {getattr(endpoint, '__name__', scope['path'])}"
+            finish_trace(root)
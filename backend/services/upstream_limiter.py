@@ -0,0 +1,253 @@
+"""
+Upstream rate limiter
+Per-platform request pacing for yt-dlp and browser calls, so bursts of our own
+traffic do not get us throttled or blocked by YouTube, Instagram and friends
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+from services.tracing_service import span
+
+logger = logging.getLogger(__name__)
+
+# Host suffix -> platform, so CDN and short-link hosts share their platform's budget
+PLATFORM_HOSTS = {
+    'youtube.com': 'youtube', 'youtu.be': 'youtube', 'googlevideo.com': 'youtube',
+    'instagram.com': 'instagram', 'cdninstagram.com': 'instagram',
+    'tiktok.com': 'tiktok', 'tiktokcdn.com': 'tiktok',
+    'twitter.com': 'twitter', 'x.com': 'twitter', 'twimg.com': 'twitter',
+    'facebook.com': 'facebook', 'fb.watch': 'facebook', 'fbcdn.net': 'facebook',
+    'vimeo.com': 'vimeo', 'reddit.com': 'reddit', 'redd.it': 'reddit',
+}
+
+# (requests per second, burst) before any throttling feedback
+DEFAULT_PLATFORM_LIMITS = {
+    'youtube': (2.0, 5),
+    'instagram': (0.5, 3),
+    'tiktok': (1.0, 3),
+    'twitter': (1.0, 3),
+    'facebook': (1.0, 3),
+    'default': (3.0, 6),
+}
+
+KNOWN_PLATFORMS = set(PLATFORM_HOSTS.values())
+
+UPSTREAM_MAX_WAIT = float(os.environ.get('UPSTREAM_MAX_WAIT', '10'))
+
+# Limiters kept for arbitrary (non-platform) domains, least recently used go first
+UPSTREAM_MAX_DOMAINS = int(os.environ.get('UPSTREAM_MAX_DOMAINS', '256'))
+
+# Responses and yt-dlp errors that mean the platform wants us to slow down
+THROTTLE_STATUSES = {403, 429}
+THROTTLE_PATTERN = re.compile(
+    r"HTTP Error (?:403|429)|Too Many Requests|rate.?limit|confirm you.re not a bot", re.IGNORECASE
+)
+
+
+def is_upstream_limiter_enabled() -> bool:
+    return os.environ.get('UPSTREAM_LIMITER_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def platform_for_url(url: str) -> str:
+    """Platform key for a URL, the registrable-looking domain when it is not a known platform"""
+    host = (urlparse(url).hostname or '').lower()
+    labels = host.split('.')
+    for i in range(len(labels) - 1):
+        suffix = '.'.join(labels[i:])
+        if suffix in PLATFORM_HOSTS:
+            return PLATFORM_HOSTS[suffix]
+    if not host:
+        return 'unknown'
+    if host.replace('.', '').isdigit() or ':' in host:
+        return host
+    return '.'.join(labels[-2:])
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    return bool(THROTTLE_PATTERN.search(str(error)))
+
+
+class UpstreamThrottled(Exception):
+    """The platform's budget is exhausted for longer than UPSTREAM_MAX_WAIT"""
+
+
+class PlatformLimiter:
+    """
+    Reservation-based pacing (GCRA) with AIMD rate adjustment
+    Every caller reserves a start time under the lock, so callers are served
+    in arrival order and sleep outside the lock; 403/429 halves the rate,
+    successes win it back gradually
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = rate / 20
+        self.rate = rate
+        self.burst = burst
+        self._tat = 0.0  # theoretical arrival time of the next request
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttles = 0
+        self.rejected = 0
+        self.waited = 0.0
+
+    def reserve(self, max_wait: float) -> float:
+        """Reserve the next slot, returns the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate
+            tat = max(self._tat, now)
+            wait = max(0.0, tat - (self.burst - 1) * interval - now)
+            if wait > max_wait:
+                self.rejected += 1
+                raise UpstreamThrottled(f"{self.name} upstream budget exhausted, next slot in {wait:.1f}s")
+            self._tat = tat + interval
+            self.requests += 1
+            self.waited += wait
+            return wait
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Nobody gets a slot before the platform's Retry-After (or one new interval)
+            pause = retry_after if retry_after else 1.0 / self.rate
+            self._tat = max(self._tat, time.monotonic() + pause + (self.burst - 1) / self.rate)
+        logger.warning(f"⚠️ {self.name} is throttling us, upstream rate now {self.rate:.2f}/s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'burst': self.burst,
+                'requests': self.requests,
+                'throttles': self.throttles,
+                'rejected': self.rejected,
+                'avg_wait_ms': round(self.waited / self.requests * 1000, 1) if self.requests else 0.0,
+            }
+
+
+class Reservation:
+    """Handed to the caller so it can report a throttled response explicitly"""
+
+    __slots__ = ('platform', 'throttled', 'retry_after')
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.throttled = False
+        self.retry_after: Optional[float] = None
+
+    def report_status(self, status: int, retry_after: Optional[str] = None) -> None:
+        if status in THROTTLE_STATUSES:
+            self.throttled = True
+            if retry_after and retry_after.isdigit():
+                self.retry_after = float(retry_after)
+
+
+class UpstreamLimiter:
+    """
+    Registry of per-platform limiters, usable from threads and the event loop
+    Known platforms are kept for good; other domains share an LRU capped at
+    UPSTREAM_MAX_DOMAINS and are reported together as "other"
+    """
+
+    def __init__(self, max_domains: int = UPSTREAM_MAX_DOMAINS):
+        self.max_domains = max_domains
+        self._platforms: Dict[str, PlatformLimiter] = {}
+        self._domains: "OrderedDict[str, PlatformLimiter]" = OrderedDict()
+        # Counters of evicted domains, so the "other" totals never go backwards
+        self._evicted = {'requests': 0, 'throttles': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def _limiter(self, platform: str) -> PlatformLimiter:
+        with self._lock:
+            registry = self._platforms if platform in KNOWN_PLATFORMS else self._domains
+            limiter = registry.get(platform)
+            if limiter is None:
+                rate, burst = DEFAULT_PLATFORM_LIMITS.get(platform, DEFAULT_PLATFORM_LIMITS['default'])
+                env_key = re.sub(r'[^A-Z0-9]', '_', platform.upper())
+                rate = float(os.environ.get(f'UPSTREAM_RATE_{env_key}', rate))
+                burst = int(os.environ.get(f'UPSTREAM_BURST_{env_key}', burst))
+                limiter = registry[platform] = PlatformLimiter(platform, rate, burst)
+            if registry is self._domains:
+                self._domains.move_to_end(platform)
+                while len(self._domains) > self.max_domains:
+                    _, evicted = self._domains.popitem(last=False)
+                    for key in self._evicted:
+                        self._evicted[key] += getattr(evicted, key)
+            return limiter
+
+    def _prepare(self, url: str) -> Tuple[Optional[PlatformLimiter], Reservation, float]:
+        platform = platform_for_url(url)
+        if not is_upstream_limiter_enabled():
+            return None, Reservation(platform), 0.0
+        limiter = self._limiter(platform)
+        return limiter, Reservation(platform), limiter.reserve(UPSTREAM_MAX_WAIT)
+
+    @staticmethod
+    def _finish(limiter: Optional[PlatformLimiter], reservation: Reservation,
+                error: Optional[BaseException]) -> None:
+        if limiter is None:
+            return
+        if reservation.throttled or (error is not None and is_throttle_error(error)):
+            limiter.on_throttle(reservation.retry_after)
+        elif error is None:
+            limiter.on_success()
+
+    @contextmanager
+    def limit(self, url: str):
+        """Pace a blocking upstream call (yt-dlp in a worker thread)"""
+        limiter, reservation, wait = self._prepare(url)
+        if wait:
+            with span('upstream.wait', platform=reservation.platform):
+                time.sleep(wait)
+        try:
+            yield reservation
+        except BaseException as e:
+            self._finish(limiter, reservation, e)
+            raise
+        self._finish(limiter, reservation, None)
+
+    @asynccontextmanager
+    async def limit_async(self, url: str):
+        """Pace an upstream call made on the event loop (Playwright)"""
+        limiter, reservation, wait = self._prepare(url)
+        if wait:
+            with span('upstream.wait', platform=reservation.platform):
+                await asyncio.sleep(wait)
+        try:
+            yield reservation
+        except BaseException as e:
+            self._finish(limiter, reservation, e)
+            raise
+        self._finish(limiter, reservation, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            platforms = dict(self._platforms)
+            domains = list(self._domains.values())
+            other = {'domains': len(domains), **self._evicted}
+        stats = {name: limiter.stats() for name, limiter in platforms.items()}
+        for limiter in domains:
+            domain = limiter.stats()
+            for key in ('requests', 'throttles', 'rejected'):
+                other[key] += domain[key]
+        stats['other'] = other
+        return stats
+
+
+upstream_limiter = UpstreamLimiter()
@@ -0,0 +1,205 @@
+"""
+Cache warmer service
+Tracks how often each canonical URL is requested (count-min sketch plus a
+bounded top-K) and re-extracts the hottest ones before their cache entries expire
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+from services.cache_service import extraction_cache, extraction_flight
+from services.converter_service import SUPPORTED_FORMATS, conversion_cache, conversion_key, prepare_conversion
+
+logger = logging.getLogger(__name__)
+
+WARMER_TOP_K = int(os.environ.get('WARMER_TOP_K', '50'))
+WARMER_INTERVAL = float(os.environ.get('WARMER_INTERVAL', '60'))
+WARMER_REFRESH_AHEAD = float(os.environ.get('WARMER_REFRESH_AHEAD', '300'))
+WARMER_BUDGET = int(os.environ.get('WARMER_BUDGET', '10'))
+WARMER_CONCURRENCY = int(os.environ.get('WARMER_CONCURRENCY', '2'))
+WARMER_AUDIO_FORMATS = int(os.environ.get('WARMER_AUDIO_FORMATS', '2'))
+WARMER_DECAY_INTERVAL = float(os.environ.get('WARMER_DECAY_INTERVAL', '3600'))
+
+# Warmed conversions use the default quality the frontend asks for
+WARMER_CONVERSION_QUALITY = 'medium'
+
+
+def is_warmer_enabled() -> bool:
+    return os.environ.get('WARMER_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency estimator
+    Never under-counts; conservative update keeps over-counting low
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[i * 8:(i + 1) * 8], 'little') % self.width for i in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Count key and return its new estimate"""
+        indexes = self._indexes(key)
+        estimate = min(row[i] for row, i in zip(self._rows, indexes)) + count
+        for row, i in zip(self._rows, indexes):
+            if row[i] < estimate:
+                row[i] = estimate
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def decay(self) -> None:
+        """Halve every counter so old popularity fades"""
+        for row in self._rows:
+            for i, value in enumerate(row):
+                row[i] = value >> 1
+
+
+class CacheWarmer:
+    """
+    Background refresh of the most requested URLs
+    At most WARMER_BUDGET upstream extractions per interval, WARMER_CONCURRENCY at a time
+    """
+
+    def __init__(self, top_k: int = WARMER_TOP_K):
+        self.top_k = top_k
+        self.sketch = CountMinSketch()
+        # canonical URL -> (estimate, original URL), kept at 2 * top_k candidates
+        self._candidates: Dict[str, Tuple[int, str]] = {}
+        self._conversions: Counter = Counter()
+        self._refresh: Optional[Callable[[str, str], Awaitable[Dict[str, Any]]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_decay = time.monotonic()
+        self.refreshed = 0
+        self.failed = 0
+        self.conversions_prepared = 0
+        self.budget_exhausted = 0
+
+    def record(self, canonical_url: str, url: str) -> None:
+        """Count one request for canonical_url (called on every extract)"""
+        estimate = self.sketch.add(canonical_url)
+        if canonical_url in self._candidates or len(self._candidates) < self.top_k * 2:
+            self._candidates[canonical_url] = (estimate, url)
+            return
+        coldest = min(self._candidates, key=lambda key: self._candidates[key][0])
+        if estimate > self._candidates[coldest][0]:
+            del self._candidates[coldest]
+            self._candidates[canonical_url] = (estimate, url)
+
+    def record_conversion(self, output_format: str) -> None:
+        self._conversions[output_format] += 1
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Hottest (canonical URL, original URL, estimate) first"""
+        ranked = sorted(self._candidates.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, url, estimate) for key, (estimate, url) in ranked[:limit or self.top_k]]
+
+    def top_audio_formats(self) -> List[str]:
+        """Most requested audio conversion targets, mp3 first when nothing was requested yet"""
+        audio = [fmt for fmt, info in SUPPORTED_FORMATS.items() if info['type'] == 'audio']
+        ranked = [fmt for fmt, _ in self._conversions.most_common() if fmt in audio]
+        for fmt in audio:
+            if fmt not in ranked:
+                ranked.append(fmt)
+        return ranked[:WARMER_AUDIO_FORMATS]
+
+    def _needs_refresh(self, canonical_url: str, now: float) -> bool:
+        entry = extraction_cache.peek(canonical_url)
+        return entry is None or entry.expires_at - now <= WARMER_REFRESH_AHEAD
+
+    async def _warm(self, canonical_url: str, url: str) -> None:
+        try:
+            task = extraction_flight.run(canonical_url, lambda: self._refresh(url, canonical_url))
+            result = await asyncio.shield(task)
+            self.refreshed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.debug(f"Warming {canonical_url} failed: {str(e)}")
+            return
+
+        for output_format in self.top_audio_formats():
+            prepared = conversion_cache.peek(conversion_key(canonical_url, output_format, WARMER_CONVERSION_QUALITY))
+            if prepared and prepared.is_fresh():
+                continue
+            try:
+                await prepare_conversion(canonical_url, output_format, WARMER_CONVERSION_QUALITY, result)
+                self.conversions_prepared += 1
+            except ValueError as e:
+                logger.debug(f"Preparing {output_format} for {canonical_url} failed: {str(e)}")
+
+    async def run_once(self) -> int:
+        """One warming pass, returns how many extractions were started"""
+        now = time.time()
+        due = [(key, url) for key, url, _ in self.top() if self._needs_refresh(key, now)]
+        if len(due) > WARMER_BUDGET:
+            self.budget_exhausted += 1
+            due = due[:WARMER_BUDGET]
+        if not due:
+            return 0
+
+        semaphore = asyncio.Semaphore(WARMER_CONCURRENCY)
+
+        async def warm(canonical_url: str, url: str) -> None:
+            async with semaphore:
+                await self._warm(canonical_url, url)
+
+        await asyncio.gather(*(warm(key, url) for key, url in due))
+        logger.info(f"Cache warmer refreshed {len(due)} hot URLs")
+        return len(due)
+
+    def seed(self, canonical_urls: List[str]) -> None:
+        """Prime the candidates, e.g. from recent download history after a restart"""
+        for canonical_url in canonical_urls:
+            self.record(canonical_url, canonical_url)
+
+    def start(self, refresh: Callable[[str, str], Awaitable[Dict[str, Any]]]) -> None:
+        """refresh(url, canonical_url) runs one extraction and stores it in the cache"""
+        self._refresh = refresh
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(WARMER_INTERVAL)
+            if time.monotonic() - self._last_decay >= WARMER_DECAY_INTERVAL:
+                self.sketch.decay()
+                self._candidates = {key: (estimate >> 1, url) for key, (estimate, url) in self._candidates.items()}
+                self._last_decay = time.monotonic()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Cache warmer pass failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'tracked': len(self._candidates),
+            'top': [{'url': key, 'requests': estimate} for key, _, estimate in self.top(5)],
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'conversions_prepared': self.conversions_prepared,
+            'budget_exhausted': self.budget_exhausted,
+        }
+
+
+cache_warmer = CacheWarmer()
@@ -0,0 +1,55 @@
+"""
+Warm-up service for heavy extraction dependencies
+yt-dlp, Playwright and lxml are imported lazily by the services,
+this module loads them ahead of the first request when warm-up is enabled
+"""
+import importlib
+import logging
+import os
+import time
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+HEAVY_MODULES = [
+    'yt_dlp',
+    'playwright.async_api',
+    'lxml.etree',
+]
+
+
+def is_warmup_enabled() -> bool:
+    """Check the WARMUP_ON_STARTUP environment flag"""
+    return os.environ.get('WARMUP_ON_STARTUP', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def warm_up_services() -> Dict[str, Any]:
+    """
+    Import heavy modules and build the yt-dlp extractor list
+    Returns per-module load times in milliseconds, missing modules are skipped
+    """
+    timings = {}
+
+    for module_name in HEAVY_MODULES:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(module_name)
+            timings[module_name] = round((time.perf_counter() - started) * 1000, 1)
+        except ImportError as e:
+            logger.warning(f"Warm-up skipped {module_name}: {str(e)}")
+            timings[module_name] = None
+
+    # The first YoutubeDL instance loads the whole extractor registry,
+    # doing it here keeps that cost out of the first /api/extract call
+    started = time.perf_counter()
+    try:
+        import yt_dlp
+
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            ydl.get_info_extractor('Generic')
+        timings['yt_dlp_extractors'] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        logger.warning(f"Warm-up could not load yt-dlp extractors: {str(e)}")
+        timings['yt_dlp_extractors'] = None
+
+    return timings
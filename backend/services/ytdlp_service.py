@@ -2,12 +2,67 @@
 yt-dlp service for extracting video information and download links
 Supports 1000+ platforms including YouTube, Instagram, TikTok, Twitter, etc.
 """
-import yt_dlp
 import logging
+import os
 from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
+
+from services.tracing_service import current_span, span
+from services.upstream_limiter import upstream_limiter
 
 logger = logging.getLogger(__name__)
 
+# Descriptions can run to several KB and are kept in every cached extraction (0 = no limit)
+DESCRIPTION_MAX_CHARS = int(os.environ.get('YTDLP_DESCRIPTION_MAX_CHARS', '1000'))
+
+
+def trim_description(description: Any) -> Any:
+    if isinstance(description, str) and DESCRIPTION_MAX_CHARS and len(description) > DESCRIPTION_MAX_CHARS:
+        return description[:DESCRIPTION_MAX_CHARS].rstrip() + '…'
+    return description
+
+
+PROFILE_FULL = 'full'
+PROFILE_FAST = 'fast'
+
+# Metadata-first extraction for the result card: one player client, no DASH/HLS
+# manifest downloads, no format probing or caption translations
+EXTRACTION_PROFILES = {
+    PROFILE_FULL: {},
+    PROFILE_FAST: {
+        'check_formats': False,
+        'noplaylist': True,
+        'getcomments': False,
+        'extractor_args': {
+            'youtube': {
+                'player_client': os.environ.get('YTDLP_FAST_PLAYER_CLIENTS', 'web').split(','),
+                'player_skip': ['configs'],
+                'skip': ['dash', 'hls', 'translated_subs'],
+            },
+        },
+    },
+}
+
+
+def trace_requests(ydl) -> None:
+    """
+    Give every HTTP request yt-dlp makes (webpage, API, player JS) its own span
+    Only wraps when the calling request is being traced
+    """
+    if current_span() is None:
+        return
+    urlopen = ydl.urlopen
+
+    def traced_urlopen(request):
+        request_url = request if isinstance(request, str) else getattr(request, 'url', '')
+        parsed = urlparse(request_url)
+        with span('ytdlp.http', host=parsed.hostname or '', path=parsed.path[:120]) as request_span:
+            response = urlopen(request)
+            request_span.set('http.status_code', getattr(response, 'status', 0))
+            return response
+
+    ydl.urlopen = traced_urlopen
+
 
 def format_file_size(bytes_size: int) -> str:
     """Convert bytes to human-readable format"""
@@ -21,10 +76,11 @@ def format_file_size(bytes_size: int) -> str:
     return f"{bytes_size:.1f} TB"
 
 
-def get_video_info(url: str) -> Dict[str, Any]:
+def get_video_info(url: str, profile: str = PROFILE_FULL) -> Dict[str, Any]:
     """
     Extract video information using yt-dlp
-    Returns comprehensive metadata and available formats
+    Returns comprehensive metadata and available formats; the fast profile
+    returns the same metadata with only the formats that need no manifests
     """
     try:
         ydl_opts = {
@@ -44,11 +100,20 @@ def get_video_info(url: str) -> Dict[str, Any]:
             },
             'sleep_interval': 1,
             'max_sleep_interval': 5,
+            **EXTRACTION_PROFILES[profile],
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        import yt_dlp
+
+        with span('ytdlp.init'):
+            ydl = yt_dlp.YoutubeDL(ydl_opts)
+        with ydl:
+            trace_requests(ydl)
             logger.info(f"Extracting info from: {url}")
-            info = ydl.extract_info(url, download=False)
+            with upstream_limiter.limit(url), span('ytdlp.extract_info', url=url, profile=profile) as extract_span:
+                info = ydl.extract_info(url, download=False)
+                if info:
+                    extract_span.set('extractor', info.get('extractor_key', ''))
             
             if info is None:
                 raise ValueError("Could not extract video information")
@@ -56,7 +121,7 @@ def get_video_info(url: str) -> Dict[str, Any]:
             # Extract basic metadata
             result = {
                 'title': info.get('title', 'Unknown Title'),
-                'description': info.get('description', ''),
+                'description': trim_description(info.get('description', '')),
                 'duration': info.get('duration', 0),
                 'thumbnail': info.get('thumbnail', ''),
                 'uploader': info.get('uploader', 'Unknown'),
@@ -68,12 +133,17 @@ def get_video_info(url: str) -> Dict[str, Any]:
                 'formats': []
             }
             
-            # Process available formats
-            formats = info.get('formats', [])
-            processed_formats = process_formats(formats, info)
+            # Drop the raw info dict (often MBs of manifests and fragments) before building formats
+            formats = info.get('formats') or []
+            fallback = {key: info[key] for key in ('url', 'ext', 'filesize') if key in info}
+            del info
+            with span('ytdlp.process_formats', raw_formats=len(formats)):
+                processed_formats = process_formats(formats, fallback)
             result['formats'] = processed_formats
+            if profile != PROFILE_FULL:
+                result['profile'] = profile
             
-            logger.info(f"Successfully extracted {len(processed_formats)} formats")
+            logger.info(f"Successfully extracted {len(processed_formats)} formats ({profile})")
             return result
             
     except Exception as e:
@@ -212,8 +282,12 @@ def get_direct_download_url(url: str, format_id: str = 'best') -> Dict[str, Any]
             'socket_timeout': 30,
         }
         
+        import yt_dlp
+
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+            trace_requests(ydl)
+            with upstream_limiter.limit(url), span('ytdlp.extract_info', url=url, format_id=format_id):
+                info = ydl.extract_info(url, download=False)
             
             if not info:
                 raise ValueError("Could not get download URL")
@@ -228,3 +302,10 @@ def get_direct_download_url(url: str, format_id: str = 'best') -> Dict[str, Any]
     except Exception as e:
         logger.error(f"Failed to get download URL: {str(e)}")
         raise ValueError(f"Failed to get download URL: {str(e)}")
+
+
+def is_fast_mode_enabled(requested: Optional[bool] = None) -> bool:
+    """Per-request flag wins, otherwise the EXTRACT_FAST_MODE environment default"""
+    if requested is not None:
+        return requested
+    return os.environ.get('EXTRACT_FAST_MODE', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
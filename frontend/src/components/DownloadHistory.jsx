@@ -3,6 +3,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/
 import { Button } from './ui/button';
 import { Badge } from './ui/badge';
 import { Trash2, ExternalLink, Clock, History, Sparkles, Play } from 'lucide-react';
+import { thumbnailUrl } from '../lib/utils';
 
 const DownloadHistory = ({ history, onClear, onSelect }) => {
   const formatTimestamp = (timestamp) => {
@@ -35,7 +36,7 @@ const DownloadHistory = ({ history, onClear, onSelect }) => {
           </div>
           <h3 className="text-2xl font-bold text-slate-900 mb-3">No History Yet</h3>
           <p className="text-slate-600 max-w-md mx-auto">
-            Start extracting videos to see them appear here. Your download history will be saved locally.
+            Start extracting videos to see them appear here. Your download history will be saved for this browser.
           </p>
         </CardContent>
       </Card>
@@ -56,7 +57,7 @@ const DownloadHistory = ({ history, onClear, onSelect }) => {
               <div>
                 <CardTitle className="text-2xl font-bold text-slate-900">Download History</CardTitle>
                 <CardDescription className="text-base text-slate-600">
-                  {history.length} item{history.length !== 1 ? 's' : ''} • Stored locally
+                  {history.length} item{history.length !== 1 ? 's' : ''} • Synced for this browser
                 </CardDescription>
               </div>
             </div>
@@ -84,11 +85,22 @@ const DownloadHistory = ({ history, onClear, onSelect }) => {
                 {item.thumbnail ? (
                   <>
                     <img
-                      src={item.thumbnail}
+                      src={item.url ? thumbnailUrl(item.url, 160) : item.thumbnail}
+                      srcSet={item.url ? `${thumbnailUrl(item.url, 160)} 1x, ${thumbnailUrl(item.url, 320)} 2x` : undefined}
                       alt={item.title}
+                      width={128}
+                      height={80}
+                      loading="lazy"
+                      decoding="async"
                       className="w-32 h-20 object-cover rounded-xl shadow-md border-2 border-white"
                       onError={(e) => {
-                        e.target.style.display = 'none';
+                        // Fall back to the original thumbnail once, then hide
+                        if (e.target.src !== item.thumbnail) {
+                          e.target.srcset = '';
+                          e.target.src = item.thumbnail;
+                        } else {
+                          e.target.style.display = 'none';
+                        }
                       }}
                     />
                     <div className="absolute inset-0 bg-gradient-to-t from-black/50 to-transparent rounded-xl opacity-0 group-hover:opacity-100 transition-opacity flex items-center justify-center">
@@ -3,6 +3,7 @@ import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Button } from './ui/button';
 import { Badge } from './ui/badge';
 import { Download, FileVideo, FileAudio, Clock, HardDrive, Eye, TrendingUp, Sparkles, CheckCircle, ExternalLink, Play } from 'lucide-react';
+import { thumbnailUrl } from '../lib/utils';
 
 const VideoResult = ({ data, method }) => {
   const [downloading, setDownloading] = useState({});
@@ -145,11 +146,19 @@ const VideoResult = ({ data, method }) => {
             <div className="relative group">
               <div className="absolute inset-0 bg-gradient-to-br from-violet-500 to-purple-500 rounded-2xl blur-xl opacity-30 group-hover:opacity-50 transition-opacity"></div>
               <img
-                src={data.thumbnail}
+                src={data.webpage_url ? thumbnailUrl(data.webpage_url, 240) : data.thumbnail}
+                srcSet={data.webpage_url ? `${thumbnailUrl(data.webpage_url, 240)} 1x, ${thumbnailUrl(data.webpage_url, 480)} 2x` : undefined}
                 alt={data.title}
+                decoding="async"
                 className="relative w-full md:w-48 h-32 object-cover rounded-2xl shadow-xl border-2 border-white"
                 onError={(e) => {
-                  e.target.style.display = 'none';
+                  // Fall back to the original thumbnail once, then hide
+                  if (e.target.src !== data.thumbnail) {
+                    e.target.srcset = '';
+                    e.target.src = data.thumbnail;
+                  } else {
+                    e.target.style.display = 'none';
+                  }
                 }}
               />
               <div className="absolute inset-0 flex items-center justify-center opacity-0 group-hover:opacity-100 transition-opacity">
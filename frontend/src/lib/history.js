@@ -0,0 +1,40 @@
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
+const SESSION_KEY = 'historySessionId';
+
+// Anonymous per-browser id that keys the server-side history
+export function getSessionId() {
+  let sessionId = localStorage.getItem(SESSION_KEY);
+  if (!sessionId) {
+    sessionId = window.crypto?.randomUUID
+      ? window.crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    localStorage.setItem(SESSION_KEY, sessionId);
+  }
+  return sessionId;
+}
+
+export function sessionHeaders() {
+  return { 'X-Session-Id': getSessionId() };
+}
+
+// One page of server-side history, newest first
+export async function fetchServerHistory(cursor = null, limit = 50) {
+  const response = await axios.get(`${BACKEND_URL}/api/history`, {
+    headers: sessionHeaders(),
+    params: {
+      limit,
+      cursor: cursor || undefined,
+      fields: 'url,title,thumbnail,platform,method',
+    },
+  });
+  return {
+    items: response.data.data.items,
+    nextCursor: response.data.data.next_cursor,
+  };
+}
+
+export function clearServerHistory() {
+  return axios.delete(`${BACKEND_URL}/api/history`, { headers: sessionHeaders() });
+}
@@ -4,3 +4,10 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
+
+// Resized, re-encoded thumbnail served by the backend proxy
+export function thumbnailUrl(videoUrl, width) {
+  return `${BACKEND_URL}/api/thumb?url=${encodeURIComponent(videoUrl)}&w=${width}`;
+}
@@ -7,6 +7,7 @@ import { Download, Link2, History, Loader2, Video, CheckCircle, AlertCircle, Spa
 import VideoResult from '../components/VideoResult';
 import DownloadHistory from '../components/DownloadHistory';
 import axios from 'axios';
+import { sessionHeaders, fetchServerHistory, clearServerHistory } from '../lib/history';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 
@@ -29,6 +30,16 @@ const HomePageV2 = () => {
         console.error('Failed to parse history:', e);
       }
     }
+
+    // Server-side history replaces the local copy when available
+    fetchServerHistory()
+      .then(({ items }) => {
+        if (items.length > 0) {
+          setHistory(items);
+          localStorage.setItem('downloadHistory', JSON.stringify(items));
+        }
+      })
+      .catch(() => {});
   }, []);
 
   const handleExtract = async () => {
@@ -55,6 +66,7 @@ const HomePageV2 = () => {
       const response = await axios.post(`${BACKEND_URL}/api/extract`, {
         url: url.trim()
       }, {
+        headers: sessionHeaders(),
         timeout: 60000 // 60 second timeout
       });
 
@@ -99,6 +111,7 @@ const HomePageV2 = () => {
   const clearHistory = () => {
     setHistory([]);
     localStorage.removeItem('downloadHistory');
+    clearServerHistory().catch(() => {});
     setSuccess('History cleared successfully');
     setTimeout(() => setSuccess(''), 3000);
   };
@@ -11,6 +11,7 @@ import {
   Youtube, Instagram, Twitter, Facebook
 } from 'lucide-react';
 import axios from 'axios';
+import { sessionHeaders, fetchServerHistory, clearServerHistory } from '../lib/history';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 
@@ -36,6 +37,16 @@ const UltimateHomePage = () => {
         console.error('Failed to parse history:', e);
       }
     }
+
+    // Server-side history replaces the local copy when available
+    fetchServerHistory()
+      .then(({ items }) => {
+        if (items.length > 0) {
+          setHistory(items);
+          localStorage.setItem('downloadHistory', JSON.stringify(items));
+        }
+      })
+      .catch(() => {});
     
     // Animate stats on load
     animateStats();
@@ -78,6 +89,7 @@ const UltimateHomePage = () => {
       const response = await axios.post(`${BACKEND_URL}/api/extract`, {
         url: url.trim()
       }, {
+        headers: sessionHeaders(),
         timeout: 60000
       });
 
@@ -139,6 +151,7 @@ const UltimateHomePage = () => {
   const clearHistory = () => {
     setHistory([]);
     localStorage.removeItem('downloadHistory');
+    clearServerHistory().catch(() => {});
     setSuccess('History cleared successfully');
     setTimeout(() => setSuccess(''), 3000);
   };